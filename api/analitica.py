@@ -0,0 +1,309 @@
+"""
+Analítica de la cartera de análisis de un usuario
+Las agregaciones (GROUP BY, medianas, acumulados) se hacen en la base de datos sobre índices
+cubrientes; la mediana usa percentile_cont en PostgreSQL y, en SQLite, un salto a las filas
+centrales de cada grupo por el índice (o funciones de ventana si no hay índice).
+Los resultados se cachean por usuario y se invalidan cuando el usuario escribe análisis.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+from sqlalchemy import and_, func, literal, or_, select, union_all
+
+from .models import db, AnalisisSubasta
+from . import consultas
+
+# Configuración (sobrescribible por variables de entorno)
+CACHE_TTL = int(os.environ.get('ANALITICA_CACHE_TTL', 300))
+MESES_TENDENCIA = 12
+
+SIN_PROVINCIA = 'Sin provincia'
+
+# Los dos primeros dígitos del código postal identifican la provincia
+PROVINCIAS_CP = {
+    '01': 'Álava', '02': 'Albacete', '03': 'Alicante', '04': 'Almería', '05': 'Ávila',
+    '06': 'Badajoz', '07': 'Illes Balears', '08': 'Barcelona', '09': 'Burgos', '10': 'Cáceres',
+    '11': 'Cádiz', '12': 'Castellón', '13': 'Ciudad Real', '14': 'Córdoba', '15': 'A Coruña',
+    '16': 'Cuenca', '17': 'Girona', '18': 'Granada', '19': 'Guadalajara', '20': 'Gipuzkoa',
+    '21': 'Huelva', '22': 'Huesca', '23': 'Jaén', '24': 'León', '25': 'Lleida',
+    '26': 'La Rioja', '27': 'Lugo', '28': 'Madrid', '29': 'Málaga', '30': 'Murcia',
+    '31': 'Navarra', '32': 'Ourense', '33': 'Asturias', '34': 'Palencia', '35': 'Las Palmas',
+    '36': 'Pontevedra', '37': 'Salamanca', '38': 'Santa Cruz de Tenerife', '39': 'Cantabria',
+    '40': 'Segovia', '41': 'Sevilla', '42': 'Soria', '43': 'Tarragona', '44': 'Teruel',
+    '45': 'Toledo', '46': 'Valencia', '47': 'Valladolid', '48': 'Bizkaia', '49': 'Zamora',
+    '50': 'Zaragoza', '51': 'Ceuta', '52': 'Melilla',
+}
+
+
+# ================== AGREGACIONES ==================
+
+def _redondear(valor, decimales=2):
+    return None if valor is None else round(float(valor), decimales)
+
+
+def _medianas(user_id, grupo, valor, conteos=None):
+    """
+    {grupo: mediana de valor} calculada en la base de datos.
+    `conteos` ({grupo: nº de valores no nulos}) indica que hay un índice (user_id, grupo, valor):
+    sin percentile_cont se salta directamente a las filas centrales de cada grupo.
+    """
+    condicion = and_(AnalisisSubasta.user_id == user_id, valor.isnot(None))
+
+    if db.engine.dialect.name == 'postgresql':
+        consulta = select(grupo, func.percentile_cont(0.5).within_group(valor.asc()))\
+            .where(condicion).group_by(grupo)
+        return {g: m for g, m in db.session.execute(consulta)}
+
+    if conteos is not None:
+        medianas = {}
+        for g, n in conteos.items():
+            if not n:
+                continue
+            centrales = db.session.execute(
+                select(valor)
+                .where(condicion, grupo.is_(None) if g is None else grupo == g)
+                .order_by(valor)
+                .limit(2 - n % 2)
+                .offset((n - 1) // 2)
+            ).scalars().all()
+            medianas[g] = sum(centrales) / len(centrales)
+        return medianas
+
+    # Sin percentile_cont ni índice: se numeran las filas de cada grupo y se promedian las centrales
+    numeradas = select(
+        grupo.label('grupo'),
+        valor.label('valor'),
+        func.row_number().over(partition_by=grupo, order_by=valor).label('fila'),
+        func.count().over(partition_by=grupo).label('total'),
+    ).where(condicion).subquery()
+    consulta = select(numeradas.c.grupo, func.avg(numeradas.c.valor))\
+        .where(or_(numeradas.c.fila == (numeradas.c.total + 1) // 2,
+                   numeradas.c.fila == (numeradas.c.total + 2) // 2))\
+        .group_by(numeradas.c.grupo)
+    return {g: m for g, m in db.session.execute(consulta)}
+
+
+def por_veredicto(user_id):
+    """Número de análisis, rentabilidad media/mediana e inversión total por veredicto"""
+    # Agrupa por la columna (no por una expresión) para recorrer solo ix_analisis_user_veredicto
+    veredicto = AnalisisSubasta.veredicto
+    rentabilidad = AnalisisSubasta.rentabilidad_medio
+    filas = db.session.execute(
+        select(veredicto,
+               func.count(),
+               func.count(rentabilidad),
+               func.avg(rentabilidad),
+               func.sum(AnalisisSubasta.total_inversion))
+        .where(AnalisisSubasta.user_id == user_id)
+        .group_by(veredicto)
+    ).all()
+    medianas = _medianas(user_id, veredicto, rentabilidad,
+                         conteos={v: con_valor for v, _, con_valor, _, _ in filas})
+
+    resultado = [{
+        'veredicto': v or 'SIN VEREDICTO',
+        'analisis': n,
+        'rentabilidad_media': _redondear(media),
+        'rentabilidad_mediana': _redondear(medianas.get(v)),
+        'total_inversion': _redondear(inversion),
+    } for v, n, _, media, inversion in filas]
+    return sorted(resultado, key=lambda v: -v['analisis'])
+
+
+def por_provincia(user_id):
+    """Distribución del margen (escenario medio) por provincia, según el código postal"""
+    codigo = AnalisisSubasta.codigo_provincia
+    margen = AnalisisSubasta.margen_medio
+    filas = db.session.execute(
+        select(codigo,
+               func.count(),
+               func.count(margen),
+               func.min(margen),
+               func.avg(margen),
+               func.max(margen),
+               func.avg(AnalisisSubasta.rentabilidad_medio))
+        .where(AnalisisSubasta.user_id == user_id)
+        .group_by(codigo)
+    ).all()
+    medianas = _medianas(user_id, codigo, margen, conteos={f[0]: f[2] for f in filas})
+
+    provincias = {}
+    for cod, n, _, minimo, media, maximo, rentabilidad in filas:
+        nombre = PROVINCIAS_CP.get(cod, SIN_PROVINCIA)
+        if nombre in provincias:
+            # Sin código o código no reconocido: se acumulan en "Sin provincia" (sin mediana conjunta)
+            provincias[nombre] = _combinar(provincias[nombre], n, minimo, media, maximo, rentabilidad)
+            continue
+        provincias[nombre] = {
+            'provincia': nombre,
+            'analisis': n,
+            'margen_min': minimo,
+            'margen_medio': media,
+            'margen_mediana': medianas.get(cod),
+            'margen_max': maximo,
+            'rentabilidad_media': rentabilidad,
+        }
+
+    resultado = sorted(provincias.values(), key=lambda p: -p['analisis'])
+    for provincia in resultado:
+        for campo in ('margen_min', 'margen_medio', 'margen_mediana', 'margen_max',
+                      'rentabilidad_media'):
+            provincia[campo] = _redondear(provincia[campo])
+    return resultado
+
+
+def _combinar(grupo, n, minimo, media, maximo, rentabilidad):
+    """Une dos grupos ya agregados (las medias se ponderan por número de análisis)"""
+    def media_ponderada(a, b):
+        if a is None or b is None:
+            return a if b is None else b
+        return (a * grupo['analisis'] + b * n) / (grupo['analisis'] + n)
+
+    def extremo(funcion, a, b):
+        valores = [v for v in (a, b) if v is not None]
+        return funcion(valores) if valores else None
+
+    return dict(grupo,
+                analisis=grupo['analisis'] + n,
+                margen_min=extremo(min, grupo['margen_min'], minimo),
+                margen_medio=media_ponderada(grupo['margen_medio'], media),
+                margen_mediana=None,
+                margen_max=extremo(max, grupo['margen_max'], maximo),
+                rentabilidad_media=media_ponderada(grupo['rentabilidad_media'], rentabilidad))
+
+
+def _sumar_meses(fecha, meses):
+    """Primer día del mes desplazado `meses` respecto al de `fecha`"""
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return datetime(indice // 12, indice % 12 + 1, 1)
+
+
+def por_mes(user_id, meses=MESES_TENDENCIA, hoy=None, total=None):
+    """
+    Tendencia de los últimos meses: análisis creados, rentabilidad media e inversión, con acumulado.
+    Cada mes es un rango de fecha_creacion sobre ix_analisis_user_fecha_importes (sin ordenar
+    ni agrupar filas por una expresión); el acumulado es una suma de ventana sobre los meses.
+    Si se conoce el total de análisis del usuario, el acumulado se obtiene restando desde el final
+    y no hace falta contar los anteriores al primer mes.
+    """
+    inicio = _sumar_meses(hoy or datetime.utcnow(), 0)
+    limites = [_sumar_meses(inicio, -k) for k in range(meses - 1, -2, -1)]
+    fecha = AnalisisSubasta.fecha_creacion
+
+    tramos = union_all(*(
+        select(literal(desde.strftime('%Y-%m')).label('mes'),
+               literal(i).label('orden'),
+               func.count().label('analisis'),
+               func.avg(AnalisisSubasta.rentabilidad_medio).label('rentabilidad_media'),
+               func.sum(AnalisisSubasta.total_inversion).label('total_inversion'))
+        .where(AnalisisSubasta.user_id == user_id, fecha >= desde, fecha < hasta)
+        for i, (desde, hasta) in enumerate(zip(limites, limites[1:]))
+    )).subquery()
+
+    if total is None:
+        anteriores = select(func.count()).where(AnalisisSubasta.user_id == user_id,
+                                                fecha < limites[0]).scalar_subquery()
+        acumulado = anteriores + func.sum(tramos.c.analisis).over(order_by=tramos.c.orden)
+    else:
+        acumulado = total - func.sum(tramos.c.analisis).over(order_by=tramos.c.orden.desc()) \
+            + tramos.c.analisis
+    filas = db.session.execute(
+        select(tramos, acumulado.label('acumulado')).order_by(tramos.c.orden)
+    ).all()
+
+    return [{
+        'mes': f.mes,
+        'analisis': f.analisis,
+        'acumulado': int(f.acumulado),
+        'rentabilidad_media': _redondear(f.rentabilidad_media),
+        'total_inversion': _redondear(f.total_inversion),
+    } for f in filas]
+
+
+def capital(user_id, ids=None, **filtros):
+    """Capital necesario para una selección (ids concretos o los filtros del listado)"""
+    query = consultas.consulta_filtrada(user_id, columnas=('id',), **filtros)
+    if ids:
+        query = query.filter(AnalisisSubasta.id.in_(ids))
+    n, inversion, puja, deposito = query.with_entities(
+        func.count(AnalisisSubasta.id),
+        func.sum(AnalisisSubasta.total_inversion),
+        func.sum(AnalisisSubasta.puja),
+        func.sum(AnalisisSubasta.deposito),
+    ).one()
+    return {
+        'analisis': n,
+        'total_inversion': _redondear(inversion) or 0,
+        'total_pujas': _redondear(puja) or 0,
+        'total_depositos': _redondear(deposito) or 0,
+    }
+
+
+# ================== CACHÉ POR USUARIO ==================
+
+_cache = {}
+# Generación por usuario (None = todos): invalidar la incrementa y un cálculo empezado antes
+# no guarda su resultado, que podría no incluir los cambios
+_generaciones = {}
+_cerrojo = threading.Lock()
+
+
+def _generacion(user_id):
+    return _generaciones.get(user_id, 0), _generaciones.get(None, 0)
+
+
+def _cacheado(user_id, nombre, calcular):
+    ahora = time.monotonic()
+    with _cerrojo:
+        entrada = _cache.get(user_id, {}).get(nombre)
+        generacion = _generacion(user_id)
+    if entrada and ahora - entrada[0] < CACHE_TTL:
+        return entrada[1]
+
+    valor = calcular()
+    with _cerrojo:
+        if _generacion(user_id) == generacion:
+            _cache.setdefault(user_id, {})[nombre] = (ahora, valor)
+    return valor
+
+
+def invalidar(user_id):
+    """
+    Descarta la analítica cacheada del usuario (llamar tras crear/eliminar análisis);
+    con user_id=None, la de todos los usuarios.
+    La caché es por proceso: en otros workers caduca por CACHE_TTL.
+    """
+    with _cerrojo:
+        _generaciones[user_id] = _generaciones.get(user_id, 0) + 1
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
+def resumen(user_id):
+    """Panel del dashboard: totales, desglose por veredicto y últimos meses"""
+    def calcular():
+        veredictos = por_veredicto(user_id)
+        total = sum(v['analisis'] for v in veredictos)
+        return {
+            'analisis': total,
+            'total_inversion': round(sum(v['total_inversion'] or 0 for v in veredictos), 2),
+            'veredictos': veredictos,
+            'meses': por_mes(user_id, meses=6, total=total),
+        }
+    return _cacheado(user_id, 'resumen', calcular)
+
+
+def estadisticas(user_id):
+    """Analítica completa de la cartera"""
+    def calcular():
+        return {
+            'veredictos': por_veredicto(user_id),
+            'provincias': por_provincia(user_id),
+            'meses': por_mes(user_id),
+        }
+    return _cacheado(user_id, 'estadisticas', calcular)
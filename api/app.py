@@ -1,47 +1,115 @@
 # api/app.py
-from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify
+from flask import Flask, current_app, render_template, redirect, url_for, flash, request, session, jsonify, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from .models import db, User, AnalisisSubasta
+from .models import db, User, AnalisisSubasta, TrabajoExtraccion
+from . import basedatos, numeros
 from .forms import LoginForm, RegisterForm
 from datetime import datetime
+import json
+import time
 import os
 
-# Crear la aplicación Flask
-app = Flask(__name__, 
-            template_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates'),
-            static_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static'))
+# Las rutas se registran en RUTAS y crear_app() las añade a cada aplicación que construye.
+# Los módulos pesados (extracción del BOE con requests/bs4, numpy, alembic) se importan
+# dentro de las vistas que los usan, así que el arranque en frío solo paga Flask y SQLAlchemy.
+RUTAS = []
+
+
+def ruta(regla, **opciones):
+    """Como app.route, pero para las aplicaciones que cree crear_app()"""
+    def registrar(vista):
+        RUTAS.append((regla, vista, opciones))
+        return vista
+    return registrar
 
-# Configuración
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Inicializar extensiones
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
 
-# Importar la lógica de subastas
-from . import subasta_logic
+
+def crear_app(config=None):
+    """Crea la aplicación Flask; config sobrescribe la configuración tomada del entorno"""
+    raiz = os.path.dirname(os.path.dirname(__file__))
+    app = Flask(__name__,
+                template_folder=os.path.join(raiz, 'templates'),
+                static_folder=os.path.join(raiz, 'static'))
+
+    # Configuración
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    app.config['SQLALCHEMY_DATABASE_URI'] = basedatos.uri_base_datos()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Extracción vía cola de trabajos (requiere un worker: python -m api.trabajos)
+    app.config['EXTRACCION_EN_SEGUNDO_PLANO'] = os.environ.get('EXTRACCION_EN_SEGUNDO_PLANO', '0') == '1'
+    app.config['SSE_TIMEOUT'] = int(os.environ.get('SSE_TIMEOUT', 60))
+    # Cada stream SSE ocupa un hilo (con workers síncronos, el worker entero) hasta SSE_TIMEOUT:
+    # por encima de este número por proceso se responde 503 y la página pasa a sondear
+    app.config['SSE_MAX_CONEXIONES'] = int(os.environ.get('SSE_MAX_CONEXIONES', 8))
+    if config:
+        app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          basedatos.opciones_motor(app.config['SQLALCHEMY_DATABASE_URI']))
+    # El esquema se gestiona con migraciones (python -m api.migraciones, al desplegar); solo con
+    # MIGRAR_AL_ARRANCAR=1 se aplican al crear la aplicación (index.py, el de Vercel, no lo hace)
+    app.config.setdefault('MIGRAR_AL_ARRANCAR', os.environ.get('MIGRAR_AL_ARRANCAR', '0') == '1')
+
+    # Inicializar extensiones
+    db.init_app(app)
+    login_manager.init_app(app)
+    metricas.instalar(app)
+
+    for regla, vista, opciones in RUTAS:
+        app.add_url_rule(regla, view_func=vista, **opciones)
+    # {{ importe|numero }} → 1.234,56 ({{ importe|numero(0) }} sin decimales)
+    app.add_template_filter(numeros.formatear, 'numero')
+
+    # Migraciones pendientes (solo si está activado)
+    if app.config['MIGRAR_AL_ARRANCAR']:
+        from . import migraciones
+        with app.app_context():
+            migraciones.actualizar()
+
+    return app
+
+
+def _config_local():
+    """
+    Desarrollo local: con SQLite y sin MIGRAR_AL_ARRANCAR en el entorno, la aplicación por
+    defecto y `python -m api.app` aplican las migraciones al arrancar
+    """
+    if 'MIGRAR_AL_ARRANCAR' not in os.environ and basedatos.es_sqlite(basedatos.uri_base_datos()):
+        return {'MIGRAR_AL_ARRANCAR': True}
+    return None
+
+
+def __getattr__(nombre):
+    """api.app.app: aplicación por defecto, creada la primera vez que se pide"""
+    global app
+    if nombre == 'app':
+        app = crear_app(_config_local())
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+from . import calculadora
+from . import metricas
+from . import consultas
+from . import analitica
+from . import usuarios
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# Crear las tablas
-with app.app_context():
-    db.create_all()
+    """Usuario de la sesión desde la caché de usuarios (sin consulta en cada petición)"""
+    return usuarios.cargar(user_id)
 
 # ================== RUTAS PRINCIPALES ==================
 
-@app.route('/')
+@ruta('/')
 def index():
     """Página de inicio"""
     return render_template('index.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@ruta('/register', methods=['GET', 'POST'])
 def register():
     """Registro de usuarios"""
     if current_user.is_authenticated:
@@ -70,7 +138,7 @@ def register():
     
     return render_template('register.html', form=form)
 
-@app.route('/login', methods=['GET', 'POST'])
+@ruta('/login', methods=['GET', 'POST'])
 def login():
     """Inicio de sesión"""
     if current_user.is_authenticated:
@@ -90,7 +158,7 @@ def login():
     
     return render_template('login.html', form=form)
 
-@app.route('/logout')
+@ruta('/logout')
 @login_required
 def logout():
     """Cerrar sesión"""
@@ -98,28 +166,31 @@ def logout():
     flash('Has cerrado sesión correctamente.', 'info')
     return redirect(url_for('index'))
 
-@app.route('/dashboard')
+@ruta('/dashboard')
 @login_required
 def dashboard():
     """Dashboard del usuario"""
     # Obtener los últimos análisis del usuario
-    analisis_recientes = AnalisisSubasta.query.filter_by(user_id=current_user.id)\
-        .order_by(AnalisisSubasta.fecha_creacion.desc()).limit(5).all()
+    analisis_recientes, _ = consultas.listar_analisis(current_user.id, limite=5)
+    resumen = analitica.resumen(current_user.id) if analisis_recientes else None
     
-    return render_template('dashboard.html', analisis=analisis_recientes)
+    return render_template('dashboard.html', analisis=analisis_recientes, resumen=resumen)
 
-@app.route('/suscribirse')
+@ruta('/suscribirse')
 @login_required
 def suscribirse():
     """Activar suscripción (simulado - 30 días)"""
-    current_user.activar_suscripcion(dias=30)
+    # current_user es una copia de solo lectura: se modifica el registro de la base de datos
+    usuario = db.session.get(User, current_user.id)
+    usuario.activar_suscripcion(dias=30)
     db.session.commit()
+    usuarios.invalidar(usuario.id)
     flash('¡Suscripción activada por 30 días!', 'success')
     return redirect(url_for('dashboard'))
 
 # ================== RUTAS DE ANÁLISIS DE SUBASTAS ==================
 
-@app.route('/analisis/nuevo', methods=['GET', 'POST'])
+@ruta('/analisis/nuevo', methods=['GET', 'POST'])
 @login_required
 def nuevo_analisis():
     """Crear un nuevo análisis de subasta"""
@@ -135,10 +206,11 @@ def nuevo_analisis():
     
     return render_template('analisis.html')
 
-@app.route('/analisis/extraer', methods=['POST'])
+@ruta('/analisis/extraer', methods=['POST'])
 @login_required
 def extraer_datos():
     """Extrae datos automáticamente desde URL del BOE"""
+    from . import cache_subastas
     if not current_user.tiene_suscripcion_valida():
         return jsonify({'error': 'Suscripción requerida'}), 403
     
@@ -148,12 +220,206 @@ def extraer_datos():
         return jsonify({'error': 'URL no proporcionada'}), 400
     
     try:
-        datos = subasta_logic.extraer_datos_subasta(url_subasta)
+        datos = cache_subastas.obtener_datos_subasta(url_subasta)
         return jsonify({'success': True, 'datos': datos})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/analisis/calcular', methods=['GET', 'POST'])
+@ruta('/analisis/extraer/lote', methods=['POST'])
+@login_required
+def extraer_datos_lote():
+    """Extrae datos de varias URLs del BOE; responde en NDJSON según van terminando"""
+    from . import extraccion_lote
+    if not current_user.tiene_suscripcion_valida():
+        return jsonify({'error': 'Suscripción requerida'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    urls = payload.get('urls') if isinstance(payload, dict) else payload
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'Lista de URLs no proporcionada'}), 400
+    
+    if len(urls) > extraccion_lote.MAX_URLS:
+        return jsonify({'error': f'Máximo {extraccion_lote.MAX_URLS} URLs por lote'}), 400
+    
+    def generar():
+        for resultado in extraccion_lote.extraer_lote(urls):
+            yield json.dumps(resultado, ensure_ascii=False) + '\n'
+    
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
+@ruta('/analisis/trabajos', methods=['POST'])
+@login_required
+def crear_trabajo_extraccion():
+    """Encola una extracción y devuelve el id del trabajo"""
+    from . import trabajos
+    if not current_user.tiene_suscripcion_valida():
+        return jsonify({'error': 'Suscripción requerida'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    url_subasta = payload.get('url')
+    
+    if not url_subasta:
+        return jsonify({'error': 'URL no proporcionada'}), 400
+    
+    trabajo_id = trabajos.encolar(current_user.id, url_subasta)
+    return jsonify({
+        'id': trabajo_id,
+        'estado': 'pendiente',
+        'url_estado': url_for('ver_trabajo_extraccion', trabajo_id=trabajo_id),
+        'url_eventos': url_for('eventos_trabajo_extraccion', trabajo_id=trabajo_id),
+    }), 202
+
+@ruta('/analisis/trabajos/<int:trabajo_id>')
+@login_required
+def ver_trabajo_extraccion(trabajo_id):
+    """Estado de un trabajo de extracción (para sondeo)"""
+    from . import trabajos
+    trabajo = TrabajoExtraccion.query.filter_by(id=trabajo_id, user_id=current_user.id).first_or_404()
+    return jsonify(trabajos.estado_trabajo(trabajo))
+
+@ruta('/analisis/trabajos/<int:trabajo_id>/eventos')
+@login_required
+def eventos_trabajo_extraccion(trabajo_id):
+    """Server-Sent Events con el estado del trabajo hasta que termina (máximo SSE_MAX_CONEXIONES)"""
+    from . import trabajos
+    TrabajoExtraccion.query.filter_by(id=trabajo_id, user_id=current_user.id).first_or_404()
+    if not trabajos.abrir_conexion_sse(current_app.config['SSE_MAX_CONEXIONES']):
+        return jsonify({'error': 'Demasiadas conexiones de eventos: consulta el estado del trabajo'}), \
+            503, {'Retry-After': '1'}
+    limite = time.monotonic() + current_app.config['SSE_TIMEOUT']
+    
+    def generar():
+        ultimo_estado = None
+        while time.monotonic() < limite:
+            # Cerrar la transacción para ver lo que ha escrito el worker
+            db.session.rollback()
+            trabajo = db.session.get(TrabajoExtraccion, trabajo_id, populate_existing=True)
+            if trabajo.estado != ultimo_estado:
+                ultimo_estado = trabajo.estado
+                datos = json.dumps(trabajos.estado_trabajo(trabajo), ensure_ascii=False)
+                yield f"event: estado\ndata: {datos}\n\n"
+            if trabajo.terminado:
+                return
+            yield ": ping\n\n"
+            time.sleep(trabajos.INTERVALO_SONDEO)
+        yield "event: timeout\ndata: {}\n\n"
+    
+    respuesta = Response(stream_with_context(generar()), mimetype='text/event-stream',
+                         headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # El servidor cierra la respuesta al terminar o cortarse el stream
+    respuesta.call_on_close(trabajos.cerrar_conexion_sse)
+    return respuesta
+
+@ruta('/api/calcular', methods=['POST'])
+@login_required
+def api_calcular():
+    """
+    Cálculo sin guardar para la página de análisis. Con 'cambios' (entradas modificadas) y
+    'anteriores' (resultados de la llamada previa) solo se recalcula lo que depende de los cambios.
+    """
+    if not current_user.tiene_suscripcion_valida():
+        return jsonify({'error': 'Suscripción requerida'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    datos = payload.get('entradas') or payload
+    cambios = payload.get('cambios')
+    anteriores = payload.get('anteriores')
+    
+    if not isinstance(datos, dict) or not isinstance(cambios, (list, type(None))) \
+            or not isinstance(anteriores, (dict, type(None))):
+        return jsonify({'error': "'entradas' y 'anteriores' deben ser objetos y 'cambios' una lista"}), 400
+    
+    try:
+        entradas = calculadora.leer_entradas(datos)
+        resultados, recalculados = calculadora.calcular(entradas, anteriores, cambios)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'success': True, 'resultados': resultados, 'recalculados': recalculados})
+
+@ruta('/analisis/puja-maxima', methods=['POST'])
+@login_required
+def calcular_puja_maxima():
+    """Puja máxima por escenario para alcanzar una rentabilidad objetivo"""
+    from . import solver_puja
+    if not current_user.tiene_suscripcion_valida():
+        return jsonify({'error': 'Suscripción requerida'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    objetivos = payload.get('objetivos') or {}
+    datos = payload.get('datos') or payload
+    
+    if not objetivos:
+        return jsonify({'error': 'Rentabilidad objetivo no proporcionada'}), 400
+    if not isinstance(objetivos, dict) or not isinstance(datos, dict):
+        return jsonify({'error': "'objetivos' y 'datos' deben ser objetos"}), 400
+    
+    try:
+        return jsonify({'success': True, 'escenarios': solver_puja.resolver(datos, objetivos)})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@ruta('/analisis/puja-maxima/lote', methods=['POST'])
+@login_required
+def calcular_puja_maxima_lote():
+    """Puja máxima por escenario para todos los análisis guardados del usuario"""
+    from . import solver_puja
+    if not current_user.tiene_suscripcion_valida():
+        return jsonify({'error': 'Suscripción requerida'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    objetivos = payload.get('objetivos') or {}
+    
+    if not objetivos:
+        return jsonify({'error': 'Rentabilidad objetivo no proporcionada'}), 400
+    if not isinstance(objetivos, dict):
+        return jsonify({'error': "'objetivos' debe ser un objeto"}), 400
+    
+    try:
+        resultados = solver_puja.resolver_analisis_guardados(current_user.id, objetivos)
+        return jsonify({'success': True, 'analisis': resultados})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@ruta('/analisis/cache')
+@login_required
+def estadisticas_cache():
+    """Estadísticas de la caché de extracciones del BOE"""
+    from . import cache_subastas
+    return jsonify(cache_subastas.cache.estadisticas())
+
+@ruta('/metrics')
+def metricas_prometheus():
+    """Histogramas de latencia en formato Prometheus (solo si se define METRICAS_TOKEN)"""
+    if metricas.TOKEN is None:
+        return jsonify({'error': 'No encontrado'}), 404
+    if not metricas.autorizado(request.headers.get('Authorization')):
+        return jsonify({'error': 'No autorizado'}), 401
+    return Response(metricas.exposicion(), mimetype='text/plain; version=0.0.4')
+
+def _datos_subasta(datos):
+    """Campos del formulario que no intervienen en los cálculos"""
+    return {
+        'url_subasta': datos.get('url_subasta', ''),
+        'identificador': datos.get('identificador', ''),
+        'fecha_conclusion': datos.get('fecha_conclusion', ''),
+        'cantidad_reclamada': float(datos.get('cantidad_reclamada', 0) or 0),
+        'tasacion': float(datos.get('tasacion', 0) or 0),
+        'tramos_pujas': float(datos.get('tramos_pujas', 0) or 0),
+        'deposito': float(datos.get('deposito', 0) or 0),
+        'direccion': datos.get('direccion', ''),
+        'referencia_catastral': datos.get('referencia_catastral', ''),
+        'notas': datos.get('notas', ''),
+    }
+
+@ruta('/analisis/calcular', methods=['GET', 'POST'])
 @login_required
 def calcular_analisis():
     """Calcula rentabilidad y guarda el análisis"""
@@ -163,132 +429,23 @@ def calcular_analisis():
     
     if request.method == 'POST':
         try:
-            # Obtener datos del formulario
-            datos = request.form.to_dict()
-            
-            # Crear nuevo análisis
-            analisis = AnalisisSubasta(user_id=current_user.id)
-            
-            # Datos de subasta
-            analisis.url_subasta = datos.get('url_subasta', '')
-            analisis.identificador = datos.get('identificador', '')
-            analisis.fecha_conclusion = datos.get('fecha_conclusion', '')
-            analisis.cantidad_reclamada = float(datos.get('cantidad_reclamada', 0) or 0)
-            analisis.valor_subasta = float(datos.get('valor_subasta', 0) or 0)
-            analisis.tasacion = float(datos.get('tasacion', 0) or 0)
-            analisis.tramos_pujas = float(datos.get('tramos_pujas', 0) or 0)
-            analisis.deposito = float(datos.get('deposito', 0) or 0)
-            analisis.direccion = datos.get('direccion', '')
-            analisis.referencia_catastral = datos.get('referencia_catastral', '')
-            
-            # Puja
-            analisis.puja = float(datos.get('puja', 0) or 0)
-            
-            # Calcular porcentaje de puja
-            if analisis.puja and analisis.valor_subasta:
-                resultado, error = subasta_logic.calcular_porcentaje_puja(
-                    analisis.puja, analisis.valor_subasta
-                )
-                if resultado:
-                    analisis.porcentaje_puja = resultado['porcentaje']
-                    analisis.veredicto = resultado['veredicto']
-            
-            # Datos de rentabilidad
-            analisis.valor_referencia = float(datos.get('valor_referencia', 0) or 0)
-            analisis.itp_porcentaje = float(datos.get('itp_porcentaje', 7) or 7)
-            
-            # Calcular ITP y notaría
-            if analisis.valor_referencia:
-                resultado, error = subasta_logic.calcular_itp_notaria(
-                    analisis.valor_referencia, analisis.itp_porcentaje
-                )
-                if resultado:
-                    analisis.itp_calculado = resultado['itp']
-                    analisis.notaria_registro = resultado['notaria']
-            
-            # Costes judiciales
-            analisis.ano_procedimiento = int(datos.get('ano_procedimiento', 0) or 0)
-            analisis.ibi_anual = float(datos.get('ibi_anual', 0) or 0)
-            
-            # Calcular IBI judicial
-            if analisis.ibi_anual and analisis.ano_procedimiento:
-                resultado, error = subasta_logic.calcular_ibi_judicial(
-                    analisis.ibi_anual, analisis.ano_procedimiento
-                )
-                if resultado:
-                    analisis.anos_total = resultado['anos_total']
-                    analisis.ibi_total = resultado['total_ibi']
-            
-            # Comunidad
-            analisis.comunidad_anual = float(datos.get('comunidad_anual', 0) or 0)
-            
-            if analisis.comunidad_anual and analisis.anos_total:
-                resultado, error = subasta_logic.calcular_comunidad_judicial(
-                    analisis.comunidad_anual, analisis.anos_total
-                )
-                if resultado:
-                    analisis.comunidad_total = resultado
-            
-            # Otros costes
-            analisis.alarmas = float(datos.get('alarmas', 0) or 0)
-            analisis.suministros = float(datos.get('suministros', 0) or 0)
-            analisis.reforma = float(datos.get('reforma', 0) or 0)
-            
-            # Calcular total inversión
-            resultado, error = subasta_logic.calcular_total_inversion(
-                analisis.puja,
-                analisis.itp_calculado,
-                analisis.notaria_registro,
-                analisis.ibi_total,
-                analisis.comunidad_total,
-                analisis.alarmas,
-                analisis.suministros,
-                analisis.reforma
-            )
-            
-            if resultado:
-                analisis.total_inversion = resultado
-            
-            # Escenarios de venta
-            analisis.venta_bajo = float(datos.get('venta_bajo', 0) or 0)
-            analisis.venta_medio = float(datos.get('venta_medio', 0) or 0)
-            analisis.venta_alto = float(datos.get('venta_alto', 0) or 0)
-            
-            # Calcular márgenes y rentabilidad
-            if analisis.total_inversion:
-                # Escenario bajo
-                if analisis.venta_bajo:
-                    resultado, error = subasta_logic.calcular_margen_rentabilidad(
-                        analisis.venta_bajo, analisis.total_inversion
-                    )
-                    if resultado:
-                        analisis.margen_bajo = resultado['margen']
-                        analisis.rentabilidad_bajo = resultado['rentabilidad']
+            with metricas.tramo('calculo'):
+                # Obtener datos del formulario
+                datos = request.form.to_dict()
                 
-                # Escenario medio
-                if analisis.venta_medio:
-                    resultado, error = subasta_logic.calcular_margen_rentabilidad(
-                        analisis.venta_medio, analisis.total_inversion
-                    )
-                    if resultado:
-                        analisis.margen_medio = resultado['margen']
-                        analisis.rentabilidad_medio = resultado['rentabilidad']
+                # Cálculos (los mismos que /api/calcular)
+                entradas = calculadora.leer_entradas(datos)
+                resultados, _ = calculadora.calcular(entradas)
                 
-                # Escenario alto
-                if analisis.venta_alto:
-                    resultado, error = subasta_logic.calcular_margen_rentabilidad(
-                        analisis.venta_alto, analisis.total_inversion
-                    )
-                    if resultado:
-                        analisis.margen_alto = resultado['margen']
-                        analisis.rentabilidad_alto = resultado['rentabilidad']
-            
-            # Notas
-            analisis.notas = datos.get('notas', '')
+                # Crear nuevo análisis (datos de subasta, cálculos y notas)
+                analisis = AnalisisSubasta(user_id=current_user.id, **_datos_subasta(datos),
+                                           **entradas, **resultados)
             
             # Guardar en base de datos
-            db.session.add(analisis)
-            db.session.commit()
+            with metricas.tramo('bd_commit'):
+                db.session.add(analisis)
+                db.session.commit()
+            analitica.invalidar(current_user.id)
             
             flash('¡Análisis guardado exitosamente!', 'success')
             return redirect(url_for('ver_analisis', analisis_id=analisis.id))
@@ -300,7 +457,44 @@ def calcular_analisis():
     
     return render_template('analisis.html')
 
-@app.route('/analisis/<int:analisis_id>')
+@ruta('/analisis/importar', methods=['GET', 'POST'])
+@login_required
+def importar_analisis():
+    """Importación masiva de análisis desde CSV/XLSX"""
+    from . import importacion
+    if not current_user.tiene_suscripcion_valida():
+        flash('Necesitas una suscripción activa.', 'warning')
+        return redirect(url_for('suscribirse'))
+    
+    informe = None
+    if request.method == 'POST':
+        archivo = request.files.get('archivo')
+        if not archivo or not archivo.filename:
+            flash('Selecciona un archivo CSV o XLSX.', 'warning')
+            return redirect(url_for('importar_analisis'))
+        
+        try:
+            informe = importacion.importar_archivo(archivo, current_user.id)
+        except Exception as e:
+            db.session.rollback()
+            # Los lotes anteriores al error ya están confirmados
+            analitica.invalidar(current_user.id)
+            if request.args.get('formato') == 'json':
+                return jsonify({'error': str(e)}), 400
+            flash(f'Error al importar: {str(e)}', 'danger')
+            return redirect(url_for('importar_analisis'))
+        
+        analitica.invalidar(current_user.id)
+        if request.args.get('formato') == 'json':
+            return jsonify(informe)
+        
+        flash(f"Importados {informe['importadas']} de {informe['procesadas']} análisis.",
+              'success' if not informe['con_errores'] else 'warning')
+    
+    return render_template('importar.html', informe=informe,
+                           columnas=importacion.CAMPOS_TEXTO + importacion.CAMPOS_NUMERICOS)
+
+@ruta('/analisis/<int:analisis_id>')
 @login_required
 def ver_analisis(analisis_id):
     """Ver un análisis específico"""
@@ -313,16 +507,257 @@ def ver_analisis(analisis_id):
     
     return render_template('resultados.html', analisis=analisis)
 
-@app.route('/analisis/lista')
+@ruta('/analisis/<int:analisis_id>/editar', methods=['GET', 'POST'])
+@login_required
+def editar_analisis(analisis_id):
+    """Editar un análisis: solo se recalculan y escriben las columnas afectadas por los cambios"""
+    if not current_user.tiene_suscripcion_valida():
+        flash('Necesitas una suscripción activa.', 'warning')
+        return redirect(url_for('suscribirse'))
+    
+    analisis = AnalisisSubasta.query.get_or_404(analisis_id)
+    if analisis.user_id != current_user.id:
+        flash('No tienes permiso para editar este análisis.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        try:
+            with metricas.tramo('calculo'):
+                datos = request.form.to_dict()
+                entradas = calculadora.leer_entradas(datos)
+                modificados = calculadora.actualizar_analisis(analisis, entradas)
+                modificados += calculadora.asignar(analisis, _datos_subasta(datos))
+            
+            if modificados:
+                with metricas.tramo('bd_commit'):
+                    db.session.commit()
+                analitica.invalidar(current_user.id)
+                flash('¡Análisis actualizado!', 'success')
+            else:
+                flash('No hay cambios que guardar.', 'info')
+            return redirect(url_for('ver_analisis', analisis_id=analisis.id))
+        
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error al actualizar el análisis: {str(e)}', 'danger')
+            return redirect(url_for('editar_analisis', analisis_id=analisis_id))
+    
+    return render_template('analisis.html', analisis=analisis,
+                           guardado={c: getattr(analisis, c) for c in
+                                     (*calculadora.ENTRADAS, *_datos_subasta({}))},
+                           resultados={s: getattr(analisis, s) for s in calculadora.SALIDAS})
+
+@ruta('/analisis/<int:analisis_id>/seguimiento', methods=['POST'])
+@login_required
+def seguimiento_analisis(analisis_id):
+    """Activa o desactiva la vigilancia de la subasta en el BOE"""
+    from . import vigilancia
+    if not current_user.tiene_suscripcion_valida():
+        flash('Necesitas una suscripción activa.', 'warning')
+        return redirect(url_for('suscribirse'))
+    
+    analisis = AnalisisSubasta.query.get_or_404(analisis_id)
+    if analisis.user_id != current_user.id:
+        flash('No tienes permiso para modificar este análisis.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    try:
+        if analisis.seguimiento is not None and analisis.seguimiento.activo:
+            vigilancia.dejar_de_seguir(analisis)
+            mensaje = 'Has dejado de seguir esta subasta.'
+        else:
+            vigilancia.seguir(analisis)
+            mensaje = 'Subasta en seguimiento: se revisará en el BOE hasta su conclusión.'
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'warning')
+        return redirect(url_for('ver_analisis', analisis_id=analisis_id))
+    
+    flash(mensaje, 'success')
+    return redirect(url_for('ver_analisis', analisis_id=analisis_id))
+
+@ruta('/analisis/recalcular', methods=['POST'])
+@login_required
+def recalcular_analisis():
+    """Actualiza al año en curso los costes judiciales (IBI, comunidad) de todos los análisis"""
+    if not current_user.tiene_suscripcion_valida():
+        flash('Necesitas una suscripción activa.', 'warning')
+        return redirect(url_for('suscribirse'))
+    
+    try:
+        modificados = calculadora.recalcular_guardados([calculadora.ANO_ACTUAL],
+                                                       user_id=current_user.id)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al recalcular: {str(e)}', 'danger')
+        return redirect(url_for('lista_analisis'))
+    
+    flash(f'{modificados} análisis actualizados al año {datetime.now().year}.', 'success')
+    return redirect(url_for('lista_analisis'))
+
+@ruta('/analisis/<int:analisis_id>/simulacion', methods=['GET', 'POST'])
+@login_required
+def simular_analisis(analisis_id):
+    """Simulación Monte Carlo del riesgo (GET: página de resultados, POST: NDJSON por bloques)"""
+    from . import simulacion
+    analisis = AnalisisSubasta.query.get_or_404(analisis_id)
+    
+    # Verificar que el análisis pertenece al usuario actual
+    if analisis.user_id != current_user.id:
+        flash('No tienes permiso para ver este análisis.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    datos = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    if request.method == 'POST' and not isinstance(datos, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    
+    try:
+        distribuciones = simulacion.distribuciones_desde_formulario(
+            datos, simulacion.distribuciones_por_defecto(analisis))
+        # Se valida antes de empezar a responder (en el NDJSON ya no se puede devolver un 400)
+        muestras = simulacion.leer_muestras(
+            datos.get('muestras'),
+            simulacion.MUESTRAS if request.method == 'POST' else simulacion.MUESTRAS_PAGINA)
+        semilla = simulacion.leer_semilla(datos.get('semilla'))
+    except (TypeError, ValueError) as e:
+        if request.method == 'POST':
+            return jsonify({'error': str(e)}), 400
+        flash(f'Parámetros de simulación no válidos: {str(e)}', 'danger')
+        return redirect(url_for('ver_analisis', analisis_id=analisis.id))
+    
+    if request.method == 'POST':
+        def generar():
+            for parcial in simulacion.simular_por_bloques(analisis, distribuciones, muestras,
+                                                          semilla, simulacion.PROCESOS):
+                yield json.dumps(parcial, ensure_ascii=False) + '\n'
+        
+        return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+    
+    resultado = simulacion.simular_cacheado(analisis, distribuciones, muestras, semilla)
+    return render_template('resultados.html', analisis=analisis, simulacion=resultado)
+
+@ruta('/analisis/lista')
 @login_required
 def lista_analisis():
-    """Lista todos los análisis del usuario"""
-    analisis = AnalisisSubasta.query.filter_by(user_id=current_user.id)\
-        .order_by(AnalisisSubasta.fecha_creacion.desc()).all()
+    """Lista los análisis del usuario, paginados por cursor y con filtros"""
+    try:
+        filtros = consultas.leer_filtros(request.args)
+        orden = filtros.pop('orden')
+        ascendente = filtros.pop('ascendente')
+        analisis, siguiente = consultas.listar_analisis(
+            current_user.id,
+            cursor=request.args.get('cursor'),
+            limite=request.args.get('limite', consultas.POR_PAGINA),
+            orden=orden,
+            ascendente=ascendente,
+            **filtros
+        )
+    except ValueError as e:
+        flash(f'Filtro no válido: {str(e)}', 'warning')
+        return redirect(url_for('lista_analisis'))
+    
+    total = consultas.contar_analisis(current_user.id, **filtros)
+    
+    # Parámetros actuales (sin cursor) para construir los enlaces de paginación
+    parametros = {k: v for k, v in request.args.items() if k != 'cursor' and v}
+    
+    return render_template('lista_analisis.html', analisis=analisis, total=total,
+                           siguiente=siguiente, parametros=parametros,
+                           es_primera=not request.args.get('cursor'),
+                           veredictos=consultas.VEREDICTOS)
+
+@ruta('/analisis/estadisticas')
+@login_required
+def estadisticas_analisis():
+    """
+    Analítica de la cartera (por veredicto, provincia y mes).
+    Con ?ids=1,2,3 o los filtros del listado añade el capital necesario para esa selección.
+    """
+    if not current_user.tiene_suscripcion_valida():
+        return jsonify({'error': 'Suscripción requerida'}), 403
+    
+    try:
+        filtros = consultas.leer_filtros(request.args)
+        filtros.pop('orden')
+        filtros.pop('ascendente')
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    resultado = dict(analitica.estadisticas(current_user.id))
+    if ids or any(v is not None for v in filtros.values()):
+        resultado['capital'] = analitica.capital(current_user.id, ids=ids, **filtros)
+    return jsonify(resultado)
+
+@ruta('/analisis/buscar')
+@login_required
+def buscar_analisis():
+    """
+    Criba de análisis en memoria (api.criba), p. ej.
+    ?c=porcentaje_puja>=70&c=rentabilidad_medio>20&c=deposito<10k&orden=rentabilidad_medio&limite=20
+    """
+    from . import criba
+    if not current_user.tiene_suscripcion_valida():
+        return jsonify({'error': 'Suscripción requerida'}), 403
+    
+    try:
+        condiciones = [criba.leer_condicion(c) for c in request.args.getlist('c')]
+        veredicto = request.args.get('veredicto') or None
+        if veredicto and veredicto not in criba.VEREDICTOS:
+            raise ValueError("Veredicto no válido")
+        with metricas.tramo('criba'):
+            total, ids = criba.buscar(current_user.id, condiciones, veredicto,
+                                      orden=request.args.get('orden') or None,
+                                      ascendente=request.args.get('dir') == 'asc',
+                                      limite=request.args.get('limite', 50))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Solo se leen de la base de datos las filas de la página
+    campos = dict.fromkeys((*consultas.COLUMNAS_LISTA, *(c[0] for c in condiciones),
+                            *([request.args['orden']] if request.args.get('orden') else [])))
+    filas = {}
+    if ids:
+        # Solo por clave primaria: con user_id en el WHERE SQLite recorre el índice del usuario
+        filas = {f.id: f for f in db.session.query(AnalisisSubasta.user_id,
+                                                   *(getattr(AnalisisSubasta, c) for c in campos))
+                 .filter(AnalisisSubasta.id.in_(ids))}
+    resultados = []
+    for analisis_id in ids:
+        fila = filas.get(analisis_id)
+        if fila is None or fila.user_id != current_user.id:
+            continue
+        datos = fila._asdict()
+        del datos['user_id']
+        datos['fecha_creacion'] = datos['fecha_creacion'].isoformat() if datos['fecha_creacion'] else None
+        datos['url'] = url_for('ver_analisis', analisis_id=analisis_id)
+        resultados.append(datos)
+    return jsonify({'total': total, 'resultados': resultados})
+
+@ruta('/analisis/exportar')
+@login_required
+def exportar_analisis():
+    """Descarga los análisis del usuario (con los filtros del listado) en CSV, Parquet o XLSX"""
+    from . import exportacion
+    if not current_user.tiene_suscripcion_valida():
+        flash('Necesitas una suscripción activa.', 'warning')
+        return redirect(url_for('suscribirse'))
+    
+    try:
+        filtros = consultas.leer_filtros(request.args)
+        opciones = exportacion.leer_opciones(request.args)
+        contenido = exportacion.exportar(current_user.id, **opciones, **filtros)
+    except ValueError as e:
+        flash(f'No se pudo exportar: {str(e)}', 'warning')
+        return redirect(url_for('lista_analisis'))
     
-    return render_template('lista_analisis.html', analisis=analisis)
+    mimetype, extension = exportacion.FORMATOS[opciones['formato']]
+    nombre = f"analisis_{datetime.utcnow().strftime('%Y%m%d')}.{extension}"
+    return Response(stream_with_context(contenido), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{nombre}"'})
 
-@app.route('/analisis/eliminar/<int:analisis_id>', methods=['POST'])
+@ruta('/analisis/eliminar/<int:analisis_id>', methods=['POST'])
 @login_required
 def eliminar_analisis(analisis_id):
     """Eliminar un análisis"""
@@ -335,12 +770,12 @@ def eliminar_analisis(analisis_id):
     
     db.session.delete(analisis)
     db.session.commit()
+    analitica.invalidar(current_user.id)
     
     flash('Análisis eliminado correctamente.', 'success')
     return redirect(url_for('lista_analisis'))
 
-# Ejecutar la aplicación
 # Ejecutar la aplicación (solo para desarrollo local)
 if __name__ == '__main__':
-    app.run(debug=True)
+    crear_app(_config_local()).run(debug=True)
 
@@ -0,0 +1,105 @@
+"""
+Aplicación ASGI: /analisis/extraer asíncrono junto a la app Flask
+El resto de rutas se delegan a api.app.app (WSGI) mediante asgiref
+
+Ejecutar con: uvicorn api.asgi:application
+"""
+
+import json
+import asyncio
+
+from asgiref.wsgi import WsgiToAsgi
+from flask_login import current_user
+
+from .app import app
+from . import cache_subastas, extraccion_async, usuarios
+
+app_wsgi = WsgiToAsgi(app)
+
+RUTA_EXTRAER = '/analisis/extraer'
+
+
+def _autenticar(scope):
+    """
+    Usuario de la petición como en las vistas Flask: sesión y cookie "recordarme" pasan por
+    Flask-Login (protección de sesión incluida). Devuelve (user_id, suscripción vigente), o None
+    si no hay usuario. Síncrona (lee la base de datos): se ejecuta en un hilo.
+    """
+    cabeceras = [(nombre.decode('latin-1'), valor.decode('latin-1'))
+                 for nombre, valor in scope.get('headers', [])]
+    cliente = scope.get('client')
+    with app.test_request_context(scope['path'], method=scope['method'], headers=cabeceras,
+                                  environ_base={'REMOTE_ADDR': cliente[0]} if cliente else None):
+        if not current_user.is_authenticated:
+            return None
+        return current_user.id, usuarios.suscripcion_vigente(current_user.id)
+
+
+async def _leer_cuerpo(receive):
+    cuerpo = b''
+    while True:
+        mensaje = await receive()
+        cuerpo += mensaje.get('body', b'')
+        if not mensaje.get('more_body'):
+            return cuerpo
+
+
+async def _responder_json(send, estado, datos):
+    cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': estado,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(cuerpo)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+async def extraer_datos(scope, receive, send, user_id, suscripcion_vigente):
+    """Equivalente asíncrono de la vista extraer_datos"""
+    if not suscripcion_vigente:
+        return await _responder_json(send, 403, {'error': 'Suscripción requerida'})
+
+    try:
+        payload = json.loads(await _leer_cuerpo(receive) or b'{}')
+    except ValueError:
+        payload = {}
+    url_subasta = payload.get('url') if isinstance(payload, dict) else None
+
+    if not url_subasta:
+        return await _responder_json(send, 400, {'error': 'URL no proporcionada'})
+
+    try:
+        datos = await extraccion_async.obtener_datos_subasta_async(url_subasta)
+        return await _responder_json(send, 200, {'success': True, 'datos': datos})
+    except Exception as e:
+        return await _responder_json(send, 500, {'error': str(e)})
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            # El nivel persistente de la caché (tabla subastas) se enlaza con el contexto de la app
+            with app.app_context():
+                cache_subastas.preparar()
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            await extraccion_async.cerrar_cliente()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """Punto de entrada ASGI"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['path'] == RUTA_EXTRAER and scope['method'] == 'POST':
+        autenticado = await asyncio.to_thread(_autenticar, scope)
+        # Sin usuario (o con la sesión rechazada por la protección de sesión) responde la app
+        # Flask, que redirige al login y actualiza la cookie
+        if autenticado is not None:
+            return await extraer_datos(scope, receive, send, *autenticado)
+
+    return await app_wsgi(scope, receive, send)
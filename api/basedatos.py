@@ -0,0 +1,64 @@
+"""
+Configuración de la base de datos
+Pool de conexiones configurable para PostgreSQL en producción y, para uso local con SQLite,
+modo WAL y espera por bloqueo (varios workers escribiendo sin "database is locked")
+"""
+
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+URI_POR_DEFECTO = 'sqlite:///app.db'
+
+# Pool (PostgreSQL y otros servidores)
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+
+# SQLite
+SQLITE_WAL = os.environ.get('DB_SQLITE_WAL', '1') == '1'
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('DB_SQLITE_BUSY_TIMEOUT', 15))
+
+
+def uri_base_datos():
+    """URI de DATABASE_URL (o SQLite local); acepta el esquema postgres:// de algunos proveedores"""
+    uri = os.environ.get('DATABASE_URL', URI_POR_DEFECTO)
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def es_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def opciones_motor(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS según el tipo de base de datos"""
+    if es_sqlite(uri):
+        # Cada conexión es un fichero local: no hay pool que dimensionar ni conexiones que caduquen
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT}}
+    return {
+        'pool_size': POOL_SIZE,
+        'max_overflow': POOL_MAX_OVERFLOW,
+        'pool_timeout': POOL_TIMEOUT,
+        'pool_recycle': POOL_RECYCLE,
+        'pool_pre_ping': POOL_PRE_PING,
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _configurar_sqlite(conexion_dbapi, registro):
+    """WAL: los lectores no bloquean al escritor; busy_timeout: se espera al bloqueo en vez de fallar"""
+    if not isinstance(conexion_dbapi, sqlite3.Connection):
+        return
+    cursor = conexion_dbapi.cursor()
+    cursor.execute(f'PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT * 1000)}')
+    if SQLITE_WAL:
+        cursor.execute('PRAGMA journal_mode = WAL')
+        # Con WAL, NORMAL es seguro ante caídas de la aplicación (no ante cortes de luz)
+        cursor.execute('PRAGMA synchronous = NORMAL')
+    cursor.close()
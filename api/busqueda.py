@@ -0,0 +1,123 @@
+"""
+Búsqueda de texto en los análisis (dirección, identificador, referencia catastral y notas)
+- SQLite: tabla virtual FTS5 `busqueda_analisis` con contenido externo (analisis_subastas),
+  tokenizador unicode61 sin diacríticos e índices de prefijos; la mantienen al día triggers.
+  También indexa user_id, así que el recuento de un usuario se resuelve dentro del índice.
+- PostgreSQL: índice GIN sobre busqueda_analisis_documento(...), una función IMMUTABLE que
+  normaliza el texto y devuelve el tsvector (siempre al día, es un índice de expresión)
+Ambos esquemas los crea la migración 0003.
+
+Normalización común: minúsculas, sin tildes ni diéresis (ñ → n) y separando por cualquier
+carácter que no sea letra o número ('SUB-JA-2024-123456' → sub ja 2024 123456).
+Cada palabra buscada es un prefijo: 'mála may' encuentra 'Calle Mayor 3, Málaga'.
+"""
+
+import os
+import re
+import unicodedata
+
+from sqlalchemy import func, literal_column, select, text
+
+from .models import db, AnalisisSubasta
+
+TABLA_FTS = 'busqueda_analisis'
+FUNCION_PG = 'busqueda_analisis_documento'
+INDICE_PG = 'ix_analisis_busqueda'
+
+# Columnas indexadas, en el orden de la tabla FTS5 y de los argumentos de la función
+CAMPOS = ('direccion', 'identificador', 'referencia_catastral', 'notas')
+
+# Configuración (sobrescribible por variables de entorno)
+# Hasta cuántas coincidencias se recorren por clave primaria en vez de por el índice del usuario
+UMBRAL_POCAS = int(os.environ.get('BUSQUEDA_UMBRAL_POCAS', 2000))
+
+MAX_PALABRAS = 8
+SEPARADOR = re.compile(r'[\W_]+')
+
+
+def normalizar(texto):
+    """Tokens del texto: minúsculas, sin diacríticos, separados por lo que no es alfanumérico"""
+    sin_tildes = unicodedata.normalize('NFKD', (texto or '').lower())
+    sin_tildes = ''.join(c for c in sin_tildes if not unicodedata.combining(c))
+    return [t for t in SEPARADOR.split(sin_tildes) if t]
+
+
+def palabras(texto):
+    """Palabras de la búsqueda, cada una como lista de tokens (vacía si no hay nada que buscar)"""
+    resultado = [normalizar(palabra) for palabra in (texto or '').split()]
+    return [tokens for tokens in resultado if tokens][:MAX_PALABRAS]
+
+
+def expresion_fts5(texto):
+    """
+    MATCH de FTS5: cada palabra es una frase con el último token como prefijo
+    ('sub-ja-2024 mál' → "sub ja 2024"* "mal"*); los tokens ya son alfanuméricos
+    """
+    return ' '.join(f'"{" ".join(tokens)}"*' for tokens in palabras(texto)) or None
+
+
+def expresion_tsquery(texto):
+    """Equivalente para to_tsquery('simple', ...): 'sub <-> ja <-> 2024:* & mal:*'"""
+    return ' & '.join(' <-> '.join(tokens) + ':*' for tokens in palabras(texto)) or None
+
+
+def _match_fts5(texto, user_id=None):
+    """MATCH sobre las columnas de texto (y, si se indica, solo las filas del usuario)"""
+    consulta = expresion_fts5(texto)
+    if consulta is None:
+        return None
+    consulta = f'{{{" ".join(CAMPOS)}}} : ({consulta})'
+    return consulta if user_id is None else f'user_id : "{int(user_id)}" AND {consulta}'
+
+
+def _coincidencias(consulta):
+    return select(literal_column('rowid')).select_from(text(TABLA_FTS))\
+        .where(literal_column(TABLA_FTS).op('MATCH')(consulta))
+
+
+def filtro(user_id, texto):
+    """
+    Condiciones (usuario y texto) para filtrar una consulta de AnalisisSubasta,
+    o None si la búsqueda no tiene ninguna palabra
+    """
+    if db.engine.dialect.name == 'postgresql':
+        consulta = expresion_tsquery(texto)
+        if consulta is None:
+            return None
+        documento = func.busqueda_analisis_documento(*(getattr(AnalisisSubasta, c) for c in CAMPOS))
+        return [AnalisisSubasta.user_id == user_id,
+                documento.op('@@')(func.to_tsquery('simple', consulta))]
+
+    consulta = _match_fts5(texto)
+    if consulta is None:
+        return None
+    coincidencias = AnalisisSubasta.id.in_(_coincidencias(consulta).scalar_subquery())
+    # Sin estadísticas SQLite siempre prefiere el índice de user_id y, con pocas coincidencias,
+    # recorre todas las filas del usuario; se elige el plan según cuántas hay (de todos los
+    # usuarios: es una cota y se cuenta sin cruzar con user_id, que es lo caro)
+    muestra = _coincidencias(consulta).limit(UMBRAL_POCAS + 1).subquery()
+    if db.session.execute(select(func.count()).select_from(muestra)).scalar() <= UMBRAL_POCAS:
+        # Pocas: se buscan por clave primaria (+ 0 impide usar el índice de user_id)
+        return [coincidencias, (AnalisisSubasta.user_id + 0) == user_id]
+    # Muchas: el índice del usuario, en el orden del listado, llena pronto la página
+    return [AnalisisSubasta.user_id == user_id, coincidencias]
+
+
+def contar(user_id, texto):
+    """Análisis del usuario que coinciden, contados en el índice FTS5 (None si no aplica)"""
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    consulta = _match_fts5(texto, user_id)
+    if consulta is None:
+        return None
+    return db.session.execute(
+        select(func.count()).select_from(text(TABLA_FTS))
+        .where(literal_column(TABLA_FTS).op('MATCH')(consulta))
+    ).scalar()
+
+
+def reconstruir():
+    """Vuelve a generar el índice FTS5 desde la tabla (no hace falta en PostgreSQL)"""
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')"))
+        db.session.commit()
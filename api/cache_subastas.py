@@ -0,0 +1,383 @@
+"""
+Caché de datos extraídos del BOE
+LRU en memoria con TTL, nivel persistente y revalidación con ETag/Last-Modified.
+El nivel persistente es por defecto la tabla `subastas` de la aplicación (AlmacenBD): la
+comparten todos los procesos y usuarios, así que cada subasta se descarga una vez aunque
+la analicen muchos. BOE_CACHE_SQLITE lo sustituye por un fichero SQLite propio.
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import has_app_context
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import subasta_logic, descarga_boe, numeros
+from .models import db, Subasta
+
+logger = logging.getLogger(__name__)
+
+# Configuración (sobrescribible por variables de entorno)
+TTL = float(os.environ.get('BOE_CACHE_TTL', 900))
+MAX_ENTRADAS = int(os.environ.get('BOE_CACHE_MAX', 512))
+RUTA_SQLITE = os.environ.get('BOE_CACHE_SQLITE') or None
+USAR_BD = os.environ.get('BOE_CACHE_BD', '1') == '1'
+
+# Campo del parseo → columna de la subasta compartida
+CAMPOS_TEXTO = {
+    'Identificador': 'identificador',
+    'Fecha de conclusión': 'fecha_conclusion',
+    'Dirección': 'direccion',
+    'Referencia catastral': 'referencia_catastral',
+}
+CAMPOS_IMPORTE = {
+    'Cantidad reclamada': 'cantidad_reclamada',
+    'Valor subasta': 'valor_subasta',
+    'Tasación': 'tasacion',
+    'Tramos entre pujas': 'tramos_pujas',
+    'Importe del depósito': 'deposito',
+}
+EPOCA = datetime(1970, 1, 1)
+
+
+class AlmacenSQLite:
+    """Nivel persistente de la caché en un fichero SQLite"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with self._conectar() as con:
+            con.execute(
+                'CREATE TABLE IF NOT EXISTS cache_subastas ('
+                ' clave TEXT PRIMARY KEY,'
+                ' datos TEXT NOT NULL,'
+                ' validadores TEXT NOT NULL,'
+                ' guardado REAL NOT NULL)'
+            )
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=5)
+
+    def leer(self, clave):
+        with self._conectar() as con:
+            fila = con.execute(
+                'SELECT datos, validadores, guardado FROM cache_subastas WHERE clave = ?',
+                (clave,)
+            ).fetchone()
+        if fila is None:
+            return None
+        return {
+            'datos': json.loads(fila[0]),
+            'validadores': json.loads(fila[1]),
+            'guardado': fila[2],
+        }
+
+    def escribir(self, clave, entrada):
+        with self._conectar() as con:
+            con.execute(
+                'INSERT OR REPLACE INTO cache_subastas (clave, datos, validadores, guardado) '
+                'VALUES (?, ?, ?, ?)',
+                (clave, json.dumps(entrada['datos']), json.dumps(entrada['validadores']),
+                 entrada['guardado'])
+            )
+
+    def borrar(self, clave=None):
+        with self._conectar() as con:
+            if clave is None:
+                con.execute('DELETE FROM cache_subastas')
+            else:
+                con.execute('DELETE FROM cache_subastas WHERE clave = ?', (clave,))
+
+
+def columnas_subasta(datos):
+    """Valores de las columnas de Subasta a partir de los datos parseados ('' → NULL)"""
+    valores = {columna: (datos.get(campo) or '').strip() or None
+               for campo, columna in CAMPOS_TEXTO.items()}
+    for campo, columna in CAMPOS_IMPORTE.items():
+        valores[columna] = numeros.leer_importe(datos.get(campo))
+    valores['codigo_provincia'] = subasta_logic.codigo_provincia(valores['direccion'])
+    return valores
+
+
+class AlmacenBD:
+    """
+    Nivel persistente en la tabla `subastas` de la base de datos de la aplicación.
+    Dentro de un contexto usa el motor de la aplicación en curso; los hilos sin contexto usan
+    el de la última aplicación que lo usó (o preparar()) y, hasta entonces, se comporta como
+    un almacén vacío.
+    """
+
+    TABLA = Subasta.__table__
+
+    def __init__(self, motor=None):
+        self._motor = motor
+        self._enlazado = None
+
+    def motor(self):
+        if self._motor is not None:
+            return self._motor
+        if has_app_context():
+            self._enlazado = db.engine
+        return self._enlazado
+
+    def leer(self, clave):
+        motor = self.motor()
+        if motor is None:
+            return None
+        t = self.TABLA
+        with motor.connect() as con:
+            fila = con.execute(
+                select(t.c.datos, t.c.validadores, t.c.fecha_extraccion).where(t.c.clave == clave)
+            ).first()
+        # Subastas sin extracción guardada (migradas de análisis antiguos o invalidadas)
+        if fila is None or fila.datos is None:
+            return None
+        return {
+            'datos': json.loads(fila.datos),
+            'validadores': json.loads(fila.validadores or '[]'),
+            'guardado': (fila.fecha_extraccion - EPOCA).total_seconds(),
+        }
+
+    def _buscar(self, con, clave, identificador):
+        """Subasta de la clave o, si aún no tiene, la del mismo identificador"""
+        t = self.TABLA
+        subasta_id = con.execute(select(t.c.id).where(t.c.clave == clave)).scalar()
+        if subasta_id is None and identificador:
+            subasta_id = con.execute(
+                select(t.c.id).where(t.c.identificador == identificador)
+            ).scalar()
+        return subasta_id
+
+    def escribir(self, clave, entrada):
+        motor = self.motor()
+        if motor is None:
+            return
+        valores = columnas_subasta(entrada['datos'])
+        valores.update(
+            clave=clave,
+            datos=json.dumps(entrada['datos'], ensure_ascii=False),
+            validadores=json.dumps(entrada['validadores']),
+            fecha_extraccion=datetime.utcfromtimestamp(entrada['guardado']),
+        )
+        identificador = valores['identificador']
+        t = self.TABLA
+        for intento in range(3):
+            try:
+                with motor.begin() as con:
+                    subasta_id = self._buscar(con, clave, identificador)
+                    if subasta_id is None:
+                        con.execute(insert(t).values(fecha_creacion=datetime.utcnow(), **valores))
+                    else:
+                        con.execute(update(t).where(t.c.id == subasta_id).values(**valores))
+                return
+            except IntegrityError:
+                # Otro proceso la insertó a la vez (se vuelve a buscar) o, si sigue fallando,
+                # el identificador ya es de otra subasta: se guarda sin él
+                if intento:
+                    valores.pop('identificador', None)
+        logger.warning("No se pudo guardar la subasta %s en la base de datos tras 3 intentos", clave)
+
+    def borrar(self, clave=None):
+        """Olvida la extracción guardada; la subasta se conserva (la enlazan los análisis)"""
+        motor = self.motor()
+        if motor is None:
+            return
+        sentencia = update(self.TABLA).values(datos=None, validadores=None, fecha_extraccion=None)
+        if clave is not None:
+            sentencia = sentencia.where(self.TABLA.c.clave == clave)
+        with motor.begin() as con:
+            con.execute(sentencia)
+
+
+class CacheSubastas:
+    """Caché delante de la extracción de subastas, indexada por clave_subasta"""
+
+    def __init__(self, ttl=TTL, max_entradas=MAX_ENTRADAS, ruta_sqlite=RUTA_SQLITE, usar_bd=USAR_BD):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        if ruta_sqlite:
+            self.persistente = AlmacenSQLite(ruta_sqlite)
+        else:
+            self.persistente = AlmacenBD() if usar_bd else None
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores = {
+            'aciertos': 0,
+            'fallos': 0,
+            'revalidaciones': 0,
+            'obsoletas': 0,
+            'expulsiones': 0,
+        }
+
+    # ---------- Acceso a los niveles ----------
+
+    def _leer(self, clave):
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                self._memoria.move_to_end(clave)
+                return entrada
+
+        if self.persistente is not None:
+            entrada = self.persistente.leer(clave)
+            if entrada is not None:
+                self._guardar_memoria(clave, entrada)
+        return entrada
+
+    def _guardar_memoria(self, clave, entrada):
+        with self._lock:
+            self._memoria[clave] = entrada
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_entradas:
+                self._memoria.popitem(last=False)
+                self.contadores['expulsiones'] += 1
+
+    def _guardar(self, clave, entrada):
+        self._guardar_memoria(clave, entrada)
+        if self.persistente is not None:
+            self.persistente.escribir(clave, entrada)
+
+    def _contar(self, contador):
+        with self._lock:
+            self.contadores[contador] += 1
+
+    # ---------- API pública ----------
+
+    def consultar(self, urlbase):
+        """
+        Busca la subasta en caché. Devuelve (clave, entrada, datos):
+        `datos` solo viene relleno si la entrada está fresca (acierto).
+        """
+        clave = subasta_logic.clave_subasta(urlbase)
+        entrada = self._leer(clave)
+
+        if entrada is not None and time.time() - entrada['guardado'] < self.ttl:
+            self._contar('aciertos')
+            return clave, entrada, dict(entrada['datos'])
+
+        return clave, entrada, None
+
+    def cabeceras_revalidacion(self, entrada):
+        """Cabeceras condicionales por página para revalidar una entrada caducada"""
+        if entrada is None:
+            return None
+        return [descarga_boe.cabeceras_condicionales(v) for v in entrada['validadores']]
+
+    def renovar_si_no_modificada(self, clave, entrada, respuestas):
+        """Si todas las páginas respondieron 304 renueva la entrada y devuelve sus datos"""
+        if entrada is None or not all(r is not None and r.status_code == 304 for r in respuestas):
+            return None
+        entrada = dict(entrada, guardado=time.time())
+        self._guardar(clave, entrada)
+        self._contar('revalidaciones')
+        return dict(entrada['datos'])
+
+    def obsoleta_si_falla(self, entrada, respuestas):
+        """
+        Si alguna página no se pudo descargar (red, plazo, error del BOE) y hay una entrada
+        caducada, devuelve sus datos: mejor que una extracción incompleta. Sin entrada → None
+        """
+        if entrada is None or all(r is not None for r in respuestas):
+            return None
+        self._contar('obsoletas')
+        return dict(entrada['datos'])
+
+    @staticmethod
+    def pendientes_de_descarga(respuestas):
+        """Índices de páginas que respondieron 304 pero cuyo HTML hace falta"""
+        return [i for i, r in enumerate(respuestas) if r is not None and r.status_code == 304]
+
+    def almacenar(self, clave, respuestas):
+        """Parsea las respuestas, guarda la extracción si está completa y devuelve los datos"""
+        self._contar('fallos')
+        datos = subasta_logic.parsear_paginas(
+            [r.text if r is not None else None for r in respuestas]
+        )
+
+        # Solo se guardan extracciones completas (ambas páginas descargadas)
+        if all(r is not None for r in respuestas):
+            self._guardar(clave, {
+                'datos': datos,
+                'validadores': [descarga_boe.validadores(r) for r in respuestas],
+                'guardado': time.time(),
+            })
+
+        return dict(datos)
+
+    def obtener(self, urlbase):
+        """Devuelve los datos de la subasta, desde caché si es posible"""
+        clave, entrada, datos = self.consultar(urlbase)
+        if datos is not None:
+            return datos
+
+        urls = subasta_logic.construir_urls(urlbase)
+        respuestas = descarga_boe.descargar_respuestas(
+            urls, cabeceras=self.cabeceras_revalidacion(entrada)
+        )
+
+        # Entrada caducada pero sin cambios en el BOE: se renueva sin volver a parsear
+        datos = self.renovar_si_no_modificada(clave, entrada, respuestas)
+        if datos is not None:
+            return datos
+
+        # Si solo alguna página respondió 304 hace falta su HTML: se descarga sin condiciones
+        pendientes = self.pendientes_de_descarga(respuestas)
+        if pendientes:
+            nuevas = descarga_boe.descargar_respuestas([urls[i] for i in pendientes])
+            for i, r in zip(pendientes, nuevas):
+                respuestas[i] = r
+
+        # Revalidación fallida: se sirve la entrada caducada; solo un fallo sin entrada se parsea
+        datos = self.obsoleta_si_falla(entrada, respuestas)
+        if datos is not None:
+            return datos
+
+        return self.almacenar(clave, respuestas)
+
+    def invalidar(self, urlbase=None):
+        """Elimina una subasta de la caché (o todas si no se indica URL)"""
+        clave = subasta_logic.clave_subasta(urlbase) if urlbase else None
+        with self._lock:
+            if clave is None:
+                self._memoria.clear()
+            else:
+                self._memoria.pop(clave, None)
+        if self.persistente is not None:
+            self.persistente.borrar(clave)
+
+    def estadisticas(self):
+        """Contadores de aciertos/fallos y tamaño actual (obsoletas: caducadas servidas sin poder revalidar)"""
+        with self._lock:
+            stats = dict(self.contadores)
+            stats['entradas_memoria'] = len(self._memoria)
+        consultas = stats['aciertos'] + stats['revalidaciones'] + stats['fallos'] + stats['obsoletas']
+        stats['tasa_aciertos'] = round(
+            (stats['aciertos'] + stats['revalidaciones']) / consultas * 100, 2
+        ) if consultas else 0.0
+        stats['ttl'] = self.ttl
+        stats['persistente'] = self.persistente is not None
+        return stats
+
+
+# Instancia compartida por la aplicación
+cache = CacheSubastas()
+
+
+def preparar():
+    """
+    Enlaza el nivel persistente con la base de datos de la aplicación en curso;
+    hay que llamarlo dentro del contexto antes de extraer desde hilos sin él
+    """
+    if isinstance(cache.persistente, AlmacenBD):
+        cache.persistente.motor()
+
+
+def obtener_datos_subasta(urlbase):
+    """Extracción de datos de subasta pasando por la caché compartida"""
+    return cache.obtener(urlbase)
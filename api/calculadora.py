@@ -0,0 +1,314 @@
+"""
+Cálculos del análisis como grafo de dependencias
+Cada nodo envuelve una función calcular_* de subasta_logic con sus entradas y salidas.
+Dadas las entradas que han cambiado y los resultados anteriores, solo se recalculan los nodos
+afectados; un nodo cuyas salidas no cambian no propaga el cambio a los siguientes.
+Sin estado en el servidor: el cliente envía los resultados anteriores con cada petición.
+
+El mismo grafo sirve para:
+- editar un análisis guardado escribiendo solo las columnas afectadas (actualizar_analisis)
+- recalcular muchos análisis con un único UPDATE (sentencia_recalculo), p. ej. anos_total
+  al cambiar de año: python -m api.calculadora anos
+"""
+
+import sys
+import math
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Float, Numeric, and_, case, cast, func, literal, or_, update
+
+from . import subasta_logic
+
+# Entradas del cálculo y su valor por defecto (los mismos que aplica calcular_analisis)
+ENTRADAS = {
+    'puja': 0.0,
+    'valor_subasta': 0.0,
+    'valor_referencia': 0.0,
+    'itp_porcentaje': 7.0,
+    'ano_procedimiento': 0,
+    'ibi_anual': 0.0,
+    'comunidad_anual': 0.0,
+    'alarmas': 0.0,
+    'suministros': 0.0,
+    'reforma': 0.0,
+    'venta_bajo': 0.0,
+    'venta_medio': 0.0,
+    'venta_alto': 0.0,
+}
+
+# Entrada implícita: el IBI y la comunidad se acumulan hasta el año en curso
+ANO_ACTUAL = 'ano_actual'
+
+ESCENARIOS = ('bajo', 'medio', 'alto')
+
+# funcion: cálculo en Python; sql: el mismo cálculo como expresiones SQL sobre las columnas
+Nodo = namedtuple('Nodo', 'nombre entradas salidas funcion sql')
+
+
+def _porcentaje(puja, valor_subasta):
+    if puja and valor_subasta:
+        resultado, _ = subasta_logic.calcular_porcentaje_puja(puja, valor_subasta)
+        if resultado:
+            return resultado['porcentaje'], resultado['veredicto']
+    return None, None
+
+
+def _itp_notaria(valor_referencia, itp_porcentaje):
+    if valor_referencia:
+        resultado, _ = subasta_logic.calcular_itp_notaria(valor_referencia, itp_porcentaje)
+        if resultado:
+            return resultado['itp'], resultado['notaria']
+    return None, None
+
+
+def _ibi(ibi_anual, ano_procedimiento, ano_actual):
+    if ibi_anual and ano_procedimiento:
+        resultado, _ = subasta_logic.calcular_ibi_judicial(ibi_anual, ano_procedimiento, ano_actual)
+        if resultado:
+            return resultado['anos_total'], resultado['total_ibi']
+    return None, None
+
+
+def _comunidad(comunidad_anual, anos_total):
+    if comunidad_anual and anos_total:
+        resultado, _ = subasta_logic.calcular_comunidad_judicial(comunidad_anual, anos_total)
+        if resultado:
+            return (resultado,)
+    return (None,)
+
+
+def _total(*sumandos):
+    resultado, _ = subasta_logic.calcular_total_inversion(*sumandos)
+    return (resultado or None,)
+
+
+def _margen(venta, total_inversion):
+    if total_inversion and venta:
+        resultado, _ = subasta_logic.calcular_margen_rentabilidad(venta, total_inversion)
+        if resultado:
+            return resultado['margen'], resultado['rentabilidad']
+    return None, None
+
+
+# ---------- Versión SQL de cada nodo (mismas condiciones y redondeos que en Python) ----------
+
+def _redondear(expresion):
+    # round(double, int) no existe en PostgreSQL: se redondea como numeric
+    return cast(func.round(cast(expresion, Numeric), 2), Float)
+
+
+def _si(condicion, *valores):
+    """Cada valor si se cumple la condición; NULL si no (como los `return None` de Python)"""
+    return tuple(case((condicion, valor), else_=None) for valor in valores)
+
+
+def _verdadero(expresion):
+    return and_(expresion.is_not(None), expresion != 0)
+
+
+def _porcentaje_sql(puja, valor_subasta):
+    porcentaje = puja / valor_subasta * 100
+    veredicto = case((porcentaje >= 70, 'ADJUDICADO'), (porcentaje >= 50, 'POSIBLEMENTE'),
+                     else_='DEPENDE JUZGADO')
+    return _si(and_(_verdadero(puja), _verdadero(valor_subasta)),
+               _redondear(porcentaje), veredicto)
+
+
+def _itp_notaria_sql(valor_referencia, itp_porcentaje):
+    return _si(_verdadero(valor_referencia),
+               _redondear(valor_referencia * (itp_porcentaje / 100.0)),
+               _redondear(valor_referencia * 0.03))
+
+
+def _ibi_sql(ibi_anual, ano_procedimiento, ano_actual):
+    anos = ano_actual - ano_procedimiento + 2
+    anos = case((anos < 0, 0), else_=anos)
+    return _si(and_(_verdadero(ibi_anual), _verdadero(ano_procedimiento)),
+               anos, _redondear(ibi_anual * anos))
+
+
+def _comunidad_sql(comunidad_anual, anos_total):
+    return _si(and_(_verdadero(comunidad_anual), _verdadero(anos_total)),
+               _redondear(comunidad_anual * anos_total))
+
+
+def _total_sql(*sumandos):
+    total = func.coalesce(sumandos[0], 0)
+    for sumando in sumandos[1:]:
+        total = total + func.coalesce(sumando, 0)
+    return (func.nullif(_redondear(total), 0),)
+
+
+def _margen_sql(venta, total_inversion):
+    return _si(and_(_verdadero(total_inversion), _verdadero(venta)),
+               _redondear(venta - total_inversion),
+               _redondear((venta - total_inversion) / total_inversion * 100))
+
+
+# En orden topológico: cada nodo solo depende de entradas o de salidas de nodos anteriores
+NODOS = (
+    Nodo('porcentaje_puja', ('puja', 'valor_subasta'), ('porcentaje_puja', 'veredicto'),
+         _porcentaje, _porcentaje_sql),
+    Nodo('itp_notaria', ('valor_referencia', 'itp_porcentaje'),
+         ('itp_calculado', 'notaria_registro'), _itp_notaria, _itp_notaria_sql),
+    Nodo('ibi_judicial', ('ibi_anual', 'ano_procedimiento', ANO_ACTUAL),
+         ('anos_total', 'ibi_total'), _ibi, _ibi_sql),
+    Nodo('comunidad_judicial', ('comunidad_anual', 'anos_total'), ('comunidad_total',),
+         _comunidad, _comunidad_sql),
+    Nodo('total_inversion', ('puja', 'itp_calculado', 'notaria_registro', 'ibi_total',
+                             'comunidad_total', 'alarmas', 'suministros', 'reforma'),
+         ('total_inversion',), _total, _total_sql),
+) + tuple(
+    Nodo(f'margen_{e}', (f'venta_{e}', 'total_inversion'), (f'margen_{e}', f'rentabilidad_{e}'),
+         _margen, _margen_sql)
+    for e in ESCENARIOS
+)
+
+SALIDAS = tuple(salida for nodo in NODOS for salida in nodo.salidas)
+
+
+def leer_entradas(datos):
+    """Entradas numéricas desde un formulario o JSON (vacío → valor por defecto; inválido → ValueError)"""
+    entradas = {}
+    for nombre, defecto in ENTRADAS.items():
+        valor = datos.get(nombre)
+        if valor is None or valor == '':
+            entradas[nombre] = defecto
+            continue
+        try:
+            numero = float(valor)
+        except (TypeError, ValueError):
+            numero = math.nan
+        if not math.isfinite(numero):
+            raise ValueError(f"Valor no válido en {nombre}: {valor!r}")
+        entradas[nombre] = type(defecto)(numero)
+    return entradas
+
+
+def calcular(entradas, anteriores=None, cambios=None, ano_actual=None):
+    """
+    Resultados de todas las salidas para las entradas dadas.
+    Con `anteriores` (resultados de la llamada previa) y `cambios` (entradas modificadas desde
+    entonces) solo se recalculan los nodos que dependen de los cambios.
+    Devuelve (resultados, nombres de los nodos recalculados).
+    """
+    valores = dict(entradas)
+    valores[ANO_ACTUAL] = ano_actual or datetime.now().year
+    if cambios is not None and anteriores is not None and all(s in anteriores for s in SALIDAS):
+        desconocidas = {str(c) for c in cambios} - set(ENTRADAS) - {ANO_ACTUAL}
+        if desconocidas:
+            raise ValueError(f"Entradas desconocidas: {', '.join(sorted(desconocidas))}")
+        valores.update((s, anteriores[s]) for s in SALIDAS)
+        modificados = set(map(str, cambios))
+    else:
+        modificados = set(ENTRADAS)
+
+    recalculados = []
+    for nodo in NODOS:
+        if modificados.isdisjoint(nodo.entradas):
+            continue
+        recalculados.append(nodo.nombre)
+        nuevos = nodo.funcion(*(valores[e] for e in nodo.entradas))
+        for salida, valor in zip(nodo.salidas, nuevos):
+            if salida not in valores or valores[salida] != valor:
+                valores[salida] = valor
+                modificados.add(salida)
+
+    return {s: valores[s] for s in SALIDAS}, recalculados
+
+
+def actualizar_analisis(analisis, entradas, ano_actual=None):
+    """
+    Aplica nuevas entradas a un análisis guardado recalculando solo lo que depende de ellas.
+    Los resultados guardados hacen de `anteriores`; solo se asignan las columnas cuyo valor
+    cambia, así que el UPDATE del ORM escribe únicamente esas.
+    Devuelve los nombres de las columnas modificadas.
+    """
+    cambios = [n for n in ENTRADAS if getattr(analisis, n) != entradas[n]]
+    if not cambios:
+        return []
+    anteriores = {s: getattr(analisis, s) for s in SALIDAS}
+    resultados, _ = calcular(entradas, anteriores, cambios, ano_actual)
+    return asignar(analisis, {**{n: entradas[n] for n in cambios}, **resultados})
+
+
+def asignar(objeto, valores):
+    """Asigna solo los atributos que cambian; devuelve sus nombres"""
+    modificados = []
+    for nombre, valor in valores.items():
+        if getattr(objeto, nombre) != valor:
+            setattr(objeto, nombre, valor)
+            modificados.append(nombre)
+    return modificados
+
+
+# ---------- Recálculo en la base de datos ----------
+
+def sentencia_recalculo(tabla, cambios, ano_actual=None):
+    """
+    UPDATE que recalcula en la propia base de datos las columnas que dependen de `cambios`
+    (nombres de entradas o ANO_ACTUAL), para todas las filas de una vez.
+    Las expresiones de los nodos intermedios se anidan en las siguientes, porque en un UPDATE
+    todas las asignaciones leen los valores previos de la fila. Solo toca las filas en las que
+    algún valor cambia. Añadir .where(...) para limitarlo (p. ej. a un usuario).
+    """
+    desconocidas = set(cambios) - set(ENTRADAS) - {ANO_ACTUAL}
+    if desconocidas:
+        raise ValueError(f"Entradas desconocidas: {', '.join(sorted(desconocidas))}")
+
+    expresiones = {nombre: tabla.c[nombre] for nombre in (*ENTRADAS, *SALIDAS)}
+    expresiones[ANO_ACTUAL] = literal(ano_actual or datetime.now().year)
+    modificados = set(cambios)
+    nuevos = {}
+    for nodo in NODOS:
+        if modificados.isdisjoint(nodo.entradas):
+            continue
+        for salida, expresion in zip(nodo.salidas, nodo.sql(*(expresiones[e] for e in nodo.entradas))):
+            expresiones[salida] = nuevos[salida] = expresion
+            modificados.add(salida)
+
+    if not nuevos:
+        return None
+    distintos = or_(*(tabla.c[s].is_distinct_from(e) for s, e in nuevos.items()))
+    return update(tabla).where(distintos).values(nuevos)
+
+
+def recalcular_guardados(cambios, user_id=None, ano_actual=None):
+    """
+    Recalcula los análisis guardados (de un usuario o de todos) con un único UPDATE.
+    Solo escribe columnas numéricas derivadas: codigo_provincia no cambia (el UPDATE no pasa
+    por los eventos del ORM, pero tampoco toca la dirección).
+    Devuelve el número de análisis modificados.
+    """
+    from .models import db, AnalisisSubasta
+    from . import analitica
+
+    tabla = AnalisisSubasta.__table__
+    sentencia = sentencia_recalculo(tabla, cambios, ano_actual)
+    if sentencia is None:
+        return 0
+    if user_id is not None:
+        sentencia = sentencia.where(tabla.c.user_id == user_id)
+    modificados = db.session.execute(sentencia).rowcount
+    db.session.commit()
+    analitica.invalidar(user_id)
+    return modificados
+
+
+def main(argumentos):
+    """python -m api.calculadora anos [año]: recalcula anos_total y dependientes de todos los análisis"""
+    if not argumentos or argumentos[0] != 'anos':
+        print(main.__doc__)
+        return 1
+    from .app import app
+
+    ano_actual = int(argumentos[1]) if len(argumentos) > 1 else None
+    with app.app_context():
+        modificados = recalcular_guardados([ANO_ACTUAL], ano_actual=ano_actual)
+    print(f'{modificados} análisis actualizados')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,165 @@
+"""
+Consultas de listado de análisis
+Paginación por cursor (keyset) sobre el índice (user_id, fecha_creacion, id),
+cargando solo las columnas que pintan las plantillas
+"""
+
+import json
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, func
+
+from .models import db, AnalisisSubasta
+from . import busqueda
+
+# Columnas que necesitan lista_analisis.html y dashboard.html
+COLUMNAS_LISTA = (
+    'id', 'fecha_creacion', 'identificador', 'direccion', 'puja',
+    'total_inversion', 'veredicto', 'rentabilidad_medio',
+)
+
+# Ordenaciones permitidas: clave → (columna, valor sustituto de NULL)
+ORDENES = {
+    'fecha': ('fecha_creacion', None),
+    'rentabilidad': ('rentabilidad_medio', -1e18),
+    'puja': ('puja', -1e18),
+    'inversion': ('total_inversion', -1e18),
+}
+
+VEREDICTOS = ('ADJUDICADO', 'POSIBLEMENTE', 'DEPENDE JUZGADO')
+
+POR_PAGINA = 25
+MAX_POR_PAGINA = 200
+
+
+def codificar_cursor(valor, analisis_id):
+    """Cursor opaco con la clave de ordenación y el id de la última fila"""
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    crudo = json.dumps([valor, analisis_id]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, orden):
+    """Inverso de codificar_cursor; lanza ValueError si el cursor no es válido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valor, analisis_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if ORDENES[orden][0] == 'fecha_creacion':
+            valor = datetime.fromisoformat(valor)
+        return valor, int(analisis_id)
+    except Exception:
+        raise ValueError("Cursor no válido")
+
+
+def _fecha(texto):
+    return datetime.strptime(texto, '%Y-%m-%d') if texto else None
+
+
+def _numero(texto):
+    return float(texto) if texto not in (None, '') else None
+
+
+def leer_filtros(args):
+    """Filtros y orden desde los parámetros de la petición (valores inválidos → ValueError)"""
+    orden = args.get('orden') or 'fecha'
+    if orden not in ORDENES:
+        raise ValueError("Orden no válido")
+    veredicto = args.get('veredicto') or None
+    if veredicto and veredicto not in VEREDICTOS:
+        raise ValueError("Veredicto no válido")
+    return {
+        'orden': orden,
+        'ascendente': args.get('dir') == 'asc',
+        'veredicto': veredicto,
+        'desde': _fecha(args.get('desde')),
+        'hasta': _fecha(args.get('hasta')),
+        'rentabilidad_min': _numero(args.get('rentabilidad_min')),
+        'rentabilidad_max': _numero(args.get('rentabilidad_max')),
+        'texto': (args.get('q') or '').strip() or None,
+    }
+
+
+def consulta_filtrada(user_id, veredicto=None, desde=None, hasta=None,
+                      rentabilidad_min=None, rentabilidad_max=None, texto=None, columnas=COLUMNAS_LISTA):
+    """Query de análisis del usuario con los filtros aplicados (sin ordenar ni paginar)"""
+    # La búsqueda de texto (api.busqueda) decide también cómo se filtra por usuario
+    condiciones = busqueda.filtro(user_id, texto) if texto else None
+    query = db.session.query(*(getattr(AnalisisSubasta, c) for c in columnas))\
+        .filter(*(condiciones or [AnalisisSubasta.user_id == user_id]))
+
+    if veredicto:
+        query = query.filter(AnalisisSubasta.veredicto == veredicto)
+    if desde:
+        query = query.filter(AnalisisSubasta.fecha_creacion >= desde)
+    if hasta:
+        # Fecha "hasta" inclusiva
+        query = query.filter(AnalisisSubasta.fecha_creacion < hasta + timedelta(days=1))
+    if rentabilidad_min is not None:
+        query = query.filter(AnalisisSubasta.rentabilidad_medio >= rentabilidad_min)
+    if rentabilidad_max is not None:
+        query = query.filter(AnalisisSubasta.rentabilidad_medio <= rentabilidad_max)
+    return query
+
+
+def clave_orden(orden):
+    """Expresión por la que se ordena (con los NULL sustituidos, para poder compararla en el cursor)"""
+    nombre, sustituto_null = ORDENES[orden]
+    columna = getattr(AnalisisSubasta, nombre)
+    return columna if sustituto_null is None else func.coalesce(columna, sustituto_null)
+
+
+def criterio_orden(orden, ascendente=False):
+    """Argumentos de order_by: clave de ordenación y el id como desempate"""
+    clave = clave_orden(orden)
+    if ascendente:
+        return clave.asc(), AnalisisSubasta.id.asc()
+    return clave.desc(), AnalisisSubasta.id.desc()
+
+
+def listar_analisis(user_id, cursor=None, limite=POR_PAGINA, orden='fecha', ascendente=False,
+                    columnas=COLUMNAS_LISTA, **filtros):
+    """
+    Una página de análisis. Devuelve (filas, cursor_siguiente);
+    cursor_siguiente es None en la última página.
+    """
+    limite = max(1, min(int(limite), MAX_POR_PAGINA))
+    nombre, sustituto_null = ORDENES[orden]
+    clave = clave_orden(orden)
+
+    columnas = tuple(columnas) + ((nombre,) if nombre not in columnas else ())
+    query = consulta_filtrada(user_id, columnas=columnas, **filtros)
+
+    if cursor:
+        valor, ultimo_id = decodificar_cursor(cursor, orden)
+        if ascendente:
+            query = query.filter(or_(clave > valor, and_(clave == valor, AnalisisSubasta.id > ultimo_id)))
+        else:
+            query = query.filter(or_(clave < valor, and_(clave == valor, AnalisisSubasta.id < ultimo_id)))
+
+    query = query.order_by(*criterio_orden(orden, ascendente))
+
+    # Una fila de más para saber si hay página siguiente
+    filas = query.limit(limite + 1).all()
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        valor = getattr(ultima, nombre)
+        if valor is None:
+            valor = sustituto_null
+        siguiente = codificar_cursor(valor, ultima.id)
+
+    return filas, siguiente
+
+
+def contar_analisis(user_id, **filtros):
+    """Número de análisis que cumplen los filtros"""
+    if filtros.get('texto') and all(v is None for k, v in filtros.items() if k != 'texto'):
+        # Solo búsqueda de texto: se cuenta en el índice sin leer la tabla
+        total = busqueda.contar(user_id, filtros['texto'])
+        if total is not None:
+            return total
+    return consulta_filtrada(user_id, columnas=('id',), **filtros)\
+        .with_entities(func.count(AnalisisSubasta.id)).scalar()
@@ -0,0 +1,273 @@
+"""
+Criba de análisis en memoria
+Por usuario se guarda una instantánea columnar de los campos numéricos (un array de numpy
+por columna, NaN = NULL) y los filtros con varias condiciones y el top-k ordenado se resuelven
+con máscaras vectorizadas, sin cargar objetos de la ORM.
+
+La instantánea se mantiene al día sin reconstruirla:
+- las escrituras por la ORM (crear, editar, eliminar) se aplican fila a fila al confirmar
+  la transacción (eventos after_flush/after_commit de la sesión)
+- las sentencias de Core sobre la tabla (importación, recalcular_guardados) la descartan
+  y se reconstruye en la siguiente consulta
+La caché es por proceso: las escrituras hechas en otros workers se ven al caducar CRIBA_TTL.
+"""
+
+import os
+import re
+import time
+import threading
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .models import db, AnalisisSubasta
+
+# Configuración (sobrescribible por variables de entorno)
+CACHE_TTL = int(os.environ.get('CRIBA_TTL', 300))
+MAX_LIMITE = 500
+
+TABLA = AnalisisSubasta.__table__
+
+# Columnas numéricas de la instantánea (float64; los enteros caben sin pérdida)
+CAMPOS = tuple(c.name for c in TABLA.columns
+               if c.name not in ('id', 'user_id', 'subasta_id')
+               and c.type.python_type in (int, float))
+
+VEREDICTOS = ('ADJUDICADO', 'POSIBLEMENTE', 'DEPENDE JUZGADO')
+_CODIGO_VEREDICTO = {v: i for i, v in enumerate(VEREDICTOS)}
+
+OPERADORES = {
+    '>=': np.greater_equal, '>': np.greater,
+    '<=': np.less_equal, '<': np.less,
+    '=': np.equal, '==': np.equal, '!=': np.not_equal,
+}
+PATRON_CONDICION = re.compile(r'^\s*([a-z_]+)\s*(>=|<=|==|!=|>|<|=)\s*(-?[0-9.]+(?:e-?\d+)?)\s*([kKmM%]?)\s*$')
+MULTIPLICADORES = {'': 1, '%': 1, 'k': 1e3, 'K': 1e3, 'm': 1e6, 'M': 1e6}
+
+
+def leer_condicion(texto):
+    """'deposito<10k' → ('deposito', '<', 10000.0); lanza ValueError si no es válida"""
+    coincidencia = PATRON_CONDICION.match(texto or '')
+    if not coincidencia:
+        raise ValueError(f"Condición no válida: {texto!r}")
+    campo, operador, numero, sufijo = coincidencia.groups()
+    if campo not in CAMPOS:
+        raise ValueError(f"Campo no válido: {campo}")
+    try:
+        valor = float(numero) * MULTIPLICADORES[sufijo]
+    except ValueError:
+        raise ValueError(f"Valor no válido: {numero}")
+    return campo, operador, valor
+
+
+class Instantanea:
+    """Columnas numéricas de los análisis de un usuario, ordenadas por id"""
+
+    def __init__(self, ids, columnas, veredictos):
+        self.n = len(ids)
+        capacidad = max(16, self.n)
+        self.ids = np.empty(capacidad, dtype=np.int64)
+        self.ids[:self.n] = ids
+        self.columnas = {}
+        for campo in CAMPOS:
+            array = np.empty(capacidad, dtype=np.float64)
+            array[:self.n] = columnas[campo]
+            self.columnas[campo] = array
+        self.veredictos = np.empty(capacidad, dtype=np.int8)
+        self.veredictos[:self.n] = veredictos
+        self.creada = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Filas (id, veredicto, *CAMPOS) ordenadas por id"""
+        if not filas:
+            return cls(np.empty(0, dtype=np.int64), {c: np.empty(0) for c in CAMPOS},
+                       np.empty(0, dtype=np.int8))
+        # Una sola conversión de toda la matriz (None → NaN) en vez de una por columna;
+        # numpy recorre las Row de SQLAlchemy mucho más despacio que las tuplas
+        matriz = np.array([tuple(f) for f in filas], dtype=object)
+        numeros = matriz[:, 2:].astype(np.float64)
+        return cls(matriz[:, 0].astype(np.int64),
+                   {c: numeros[:, j] for j, c in enumerate(CAMPOS)},
+                   np.array([_CODIGO_VEREDICTO.get(v, -1) for v in matriz[:, 1]], dtype=np.int8))
+
+    @classmethod
+    def cargar(cls, user_id):
+        consulta = select(TABLA.c.id, TABLA.c.veredicto, *(TABLA.c[c] for c in CAMPOS))\
+            .where(TABLA.c.user_id == user_id).order_by(TABLA.c.id)
+        return cls.desde_filas(db.session.execute(consulta).all())
+
+    @property
+    def nbytes(self):
+        return self.n * (8 + 1 + 8 * len(CAMPOS))
+
+    # ---------- Cambios fila a fila ----------
+
+    def _crecer(self):
+        capacidad = len(self.ids) * 2
+        self.ids = np.resize(self.ids, capacidad)
+        self.veredictos = np.resize(self.veredictos, capacidad)
+        for campo in CAMPOS:
+            self.columnas[campo] = np.resize(self.columnas[campo], capacidad)
+
+    def _posicion(self, analisis_id):
+        i = int(np.searchsorted(self.ids[:self.n], analisis_id))
+        return i, i < self.n and self.ids[i] == analisis_id
+
+    def guardar(self, analisis_id, valores):
+        """Inserta o sustituye la fila del análisis (valores: {campo: valor} y 'veredicto')"""
+        with self._lock:
+            i, existe = self._posicion(analisis_id)
+            if not existe:
+                if self.n == len(self.ids):
+                    self._crecer()
+                # Los ids nuevos suelen ser los mayores: el desplazamiento es casi siempre vacío
+                for array in (self.ids, self.veredictos, *self.columnas.values()):
+                    array[i + 1:self.n + 1] = array[i:self.n]
+                self.ids[i] = analisis_id
+                self.n += 1
+            self.veredictos[i] = _CODIGO_VEREDICTO.get(valores.get('veredicto'), -1)
+            for campo in CAMPOS:
+                valor = valores.get(campo)
+                self.columnas[campo][i] = np.nan if valor is None else valor
+
+    def borrar(self, analisis_id):
+        with self._lock:
+            i, existe = self._posicion(analisis_id)
+            if not existe:
+                return
+            for array in (self.ids, self.veredictos, *self.columnas.values()):
+                array[i:self.n - 1] = array[i + 1:self.n]
+            self.n -= 1
+
+    # ---------- Consultas ----------
+
+    def mascara(self, condiciones=(), veredicto=None):
+        """Filas que cumplen todas las condiciones (las comparaciones con NULL son falsas)"""
+        mascara = np.ones(self.n, dtype=bool)
+        for campo, operador, valor in condiciones:
+            mascara &= OPERADORES[operador](self.columnas[campo][:self.n], valor)
+        if veredicto is not None:
+            mascara &= self.veredictos[:self.n] == _CODIGO_VEREDICTO.get(veredicto, -2)
+        return mascara
+
+    def consultar(self, condiciones=(), veredicto=None, orden=None, ascendente=False, limite=50):
+        """
+        Devuelve (total, ids) de los que cumplen las condiciones: los `limite` primeros según
+        `orden` (NULL al final, desempate por id descendente) o los más recientes sin orden
+        """
+        with self._lock:
+            mascara = self.mascara(condiciones, veredicto)
+            posiciones = np.flatnonzero(mascara)
+            total = len(posiciones)
+            ids = self.ids[posiciones]
+            if orden is None:
+                return total, ids[::-1][:limite].tolist()
+
+            clave = self.columnas[orden][posiciones]
+            clave = clave if ascendente else -clave
+            clave = np.where(np.isnan(clave), np.inf, clave)
+
+        if limite < total:
+            # Top-k: se descartan las filas por encima del k-ésimo valor sin ordenar todo
+            umbral = np.partition(clave, limite - 1)[limite - 1]
+            candidatas = clave <= umbral
+            clave, ids = clave[candidatas], ids[candidatas]
+        seleccion = np.lexsort((-ids, clave))[:limite]
+        return total, ids[seleccion].tolist()
+
+
+# ================== CACHÉ POR USUARIO ==================
+
+_instantaneas = {}
+_cerrojo = threading.Lock()
+
+
+def instantanea(user_id):
+    """Instantánea del usuario (se carga de la base de datos si no hay una vigente)"""
+    with _cerrojo:
+        actual = _instantaneas.get(user_id)
+    if actual is not None and time.monotonic() - actual.creada < CACHE_TTL:
+        return actual
+    nueva = Instantanea.cargar(user_id)
+    with _cerrojo:
+        _instantaneas[user_id] = nueva
+    return nueva
+
+
+def invalidar(user_id=None):
+    """Descarta la instantánea del usuario (o todas): se recarga en la siguiente consulta"""
+    with _cerrojo:
+        if user_id is None:
+            _instantaneas.clear()
+        else:
+            _instantaneas.pop(user_id, None)
+
+
+def buscar(user_id, condiciones=(), veredicto=None, orden=None, ascendente=False, limite=50):
+    """Criba de los análisis del usuario; devuelve (total, ids)"""
+    if orden is not None and orden not in CAMPOS:
+        raise ValueError(f"Orden no válido: {orden}")
+    limite = max(1, min(int(limite), MAX_LIMITE))
+    return instantanea(user_id).consultar(condiciones, veredicto, orden, ascendente, limite)
+
+
+# ================== SINCRONIZACIÓN CON LAS ESCRITURAS ==================
+
+def _valores(analisis):
+    return {campo: getattr(analisis, campo) for campo in (*CAMPOS, 'veredicto')}
+
+
+@event.listens_for(Session, 'after_flush')
+def _anotar_cambios(sesion, contexto):
+    """Anota los análisis escritos en el flush; se aplican cuando se confirma la transacción"""
+    pendientes = sesion.info.setdefault('criba_pendientes', [])
+    for analisis in (*sesion.new, *sesion.dirty):
+        if isinstance(analisis, AnalisisSubasta):
+            pendientes.append((analisis.user_id, analisis.id, _valores(analisis)))
+    for analisis in sesion.deleted:
+        if isinstance(analisis, AnalisisSubasta):
+            pendientes.append((analisis.user_id, analisis.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _aplicar_cambios(sesion):
+    for user_id, analisis_id, valores in sesion.info.pop('criba_pendientes', ()):
+        with _cerrojo:
+            actual = _instantaneas.get(user_id)
+        if actual is None:
+            continue
+        if valores is None:
+            actual.borrar(analisis_id)
+        else:
+            actual.guardar(analisis_id, valores)
+    for user_id in sesion.info.pop('criba_invalidar', ()):
+        invalidar(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_cambios(sesion, transaccion):
+    sesion.info.pop('criba_pendientes', None)
+    for user_id in sesion.info.pop('criba_invalidar', ()):
+        invalidar(user_id)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _sentencia_core(estado):
+    """INSERT/UPDATE/DELETE de Core sobre la tabla: se descartan las instantáneas afectadas"""
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return
+    tabla = getattr(estado.statement, 'table', None)
+    if tabla is None or tabla.name != TABLA.name:
+        return
+    parametros = estado.parameters
+    lista = parametros if isinstance(parametros, list) else [parametros or {}]
+    usuarios = {p.get('user_id') for p in lista}
+    if not estado.is_insert or None in usuarios:
+        usuarios = {None}
+    # Ahora y de nuevo al confirmar (por si otra petición recargó entre medias)
+    for user_id in usuarios:
+        invalidar(user_id)
+    estado.session.info.setdefault('criba_invalidar', set()).update(usuarios)
@@ -0,0 +1,151 @@
+"""
+Capa de descarga de páginas del BOE
+Sesión HTTP compartida (keep-alive), descargas concurrentes con plazo total y reintentos
+"""
+
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metricas
+
+# Configuración (sobrescribible por variables de entorno)
+PLAZO_TOTAL = float(os.environ.get('BOE_PLAZO_TOTAL', 12))
+TIMEOUT_CONEXION = float(os.environ.get('BOE_TIMEOUT_CONEXION', 3.05))
+REINTENTOS = int(os.environ.get('BOE_REINTENTOS', 2))
+BACKOFF = float(os.environ.get('BOE_BACKOFF', 0.3))
+TAMANO_POOL = int(os.environ.get('BOE_TAMANO_POOL', 16))
+
+# Códigos de estado que merecen un reintento
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+CABECERAS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; SubastasVisual/1.0)',
+    'Accept': 'text/html,application/xhtml+xml',
+    'Accept-Language': 'es-ES,es;q=0.9',
+}
+
+_sesion = None
+_executor = None
+_lock = threading.Lock()
+
+
+def obtener_sesion():
+    """Devuelve la sesión HTTP compartida (creada bajo demanda)"""
+    global _sesion
+    if _sesion is None:
+        with _lock:
+            if _sesion is None:
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=TAMANO_POOL, pool_maxsize=TAMANO_POOL)
+                sesion.mount('http://', adaptador)
+                sesion.mount('https://', adaptador)
+                sesion.headers.update(CABECERAS)
+                _sesion = sesion
+    return _sesion
+
+
+def _obtener_executor():
+    """Devuelve el pool de hilos compartido para las descargas"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=TAMANO_POOL,
+                                               thread_name_prefix='descarga-boe')
+    return _executor
+
+
+def descargar(url, limite, sesion=None, reintentos=REINTENTOS, backoff=BACKOFF, cabeceras=None):
+    """Descarga una URL antes del instante `limite` (time.monotonic), con reintentos y backoff"""
+    sesion = sesion or obtener_sesion()
+    intento = 0
+
+    while True:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise TimeoutError(f"Plazo agotado descargando {url}")
+
+        try:
+            response = sesion.get(url, headers=cabeceras,
+                                  timeout=(min(TIMEOUT_CONEXION, restante), restante))
+            if response.status_code not in ESTADOS_REINTENTABLES:
+                response.raise_for_status()
+                return response
+            error = requests.HTTPError(f"HTTP {response.status_code} en {url}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        if intento >= reintentos:
+            raise error
+
+        # Espera exponencial sin sobrepasar el plazo total
+        espera = backoff * (2 ** intento)
+        if time.monotonic() + espera >= limite:
+            raise error
+        time.sleep(espera)
+        intento += 1
+
+
+def validadores(respuesta):
+    """ETag y Last-Modified de una respuesta (para peticiones condicionales)"""
+    return {
+        'etag': respuesta.headers.get('ETag'),
+        'last_modified': respuesta.headers.get('Last-Modified'),
+    }
+
+
+def cabeceras_condicionales(validadores):
+    """If-None-Match / If-Modified-Since a partir de los validadores guardados"""
+    cabeceras = {}
+    if validadores.get('etag'):
+        cabeceras['If-None-Match'] = validadores['etag']
+    if validadores.get('last_modified'):
+        cabeceras['If-Modified-Since'] = validadores['last_modified']
+    return cabeceras
+
+
+def _descargar_medido(url, limite, sesion, cabeceras):
+    with metricas.tramo('boe_descarga', urlparse(url).query):
+        return descargar(url, limite, sesion, cabeceras=cabeceras)
+
+
+def descargar_respuestas(urls, plazo=None, sesion=None, cabeceras=None):
+    """
+    Descarga varias URLs a la vez con un plazo total común.
+    `cabeceras` es opcional: una lista con las cabeceras extra de cada URL (p.ej. If-None-Match).
+    Devuelve una lista (en el mismo orden que `urls`) con la respuesta de cada página,
+    o None si esa página falló o no llegó a tiempo.
+    """
+    plazo = PLAZO_TOTAL if plazo is None else plazo
+    limite = time.monotonic() + plazo
+    executor = _obtener_executor()
+    cabeceras = cabeceras or [None] * len(urls)
+
+    # Cada descarga corre en el contexto de la petición para anotar su tramo en Server-Timing
+    futuros = [executor.submit(contextvars.copy_context().run, _descargar_medido, url, limite,
+                               sesion, extra)
+               for url, extra in zip(urls, cabeceras)]
+    wait(futuros, timeout=max(limite - time.monotonic(), 0))
+
+    respuestas = []
+    for futuro in futuros:
+        if futuro.done() and futuro.exception() is None:
+            respuestas.append(futuro.result())
+        else:
+            futuro.cancel()
+            respuestas.append(None)
+
+    return respuestas
+
+
+def descargar_paginas(urls, plazo=None, sesion=None):
+    """Igual que descargar_respuestas pero devuelve directamente el HTML (o None)"""
+    return [r.text if r is not None else None
+            for r in descargar_respuestas(urls, plazo, sesion)]
@@ -0,0 +1,131 @@
+"""
+Motor vectorizado de escenarios y sensibilidad
+Replica con NumPy la cadena de cálculos de calcular_analisis (subasta_logic.calcular_*)
+sobre arrays o rejillas de entradas, con resultados idénticos a los escalares
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+# Entradas del motor y su valor por defecto
+ENTRADAS = {
+    'puja': 0.0,
+    'valor_subasta': 0.0,
+    'valor_referencia': 0.0,
+    'itp_porcentaje': 7.0,
+    'ano_procedimiento': 0,
+    'ibi_anual': 0.0,
+    'comunidad_anual': 0.0,
+    'alarmas': 0.0,
+    'suministros': 0.0,
+    'reforma': 0.0,
+    'venta_bajo': 0.0,
+    'venta_medio': 0.0,
+    'venta_alto': 0.0,
+}
+
+ESCENARIOS = ('bajo', 'medio', 'alto')
+
+VEREDICTOS = np.array(['', 'DEPENDE JUZGADO', 'POSIBLEMENTE', 'ADJUDICADO'])
+
+
+def redondear(x, decimales=2):
+    """
+    round(x, 2) de Python sobre arrays. np.round puede diferir en los casos a medio camino
+    (x*100 no es exacto en binario): esos pocos valores se redondean con round() escalar.
+    """
+    x = np.asarray(x, dtype=float)
+    factor = 10.0 ** decimales
+    escalado = x * factor
+    resultado = np.round(escalado) / factor
+
+    distancia = np.abs(escalado - np.floor(escalado) - 0.5)
+    dudosos = (distancia < 1e-12 * np.abs(escalado) + 1e-9) & np.isfinite(x)
+    if dudosos.any():
+        resultado = np.array(resultado, copy=True)
+        resultado[dudosos] = [round(v, decimales) for v in x[dudosos].tolist()]
+    return resultado
+
+
+def _donde(mascara, valores):
+    """valores donde mascara, NaN (equivalente a None) en el resto"""
+    return np.where(mascara, valores, np.nan)
+
+
+def evaluar(ano_actual=None, **entradas):
+    """
+    Evalúa la cadena completa de cálculos. Cada entrada puede ser un escalar o un array;
+    se combinan por broadcasting. Devuelve un dict de arrays con los mismos nombres que las
+    columnas de AnalisisSubasta; NaN donde la versión escalar dejaría None.
+    """
+    desconocidas = set(entradas) - set(ENTRADAS)
+    if desconocidas:
+        raise ValueError(f"Entradas desconocidas: {', '.join(sorted(desconocidas))}")
+
+    if ano_actual is None:
+        ano_actual = datetime.now().year
+
+    v = {nombre: np.asarray(entradas.get(nombre, defecto), dtype=float)
+         for nombre, defecto in ENTRADAS.items()}
+    r = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Porcentaje de puja y veredicto (calcular_porcentaje_puja)
+        hay_puja = (v['puja'] != 0) & (v['valor_subasta'] != 0)
+        porcentaje = (v['puja'] / v['valor_subasta']) * 100
+        r['porcentaje_puja'] = _donde(hay_puja, redondear(porcentaje))
+        codigo = np.select([porcentaje >= 70, porcentaje >= 50], [3, 2], default=1)
+        r['veredicto'] = VEREDICTOS[np.where(hay_puja, codigo, 0)]
+
+        # ITP y notaría (calcular_itp_notaria)
+        hay_referencia = v['valor_referencia'] != 0
+        r['itp_calculado'] = _donde(
+            hay_referencia, redondear(v['valor_referencia'] * (v['itp_porcentaje'] / 100)))
+        r['notaria_registro'] = _donde(hay_referencia, redondear(v['valor_referencia'] * 0.03))
+
+        # IBI judicial (calcular_ibi_judicial)
+        hay_ibi = (v['ibi_anual'] != 0) & (v['ano_procedimiento'] != 0)
+        anos = np.maximum(ano_actual - np.trunc(v['ano_procedimiento']) + 2, 0)
+        r['anos_total'] = _donde(hay_ibi, anos)
+        r['ibi_total'] = _donde(hay_ibi, redondear(v['ibi_anual'] * anos))
+
+        # Comunidad judicial (calcular_comunidad_judicial): necesita anos_total calculado
+        hay_comunidad = (v['comunidad_anual'] != 0) & hay_ibi & (anos != 0)
+        r['comunidad_total'] = _donde(hay_comunidad, redondear(v['comunidad_anual'] * anos))
+
+        # Total inversión (calcular_total_inversion), sumando en el mismo orden
+        total = v['puja'] + np.nan_to_num(r['itp_calculado'])
+        for sumando in (np.nan_to_num(r['notaria_registro']), np.nan_to_num(r['ibi_total']),
+                        np.nan_to_num(r['comunidad_total']), v['alarmas'], v['suministros'],
+                        v['reforma']):
+            total = total + sumando
+        total = redondear(total)
+        hay_total = total != 0
+        r['total_inversion'] = _donde(hay_total, total)
+
+        # Márgenes y rentabilidad por escenario (calcular_margen_rentabilidad)
+        for escenario in ESCENARIOS:
+            venta = v[f'venta_{escenario}']
+            hay_margen = hay_total & (venta != 0)
+            margen = venta - total
+            r[f'margen_{escenario}'] = _donde(hay_margen, redondear(margen))
+            r[f'rentabilidad_{escenario}'] = _donde(hay_margen, redondear((margen / total) * 100))
+
+    forma = np.broadcast_shapes(*(a.shape for a in v.values()))
+    return {nombre: np.broadcast_to(valor, forma) for nombre, valor in r.items()}
+
+
+def rejilla(ejes, ano_actual=None, **fijos):
+    """
+    Barrido sobre el producto cartesiano de `ejes` ({entrada: valores}).
+    Cada eje ocupa una dimensión del resultado, en el orden del dict; el resto de entradas
+    son escalares fijos. Los arrays de entrada no se replican (broadcasting).
+    """
+    n = len(ejes)
+    entradas = dict(fijos)
+    for i, (nombre, valores) in enumerate(ejes.items()):
+        forma = [1] * n
+        forma[i] = -1
+        entradas[nombre] = np.asarray(valores, dtype=float).reshape(forma)
+    return evaluar(ano_actual=ano_actual, **entradas)
@@ -0,0 +1,197 @@
+"""
+Exportación de los análisis de un usuario a CSV, Parquet o XLSX
+Las filas se leen por bloques (yield_per) y se escriben de forma incremental,
+así que la memoria no depende del número de análisis
+"""
+
+import io
+import os
+import csv
+import tempfile
+import importlib.util
+from itertools import islice
+
+from .models import AnalisisSubasta
+from .subasta_logic import formatear_numero
+from . import consultas
+
+FILAS_POR_BLOQUE = int(os.environ.get('EXPORTACION_BLOQUE', 1000))
+TAMANO_TROZO = 64 * 1024
+
+# Columnas exportables, en el orden del modelo (sin user_id ni el enlace a la subasta compartida)
+COLUMNAS = tuple(c.name for c in AnalisisSubasta.__table__.columns
+                 if c.name not in ('user_id', 'subasta_id'))
+TIPOS = {c.name: c.type.python_type for c in AnalisisSubasta.__table__.columns}
+
+# formato → (mimetype, extensión)
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# Dependencias opcionales por formato
+DEPENDENCIAS = {'parquet': 'pyarrow', 'xlsx': 'openpyxl'}
+
+
+def leer_opciones(args):
+    """Formato, columnas y formato de números desde los parámetros (valores inválidos → ValueError)"""
+    formato = args.get('formato') or 'csv'
+    if formato not in FORMATOS:
+        raise ValueError("Formato de exportación no soportado")
+
+    columnas = tuple(c.strip() for c in (args.get('columnas') or '').split(',') if c.strip()) \
+        or COLUMNAS
+    desconocidas = [c for c in columnas if c not in COLUMNAS]
+    if desconocidas:
+        raise ValueError(f"Columnas no válidas: {', '.join(desconocidas)}")
+
+    numeros = args.get('numeros') or 'es'
+    if numeros not in ('es', 'punto'):
+        raise ValueError("Formato de números no válido")
+
+    return {'formato': formato, 'columnas': columnas, 'numeros_es': numeros == 'es'}
+
+
+def filas_usuario(user_id, columnas=COLUMNAS, orden='fecha', ascendente=False, **filtros):
+    """Filas del usuario con los filtros del listado, leídas del cursor por bloques"""
+    return consultas.consulta_filtrada(user_id, columnas=columnas, **filtros)\
+        .order_by(*consultas.criterio_orden(orden, ascendente))\
+        .yield_per(FILAS_POR_BLOQUE)
+
+
+def _bloques(filas, tamano=FILAS_POR_BLOQUE):
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+def _convertidor_texto(tipo, numeros_es):
+    if tipo is float:
+        if numeros_es:
+            return lambda v: '' if v is None else formatear_numero(v)
+        return lambda v: '' if v is None else repr(v)
+    if tipo is int or tipo is str:
+        return lambda v: '' if v is None else str(v)
+    # Fechas
+    return lambda v: '' if v is None else v.isoformat(sep=' ', timespec='seconds')
+
+
+def exportar_csv(filas, columnas=COLUMNAS, numeros_es=True):
+    """
+    Generador de trozos CSV (bytes). Con números en formato español el separador es ';'
+    (la coma es el separador decimal), como espera Excel en configuración española.
+    """
+    convertidores = [_convertidor_texto(TIPOS[c], numeros_es) for c in columnas]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';' if numeros_es else ',')
+
+    # BOM para que Excel detecte UTF-8
+    buffer.write('\ufeff')
+    escritor.writerow(columnas)
+    for bloque in _bloques(filas):
+        escritor.writerows([conv(v) for conv, v in zip(convertidores, fila)] for fila in bloque)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _SalidaIncremental:
+    """Fichero de solo escritura que acumula bytes hasta que se vacían (sink para ParquetWriter)"""
+
+    closed = False
+
+    def __init__(self):
+        self._trozos = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._trozos.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos = b''.join(self._trozos)
+        self._trozos = []
+        return datos
+
+
+def exportar_parquet(filas, columnas=COLUMNAS):
+    """Generador de trozos Parquet: un row group por bloque de filas (requiere pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("La exportación a Parquet requiere el paquete pyarrow")
+
+    tipos_arrow = {float: pa.float64(), int: pa.int64(), str: pa.string()}
+    esquema = pa.schema([(c, tipos_arrow.get(TIPOS[c], pa.timestamp('us'))) for c in columnas])
+
+    salida = _SalidaIncremental()
+    escritor = pq.ParquetWriter(salida, esquema)
+    try:
+        for bloque in _bloques(filas):
+            escritor.write_table(pa.table(
+                [[fila[i] for fila in bloque] for i in range(len(columnas))], schema=esquema))
+            yield salida.vaciar()
+    finally:
+        escritor.close()
+    yield salida.vaciar()
+
+
+def exportar_xlsx(filas, columnas=COLUMNAS):
+    """
+    Generador de trozos XLSX (requiere openpyxl). El XLSX es un zip que no se puede emitir
+    a medias: se escribe en modo write_only a un fichero temporal y luego se envía por trozos.
+    Los números se guardan como números (Excel los muestra con el separador decimal del sistema);
+    dar formato celda a celda triplica el tiempo de openpyxl.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("La exportación a XLSX requiere el paquete openpyxl")
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Análisis')
+    hoja.append(columnas)
+    for bloque in _bloques(filas):
+        for fila in bloque:
+            hoja.append(tuple(fila))
+
+    with tempfile.TemporaryFile() as temporal:
+        libro.save(temporal)
+        temporal.seek(0)
+        while True:
+            trozo = temporal.read(TAMANO_TROZO)
+            if not trozo:
+                break
+            yield trozo
+
+
+def exportar(user_id, formato='csv', columnas=COLUMNAS, numeros_es=True, **filtros):
+    """Generador de bytes del fichero exportado con los análisis del usuario"""
+    # Se comprueba antes de empezar a enviar la respuesta, no a mitad de la descarga
+    paquete = DEPENDENCIAS.get(formato)
+    if paquete and importlib.util.find_spec(paquete) is None:
+        raise ValueError(f"La exportación a {formato.upper()} requiere el paquete {paquete}")
+
+    filas = filas_usuario(user_id, columnas=columnas, **filtros)
+    if formato == 'parquet':
+        return exportar_parquet(filas, columnas)
+    if formato == 'xlsx':
+        return exportar_xlsx(filas, columnas)
+    return exportar_csv(filas, columnas, numeros_es)
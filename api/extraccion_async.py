@@ -0,0 +1,131 @@
+"""
+Extracción asíncrona de subastas del BOE
+Descarga con httpx.AsyncClient (keep-alive, plazo total, reintentos) y parseo en un hilo aparte
+"""
+
+import time
+import asyncio
+import weakref
+
+import httpx
+
+from . import subasta_logic, descarga_boe, cache_subastas
+
+# Un cliente por bucle de eventos: sus conexiones solo sirven en el bucle que las abrió, y
+# sustituirlo al cambiar de bucle dejaba sin cerrar el que otro bucle seguía usando
+_clientes = weakref.WeakKeyDictionary()
+
+
+def obtener_cliente():
+    """Cliente HTTP asíncrono compartido por el bucle de eventos actual"""
+    bucle = asyncio.get_running_loop()
+    cliente = _clientes.get(bucle)
+    if cliente is None or cliente.is_closed:
+        cliente = _clientes[bucle] = httpx.AsyncClient(
+            headers=descarga_boe.CABECERAS,
+            limits=httpx.Limits(max_connections=None,
+                                max_keepalive_connections=descarga_boe.TAMANO_POOL * 4),
+        )
+    return cliente
+
+
+async def cerrar_cliente():
+    """Cierra el cliente del bucle actual (al apagar el servidor ASGI o al acabar asyncio.run)"""
+    cliente = _clientes.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+async def descargar_async(url, limite, cliente=None, reintentos=descarga_boe.REINTENTOS,
+                          backoff=descarga_boe.BACKOFF, cabeceras=None):
+    """Equivalente asíncrono de descarga_boe.descargar"""
+    cliente = cliente or obtener_cliente()
+    intento = 0
+
+    while True:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise TimeoutError(f"Plazo agotado descargando {url}")
+
+        try:
+            timeout = httpx.Timeout(restante, connect=min(descarga_boe.TIMEOUT_CONEXION, restante))
+            response = await cliente.get(url, headers=cabeceras, timeout=timeout)
+            if response.status_code not in descarga_boe.ESTADOS_REINTENTABLES:
+                response.raise_for_status()
+                return response
+            error = httpx.HTTPStatusError(f"HTTP {response.status_code} en {url}",
+                                          request=response.request, response=response)
+        except httpx.TransportError as e:
+            error = e
+
+        if intento >= reintentos:
+            raise error
+
+        # Espera exponencial sin sobrepasar el plazo total
+        espera = backoff * (2 ** intento)
+        if time.monotonic() + espera >= limite:
+            raise error
+        await asyncio.sleep(espera)
+        intento += 1
+
+
+async def descargar_respuestas_async(urls, plazo=None, cliente=None, cabeceras=None):
+    """Equivalente asíncrono de descarga_boe.descargar_respuestas (None = página fallida)"""
+    plazo = descarga_boe.PLAZO_TOTAL if plazo is None else plazo
+    limite = time.monotonic() + plazo
+    cabeceras = cabeceras or [None] * len(urls)
+
+    tareas = [asyncio.ensure_future(descargar_async(url, limite, cliente, cabeceras=extra))
+              for url, extra in zip(urls, cabeceras)]
+    await asyncio.wait(tareas, timeout=max(limite - time.monotonic(), 0))
+
+    respuestas = []
+    for tarea in tareas:
+        if tarea.done() and not tarea.cancelled() and tarea.exception() is None:
+            respuestas.append(tarea.result())
+        else:
+            tarea.cancel()
+            respuestas.append(None)
+
+    return respuestas
+
+
+async def extraer_datos_subasta_async(urlbase):
+    """Versión asíncrona de subasta_logic.extraer_datos_subasta"""
+    urls = subasta_logic.construir_urls(urlbase)
+    respuestas = await descargar_respuestas_async(urls)
+    paginas = [r.text if r is not None else None for r in respuestas]
+
+    # El parseo es CPU: fuera del bucle de eventos
+    return await asyncio.to_thread(subasta_logic.parsear_paginas, paginas)
+
+
+async def obtener_datos_subasta_async(urlbase, cache=None):
+    """Extracción asíncrona pasando por la caché compartida (mismo flujo que CacheSubastas.obtener)"""
+    cache = cache or cache_subastas.cache
+    # Consultar lee el nivel persistente (SQLite o la tabla subastas): fuera del bucle de eventos
+    clave, entrada, datos = await asyncio.to_thread(cache.consultar, urlbase)
+    if datos is not None:
+        return datos
+
+    urls = subasta_logic.construir_urls(urlbase)
+    respuestas = await descargar_respuestas_async(
+        urls, cabeceras=cache.cabeceras_revalidacion(entrada)
+    )
+
+    # Renovar escribe en el nivel persistente: también en un hilo
+    datos = await asyncio.to_thread(cache.renovar_si_no_modificada, clave, entrada, respuestas)
+    if datos is not None:
+        return datos
+
+    pendientes = cache.pendientes_de_descarga(respuestas)
+    if pendientes:
+        nuevas = await descargar_respuestas_async([urls[i] for i in pendientes])
+        for i, r in zip(pendientes, nuevas):
+            respuestas[i] = r
+
+    datos = cache.obsoleta_si_falla(entrada, respuestas)
+    if datos is not None:
+        return datos
+
+    return await asyncio.to_thread(cache.almacenar, clave, respuestas)
@@ -0,0 +1,95 @@
+"""
+Extracción por lotes de subastas del BOE
+Pool de trabajadores acotado con límite de concurrencia por host; resultados por URL según terminan
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from . import cache_subastas
+
+# Configuración (sobrescribible por variables de entorno)
+MAX_TRABAJADORES = int(os.environ.get('BOE_LOTE_TRABAJADORES', 8))
+MAX_POR_HOST = int(os.environ.get('BOE_LOTE_POR_HOST', 4))
+MAX_URLS = int(os.environ.get('BOE_LOTE_MAX_URLS', 500))
+
+
+class LimitadorHosts:
+    """Un semáforo por host para no saturar a un mismo servidor"""
+
+    def __init__(self, max_por_host=MAX_POR_HOST):
+        self.max_por_host = max_por_host
+        self._semaforos = {}
+        self._lock = threading.Lock()
+
+    def semaforo(self, host):
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.max_por_host)
+            return self._semaforos[host]
+
+
+def validar_url(url):
+    """Devuelve el host de la URL o lanza ValueError si no es una URL http(s) válida"""
+    if not isinstance(url, str) or not url.strip():
+        raise ValueError("URL vacía")
+    p = urlparse(url.strip())
+    if p.scheme not in ('http', 'https') or not p.netloc:
+        raise ValueError("URL no válida")
+    return p.netloc.lower()
+
+
+def _extraer_uno(url, host, limitador, extraer):
+    with limitador.semaforo(host):
+        datos = extraer(url)
+    if not any(datos.values()):
+        raise ValueError("No se pudieron obtener datos de la subasta")
+    return datos
+
+
+def extraer_lote(urls, extraer=None, max_trabajadores=MAX_TRABAJADORES, max_por_host=MAX_POR_HOST):
+    """
+    Extrae los datos de varias subastas. Generador que produce un dict por URL
+    en el orden en que terminan ({'indice', 'url', 'success', 'datos'} o {'indice', 'url', 'error'})
+    y al final un dict {'resumen': {...}}.
+    """
+    if extraer is None:
+        # Los hilos del pool no tienen contexto de aplicación: el nivel persistente se enlaza aquí
+        cache_subastas.preparar()
+        extraer = cache_subastas.obtener_datos_subasta
+    limitador = LimitadorHosts(max_por_host)
+    correctas = errores = 0
+
+    executor = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix='lote-boe')
+    futuros = {}
+    try:
+        for indice, url in enumerate(urls):
+            try:
+                host = validar_url(url)
+            except ValueError as e:
+                errores += 1
+                yield {'indice': indice, 'url': url, 'error': str(e)}
+                continue
+            url = url.strip()
+            futuro = executor.submit(_extraer_uno, url, host, limitador, extraer)
+            futuros[futuro] = (indice, url)
+
+        for futuro in as_completed(futuros):
+            indice, url = futuros[futuro]
+            try:
+                datos = futuro.result()
+            except Exception as e:
+                errores += 1
+                yield {'indice': indice, 'url': url, 'error': str(e)}
+            else:
+                correctas += 1
+                yield {'indice': indice, 'url': url, 'success': True, 'datos': datos}
+
+        yield {'resumen': {'total': correctas + errores, 'correctas': correctas, 'errores': errores}}
+    finally:
+        # Si el cliente se desconecta a mitad, no seguir con las pendientes
+        for futuro in futuros:
+            futuro.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,241 @@
+"""
+Importación masiva de análisis desde CSV/XLSX
+Lee las filas en streaming, calcula los campos derivados por lotes con el motor vectorizado
+(api.escenarios) e inserta con executemany, confirmando por bloques
+"""
+
+import io
+import csv
+import math
+import itertools
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from .models import db, AnalisisSubasta, buscar_subastas
+from . import escenarios, numeros, subasta_logic
+
+TAMANO_LOTE = 2000
+MAX_ERRORES_INFORME = 1000
+
+# Columnas de texto que se copian tal cual
+CAMPOS_TEXTO = ('url_subasta', 'identificador', 'fecha_conclusion', 'direccion',
+                'referencia_catastral', 'notas')
+
+# Columnas numéricas de entrada (las mismas que el formulario de calcular_analisis)
+CAMPOS_NUMERICOS = ('cantidad_reclamada', 'valor_subasta', 'tasacion', 'tramos_pujas', 'deposito',
+                    'puja', 'valor_referencia', 'itp_porcentaje', 'ano_procedimiento',
+                    'ibi_anual', 'comunidad_anual', 'alarmas', 'suministros', 'reforma',
+                    'venta_bajo', 'venta_medio', 'venta_alto')
+
+CAMPOS_OBLIGATORIOS = ('puja',)
+
+# Longitud máxima de cada texto según su columna (None = sin límite, p.ej. notas): en
+# PostgreSQL un texto demasiado largo haría fallar el lote entero en el INSERT
+LARGOS_TEXTO = {campo: getattr(AnalisisSubasta.__table__.c[campo].type, 'length', None)
+                for campo in CAMPOS_TEXTO}
+
+# ano_procedimiento es un Integer de 32 bits
+MAX_ENTERO = 2 ** 31 - 1
+
+# Campos derivados que calcula el motor
+CAMPOS_DERIVADOS = ('porcentaje_puja', 'veredicto', 'itp_calculado', 'notaria_registro',
+                    'anos_total', 'ibi_total', 'comunidad_total', 'total_inversion',
+                    'margen_bajo', 'rentabilidad_bajo', 'margen_medio', 'rentabilidad_medio',
+                    'margen_alto', 'rentabilidad_alto')
+
+
+def leer_numero(texto):
+    """Número en formato español (1.234,56 / 185.000) o con punto decimal (1234.56); '' → 0"""
+    if texto is None or (isinstance(texto, str) and not texto.strip(numeros.ADORNOS)):
+        return 0.0
+    valor = numeros.leer_importe(texto)
+    if valor is None:
+        raise ValueError
+    return valor
+
+
+def leer_fecha(texto):
+    if isinstance(texto, datetime):
+        return texto
+    texto = str(texto).strip()
+    for formato in ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M'):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    raise ValueError
+
+
+def _normalizar_cabecera(nombre):
+    return str(nombre or '').strip().lower().replace(' ', '_')
+
+
+def filas_csv(flujo_binario):
+    """Itera las filas de un CSV (UTF-8, separador ; , o tabulador detectado) como dicts"""
+    texto = io.TextIOWrapper(flujo_binario, encoding='utf-8-sig', newline='')
+    # El separador es el que más aparece en la cabecera (csv.Sniffer falla con comillas en los datos)
+    primera = texto.readline()
+    separador = max(';,\t', key=primera.count)
+    lector = csv.reader(itertools.chain([primera], texto), delimiter=separador)
+    cabecera = [_normalizar_cabecera(c) for c in next(lector, [])]
+    for valores in lector:
+        if any(v.strip() for v in valores):
+            yield dict(zip(cabecera, valores))
+
+
+def filas_xlsx(flujo_binario):
+    """Itera las filas de la primera hoja de un XLSX (openpyxl en modo solo lectura)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("La importación de XLSX requiere el paquete openpyxl")
+
+    libro = load_workbook(flujo_binario, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        cabecera = [_normalizar_cabecera(c) for c in next(filas, [])]
+        for valores in filas:
+            if any(v not in (None, '') for v in valores):
+                yield dict(zip(cabecera, valores))
+    finally:
+        libro.close()
+
+
+def validar_fila(fila):
+    """Convierte una fila leída en valores de columna; devuelve (valores, errores)"""
+    valores, errores = {}, []
+
+    for campo in CAMPOS_TEXTO:
+        valor = fila.get(campo)
+        valores[campo] = '' if valor is None else str(valor).strip()
+        largo = LARGOS_TEXTO[campo]
+        if largo is not None and len(valores[campo]) > largo:
+            errores.append(f"{campo}: texto demasiado largo ({len(valores[campo])} caracteres, "
+                           f"máximo {largo})")
+
+    for campo in CAMPOS_NUMERICOS:
+        try:
+            valores[campo] = leer_numero(fila.get(campo))
+        except (TypeError, ValueError):
+            errores.append(f"{campo}: valor numérico no válido ({fila.get(campo)!r})")
+
+    for campo in CAMPOS_OBLIGATORIOS:
+        if campo in valores and not valores[campo]:
+            errores.append(f"{campo}: obligatorio")
+
+    if 'ano_procedimiento' in valores:
+        valores['ano_procedimiento'] = int(valores['ano_procedimiento'])
+        if abs(valores['ano_procedimiento']) > MAX_ENTERO:
+            errores.append(f"ano_procedimiento: fuera de rango ({fila.get('ano_procedimiento')!r})")
+    # Mismo valor por defecto que el formulario
+    valores['itp_porcentaje'] = valores.get('itp_porcentaje') or 7.0
+
+    if fila.get('fecha_creacion') not in (None, ''):
+        try:
+            valores['fecha_creacion'] = leer_fecha(fila['fecha_creacion'])
+        except ValueError:
+            errores.append(f"fecha_creacion: fecha no válida ({fila['fecha_creacion']!r})")
+
+    return valores, errores
+
+
+def calcular_lote(lote, ano_actual=None):
+    """Añade a cada fila del lote los campos derivados, en una pasada vectorizada"""
+    entradas = {campo: np.array([fila[campo] for fila in lote], dtype=float)
+                for campo in escenarios.ENTRADAS}
+    derivados = escenarios.evaluar(ano_actual=ano_actual, **entradas)
+
+    columnas = {}
+    for campo in CAMPOS_DERIVADOS:
+        valores = derivados[campo].tolist()
+        if campo == 'veredicto':
+            columnas[campo] = [v or None for v in valores]
+        elif campo == 'anos_total':
+            columnas[campo] = [None if math.isnan(v) else int(v) for v in valores]
+        else:
+            columnas[campo] = [None if math.isnan(v) else v for v in valores]
+
+    for i, fila in enumerate(lote):
+        for campo in CAMPOS_DERIVADOS:
+            fila[campo] = columnas[campo][i]
+    return lote
+
+
+def _insertar(lote, user_id, ano_actual):
+    calcular_lote(lote, ano_actual)
+    ahora = datetime.utcnow()
+    for fila in lote:
+        fila['user_id'] = user_id
+        fila['codigo_provincia'] = subasta_logic.codigo_provincia(fila['direccion'])
+        fila.setdefault('fecha_creacion', ahora)
+    # Enlace con las subastas compartidas: dos consultas por lote en vez de dos por fila
+    enlaces = buscar_subastas(db.session.connection(),
+                              [(f.get('url_subasta'), f.get('identificador')) for f in lote])
+    for fila, subasta_id in zip(lote, enlaces):
+        fila['subasta_id'] = subasta_id
+    # insert de Core sobre la tabla: executemany directo, sin el bulk de la ORM (ni sus eventos)
+    tabla = AnalisisSubasta.__table__
+    sentencia = insert(tabla)
+    if db.engine.dialect.name == 'sqlite':
+        # Cada sentencia abre un savepoint en el que FTS5 vuelca lo pendiente del índice de
+        # búsqueda (trigger de la migración 0003). Con RETURNING, SQLAlchemy agrupa el
+        # executemany en INSERT de varias filas ("insertmanyvalues") y se vuelca mucho menos
+        sentencia = sentencia.returning(tabla.c.id)
+    db.session.execute(sentencia, lote)
+    db.session.commit()
+
+
+def importar(filas, user_id, tamano_lote=TAMANO_LOTE, ano_actual=None):
+    """
+    Importa las filas (iterable de dicts) para el usuario.
+    Devuelve el informe {'procesadas', 'importadas', 'con_errores', 'errores': [...]}.
+    Cada lote se confirma por separado: si la base de datos rechaza uno, el ValueError
+    indica cuántas filas quedaron importadas en los lotes anteriores.
+    """
+    informe = {'procesadas': 0, 'importadas': 0, 'con_errores': 0, 'errores': []}
+    lote = []
+
+    def insertar(lote):
+        try:
+            _insertar(lote, user_id, ano_actual)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise ValueError(f"la base de datos rechazó un lote de {len(lote)} filas "
+                             f"({e.__class__.__name__}); ya se habían importado "
+                             f"{informe['importadas']} filas") from e
+        informe['importadas'] += len(lote)
+
+    # Número de fila tal y como lo ve el usuario en la hoja (1 = cabecera)
+    for numero, fila in enumerate(filas, start=2):
+        informe['procesadas'] += 1
+        valores, errores = validar_fila(fila)
+        if errores:
+            informe['con_errores'] += 1
+            if len(informe['errores']) < MAX_ERRORES_INFORME:
+                informe['errores'].append({'fila': numero, 'errores': errores})
+            continue
+
+        lote.append(valores)
+        if len(lote) >= tamano_lote:
+            insertar(lote)
+            lote = []
+
+    if lote:
+        insertar(lote)
+
+    return informe
+
+
+def importar_archivo(archivo, user_id, **opciones):
+    """Importa un archivo subido (werkzeug FileStorage) según su extensión"""
+    nombre = (archivo.filename or '').lower()
+    if nombre.endswith('.xlsx'):
+        filas = filas_xlsx(archivo.stream)
+    elif nombre.endswith('.csv') or nombre.endswith('.txt'):
+        filas = filas_csv(archivo.stream)
+    else:
+        raise ValueError("Formato no soportado: sube un archivo .csv o .xlsx")
+    return importar(filas, user_id, **opciones)
@@ -0,0 +1,225 @@
+"""
+Instrumentación de peticiones
+- tramo('nombre'): mide un bloque de código (descarga del BOE, parseo, cálculo, commit...)
+- Cabecera Server-Timing con los tramos de cada petición (visible en las DevTools del navegador);
+  desactivada por defecto: expone tramos internos, URLs del BOE y el número de consultas
+- Histogramas de latencia en formato Prometheus (ruta /metrics, solo con METRICAS_TOKEN)
+- Perfilador por muestreo opcional para peticiones lentas (api.perfilador)
+
+Las métricas son por proceso: con varios workers, Prometheus debe consultar cada uno.
+"""
+
+import os
+import hmac
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Configuración (sobrescribible por variables de entorno)
+SERVER_TIMING = os.environ.get('METRICAS_SERVER_TIMING', '0') == '1'
+# Sin token, /metrics no se sirve
+TOKEN = os.environ.get('METRICAS_TOKEN') or None
+
+# Límites superiores de los buckets (segundos)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """Histograma acumulado con etiquetas, como el tipo histogram de Prometheus"""
+
+    def __init__(self, nombre, ayuda, etiquetas, buckets=BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, segundos, *valores):
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += segundos
+            serie[2] += 1
+
+    def exposicion(self):
+        """Líneas en el formato de texto de Prometheus"""
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            series = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        for valores, (cuentas, suma, total) in series:
+            etiquetas = ','.join(f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, valores))
+            separador = ',' if etiquetas else ''
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets, cuentas):
+                acumulado += cuenta
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas}{separador}le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{etiquetas}{separador}le="+Inf"}} {total}')
+            lineas.append(f'{self.nombre}_sum{{{etiquetas}}} {suma:.6f}')
+            lineas.append(f'{self.nombre}_count{{{etiquetas}}} {total}')
+        return lineas
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+PETICIONES = Histograma('subastas_peticion_segundos', 'Duración de las peticiones HTTP',
+                        ('endpoint', 'metodo', 'estado'))
+TRAMOS = Histograma('subastas_tramo_segundos', 'Duración de cada tramo instrumentado',
+                    ('tramo',))
+HISTOGRAMAS = (PETICIONES, TRAMOS)
+
+
+class Recolector:
+    """Tramos de una petición: [(nombre, descripción, segundos)] y tiempo total en base de datos"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tramos = []
+        self.bd_segundos = 0.0
+        self.bd_consultas = 0
+        self._lock = threading.Lock()
+
+    def anotar(self, nombre, segundos, descripcion=None):
+        # Las descargas del BOE anotan desde los hilos del pool
+        with self._lock:
+            self.tramos.append((nombre, descripcion, segundos))
+
+    def anotar_consulta(self, segundos):
+        # También desde los hilos del pool (p. ej. la caché de subastas al guardar)
+        with self._lock:
+            self.bd_segundos += segundos
+            self.bd_consultas += 1
+
+    def server_timing(self, total):
+        """Valor de la cabecera Server-Timing (duraciones en ms)"""
+        partes = []
+        for nombre, descripcion, segundos in self.tramos:
+            desc = f';desc="{_escapar(descripcion)}"' if descripcion else ''
+            partes.append(f'{nombre}{desc};dur={segundos * 1000:.1f}')
+        if self.bd_consultas:
+            partes.append(f'bd;desc="{self.bd_consultas} consultas";dur={self.bd_segundos * 1000:.1f}')
+        partes.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(partes)
+
+
+_recolector = ContextVar('recolector_metricas', default=None)
+
+
+@contextmanager
+def tramo(nombre, descripcion=None):
+    """Mide el bloque: histograma del tramo y, dentro de una petición, entrada en Server-Timing"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        TRAMOS.observar(segundos, nombre)
+        recolector = _recolector.get()
+        if recolector is not None:
+            recolector.anotar(nombre, segundos, descripcion)
+
+
+# ---------- Base de datos: tiempo total de las consultas de la petición ----------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_consulta(conexion, cursor, sql, parametros, contexto, executemany):
+    conexion.info['metricas_inicio'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_consulta(conexion, cursor, sql, parametros, contexto, executemany):
+    inicio = conexion.info.pop('metricas_inicio', None)
+    recolector = _recolector.get()
+    if inicio is None or recolector is None:
+        return
+    recolector.anotar_consulta(time.perf_counter() - inicio)
+
+
+# ---------- Integración con Flask ----------
+
+def instalar(app):
+    """Mide todas las peticiones de la aplicación y el renderizado de plantillas"""
+    from flask import g, request, before_render_template, template_rendered
+    from . import perfilador
+
+    app.config.setdefault('METRICAS_SERVER_TIMING', SERVER_TIMING)
+    app.config.setdefault('PERFILADOR', perfilador.ACTIVO)
+
+    @app.before_request
+    def _empezar_peticion():
+        g._metricas_token = _recolector.set(Recolector())
+        if app.config['PERFILADOR']:
+            perfilador.empezar()
+
+    @app.after_request
+    def _terminar_peticion(respuesta):
+        recolector = _recolector.get()
+        if recolector is None:
+            return respuesta
+        total = time.perf_counter() - recolector.inicio
+        PETICIONES.observar(total, request.endpoint or 'desconocido', request.method,
+                            respuesta.status_code)
+        if app.config['METRICAS_SERVER_TIMING']:
+            respuesta.headers['Server-Timing'] = recolector.server_timing(total)
+        if app.config['PERFILADOR']:
+            perfilador.terminar(f'{request.method} {request.path}', total)
+        return respuesta
+
+    @app.teardown_request
+    def _limpiar_peticion(error=None):
+        token = g.pop('_metricas_token', None)
+        if token is not None:
+            if app.config['PERFILADOR']:
+                # Peticiones que acabaron en excepción (after_request no llega a ejecutarse)
+                perfilador.descartar()
+            try:
+                _recolector.reset(token)
+            except ValueError:
+                # Respuestas en streaming que terminan en otro contexto (p. ej. bajo ASGI)
+                _recolector.set(None)
+
+    def _empezar_plantilla(emisor, template, context, **extra):
+        g._metricas_plantilla = time.perf_counter()
+
+    def _terminar_plantilla(emisor, template, context, **extra):
+        inicio = g.pop('_metricas_plantilla', None)
+        if inicio is None:
+            return
+        segundos = time.perf_counter() - inicio
+        TRAMOS.observar(segundos, 'plantilla')
+        recolector = _recolector.get()
+        if recolector is not None:
+            recolector.anotar('plantilla', segundos, template.name)
+
+    before_render_template.connect(_empezar_plantilla, app, weak=False)
+    template_rendered.connect(_terminar_plantilla, app, weak=False)
+
+
+def autorizado(cabecera):
+    """Acceso a /metrics: 'Bearer <METRICAS_TOKEN>' (comparación en tiempo constante)"""
+    if TOKEN is None or not cabecera:
+        return False
+    return hmac.compare_digest(cabecera.encode(), f'Bearer {TOKEN}'.encode())
+
+
+def exposicion():
+    """Texto de /metrics"""
+    lineas = []
+    for histograma in HISTOGRAMAS:
+        lineas.extend(histograma.exposicion())
+    return '\n'.join(lineas) + '\n'
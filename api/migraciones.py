@@ -0,0 +1,206 @@
+"""
+Migraciones del esquema (Alembic)
+El esquema ya no se crea con create_all al importar la app; se gestiona con:
+
+    python -m api.migraciones                      aplicar las migraciones pendientes
+    python -m api.migraciones revision "mensaje"   nueva migración (autogenerada desde models.py)
+    python -m api.migraciones actual               revisión aplicada
+    python -m api.migraciones historial            lista de migraciones
+    python -m api.migraciones bajar <revision>     deshacer hasta una revisión
+    python -m api.migraciones sql                  SQL de todas las migraciones (sin conexión)
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from .models import db, AnalisisSubasta
+from .subasta_logic import codigo_provincia
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migraciones')
+
+# Revisión que equivale al esquema que creaba create_all, y las tablas que crea
+REVISION_INICIAL = '0001'
+TABLAS_INICIALES = ('users', 'analisis_subastas', 'trabajos_extraccion')
+
+# Columnas de tablas existentes que añaden migraciones posteriores a la inicial
+COLUMNAS_POSTERIORES = {('analisis_subastas', 'subasta_id'),
+                        ('trabajos_extraccion', 'proximo_intento')}
+
+
+def configuracion(conexion=None):
+    """Config de Alembic sin alembic.ini; env.py usa la conexión que se le pasa"""
+    config = Config()
+    config.set_main_option('script_location', DIRECTORIO)
+    config.set_main_option('sqlalchemy.url', db.engine.url.render_as_string(hide_password=False))
+    config.attributes['connection'] = conexion
+    return config
+
+
+# ================== BASES DE DATOS ANTERIORES A ALEMBIC ==================
+# Solo las usa _adoptar_esquema_existente: el esquema no se toca al importar los modelos.
+# Comprobado de create_all a head con python -m benchmarks.bench_migraciones
+
+def asegurar_columnas(omitir=()):
+    """
+    Añade a tablas ya existentes las columnas nuevas (create_all no altera tablas),
+    salvo las (tabla, columna) de `omitir`
+    """
+    inspector = inspect(db.engine)
+    for tabla in db.metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            continue
+        existentes = {c['name'] for c in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name in existentes or (tabla.name, columna.name) in omitir:
+                continue
+            tipo = columna.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conexion:
+                conexion.execute(text(f'ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}'))
+
+
+def rellenar_codigo_provincia(tamano_lote=2000):
+    """Calcula codigo_provincia en los análisis guardados antes de existir la columna"""
+    tabla = AnalisisSubasta.__table__
+    while True:
+        pendientes = db.session.execute(
+            db.select(tabla.c.id, tabla.c.direccion)
+            .where(tabla.c.codigo_provincia.is_(None))
+            .limit(tamano_lote)
+        ).all()
+        if not pendientes:
+            return
+        db.session.execute(
+            tabla.update().where(tabla.c.id == db.bindparam('_id'))
+            .values(codigo_provincia=db.bindparam('_codigo')),
+            [{'_id': i, '_codigo': codigo_provincia(d)} for i, d in pendientes]
+        )
+        db.session.commit()
+
+
+def asegurar_indices(omitir=()):
+    """
+    Crea los índices que falten en tablas ya existentes (create_all solo los crea con la tabla),
+    salvo los que usan alguna (tabla, columna) de `omitir`
+    """
+    inspector = inspect(db.engine)
+    for tabla in db.metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            continue
+        for indice in tabla.indexes:
+            if not any((tabla.name, c.name) in omitir for c in indice.columns):
+                indice.create(db.engine, checkfirst=True)
+
+
+@contextmanager
+def _transaccion():
+    """
+    Conexión con las migraciones en una sola transacción. El driver sqlite3 confirma cada
+    CREATE/ALTER por su cuenta (solo abre transacción antes de INSERT/UPDATE/DELETE): con un
+    BEGIN explícito, un fallo a mitad deshace también el DDL y la base no queda a medias
+    """
+    with db.engine.connect() as conexion:
+        if conexion.dialect.name != 'sqlite':
+            with conexion.begin():
+                yield conexion
+            return
+        dbapi = conexion.connection.dbapi_connection
+        nivel = dbapi.isolation_level
+        dbapi.isolation_level = None
+        try:
+            with conexion.begin():
+                conexion.exec_driver_sql('BEGIN')
+                yield conexion
+        finally:
+            dbapi.isolation_level = nivel
+
+
+def _adoptar_esquema_existente():
+    """
+    Bases de datos creadas con create_all antes de las migraciones: se crean las tablas de la
+    revisión inicial que falten (las versiones más antiguas no tenían trabajos_extraccion), se
+    completan las columnas/índices y se marcan como en la revisión inicial
+    """
+    inspector = inspect(db.engine)
+    if inspector.has_table('alembic_version') or not inspector.has_table('users'):
+        return False
+
+    # Desde los modelos: traen ya las columnas de COLUMNAS_POSTERIORES, y las migraciones que
+    # las añaden las saltan si existen
+    faltan = [db.metadata.tables[t] for t in TABLAS_INICIALES if not inspector.has_table(t)]
+    if faltan:
+        db.metadata.create_all(bind=db.engine, tables=faltan)
+    asegurar_columnas(omitir=COLUMNAS_POSTERIORES)
+    asegurar_indices(omitir=COLUMNAS_POSTERIORES)
+    rellenar_codigo_provincia()
+    with db.engine.begin() as conexion:
+        command.stamp(configuracion(conexion), REVISION_INICIAL)
+    return True
+
+
+def _reparar_adopcion_incompleta():
+    """
+    Bases adoptadas por versiones anteriores de _adoptar_esquema_existente: marcadas en la
+    revisión inicial sin trabajos_extraccion y, como las migraciones no iban en una sola
+    transacción, con las tablas de la 0002 creadas (vacías) por el intento fallido
+    """
+    if not inspect(db.engine).has_table('alembic_version'):
+        return
+    with _transaccion() as conexion:
+        inspector = inspect(conexion)
+        if conexion.exec_driver_sql('SELECT version_num FROM alembic_version').scalar() != REVISION_INICIAL:
+            return
+        faltan = [db.metadata.tables[t] for t in TABLAS_INICIALES if not inspector.has_table(t)]
+        if not faltan:
+            return
+        db.metadata.create_all(bind=conexion, tables=faltan)
+        for tabla in ('cambios_subastas', 'seguimientos_subastas'):
+            if (inspector.has_table(tabla)
+                    and not conexion.exec_driver_sql(f'SELECT count(*) FROM {tabla}').scalar()):
+                conexion.exec_driver_sql(f'DROP TABLE {tabla}')
+
+
+def actualizar(revision='head'):
+    """Aplica las migraciones pendientes (requiere contexto de aplicación)"""
+    if not _adoptar_esquema_existente():
+        _reparar_adopcion_incompleta()
+    with _transaccion() as conexion:
+        command.upgrade(configuracion(conexion), revision)
+
+
+def main(argumentos):
+    # La propia orden decide cuándo migrar
+    os.environ['MIGRAR_AL_ARRANCAR'] = '0'
+    from .app import app
+
+    orden = argumentos[0] if argumentos else 'actualizar'
+    with app.app_context():
+        if orden == 'actualizar':
+            actualizar()
+        elif orden == 'revision':
+            mensaje = argumentos[1] if len(argumentos) > 1 else 'cambios en el esquema'
+            actualizar()
+            with db.engine.begin() as conexion:
+                command.revision(configuracion(conexion), message=mensaje, autogenerate=True)
+        elif orden == 'actual':
+            with db.engine.connect() as conexion:
+                command.current(configuracion(conexion), verbose=True)
+        elif orden == 'historial':
+            command.history(configuracion())
+        elif orden == 'bajar':
+            with _transaccion() as conexion:
+                command.downgrade(configuracion(conexion), argumentos[1])
+        elif orden == 'sql':
+            command.upgrade(configuracion(), 'head', sql=True)
+        else:
+            print(__doc__)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -2,10 +2,23 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, inspect
 from datetime import datetime, timedelta
 
+from .subasta_logic import codigo_provincia, clave_subasta
+
 db = SQLAlchemy()
 
+
+def suscripcion_valida(activa, fecha_expiracion, ahora=None):
+    """
+    Una suscripción es válida si está activa y no ha llegado su fecha de expiración.
+    Se calcula en cada comprobación: no hace falta escribir en la base de datos al caducar.
+    """
+    if not activa:
+        return False
+    return fecha_expiracion is None or (ahora or datetime.utcnow()) <= fecha_expiracion
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
@@ -37,22 +50,27 @@ class User(UserMixin, db.Model):
         self.fecha_expiracion = datetime.utcnow() + timedelta(days=dias)
     
     def tiene_suscripcion_valida(self):
-        """Verifica si la suscripción está activa y no ha expirado"""
-        if not self.suscripcion_activa:
-            return False
-        if self.fecha_expiracion and datetime.utcnow() > self.fecha_expiracion:
-            self.suscripcion_activa = False
-            db.session.commit()
-            return False
-        return True
+        """Verifica si la suscripción está activa y no ha expirado (solo lectura)"""
+        return suscripcion_valida(self.suscripcion_activa, self.fecha_expiracion)
 
 
 class AnalisisSubasta(db.Model):
     __tablename__ = 'analisis_subastas'
+    __table_args__ = (
+        # Listados por usuario ordenados por fecha (paginación por cursor)
+        db.Index('ix_analisis_user_fecha', 'user_id', 'fecha_creacion', 'id'),
+        # Índices cubrientes de la analítica del dashboard (api.analitica)
+        db.Index('ix_analisis_user_veredicto', 'user_id', 'veredicto', 'rentabilidad_medio',
+                 'total_inversion'),
+        db.Index('ix_analisis_user_fecha_importes', 'user_id', 'fecha_creacion',
+                 'rentabilidad_medio', 'total_inversion'),
+        db.Index('ix_analisis_user_provincia', 'user_id', 'codigo_provincia', 'margen_medio',
+                 'rentabilidad_medio'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_creacion = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Datos de la subasta
     url_subasta = db.Column(db.String(500))
@@ -64,8 +82,13 @@ class AnalisisSubasta(db.Model):
     tramos_pujas = db.Column(db.Float)
     deposito = db.Column(db.Float)
     direccion = db.Column(db.String(500))
+    codigo_provincia = db.Column(db.String(2))  # Derivado de la dirección ('' = sin código postal)
     referencia_catastral = db.Column(db.String(100))
     
+    # Subasta compartida de la que salen los datos (enlazada por URL o identificador del BOE)
+    subasta_id = db.Column(db.Integer, db.ForeignKey('subastas.id'), index=True)
+    subasta = db.relationship('Subasta', backref='analisis')
+    
     # Datos de puja
     puja = db.Column(db.Float)
     porcentaje_puja = db.Column(db.Float)
@@ -109,5 +132,166 @@ class AnalisisSubasta(db.Model):
     # Notas adicionales
     notas = db.Column(db.Text)
     
+    # Seguimiento de la subasta en el BOE (api.vigilancia)
+    seguimiento = db.relationship('SeguimientoSubasta', backref='analisis', uselist=False,
+                                  cascade='all, delete-orphan')
+    
     def __repr__(self):
         return f'<AnalisisSubasta {self.identificador}>'
+
+
+@event.listens_for(AnalisisSubasta, 'before_insert')
+@event.listens_for(AnalisisSubasta, 'before_update')
+def _actualizar_codigo_provincia(mapper, connection, analisis):
+    analisis.codigo_provincia = codigo_provincia(analisis.direccion)
+
+
+@event.listens_for(AnalisisSubasta, 'before_insert')
+@event.listens_for(AnalisisSubasta, 'before_update')
+def _enlazar_subasta(mapper, connection, analisis):
+    # Solo se busca si cambia la URL o el identificador (o si aún no está enlazado)
+    atributos = inspect(analisis).attrs
+    cambiado = atributos.url_subasta.history.has_changes() or \
+        atributos.identificador.history.has_changes()
+    if not (cambiado or analisis.subasta_id is None):
+        return
+    if analisis.url_subasta or analisis.identificador:
+        analisis.subasta_id = buscar_subastas(
+            connection, [(analisis.url_subasta, analisis.identificador)]
+        )[0]
+    else:
+        analisis.subasta_id = None
+
+
+class Subasta(db.Model):
+    """
+    Subasta del BOE extraída una sola vez y compartida por los análisis de todos los usuarios.
+    También es el nivel persistente de la caché de extracciones (api.cache_subastas).
+    """
+    __tablename__ = 'subastas'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # subasta_logic.clave_subasta de la URL (NULL si solo se conoce por el identificador)
+    clave = db.Column(db.String(500), unique=True)
+    identificador = db.Column(db.String(200), unique=True)
+    referencia_catastral = db.Column(db.String(100), index=True)
+    
+    fecha_conclusion = db.Column(db.String(100))
+    cantidad_reclamada = db.Column(db.Float)
+    valor_subasta = db.Column(db.Float)
+    tasacion = db.Column(db.Float)
+    tramos_pujas = db.Column(db.Float)
+    deposito = db.Column(db.Float)
+    direccion = db.Column(db.String(500))
+    codigo_provincia = db.Column(db.String(2))
+    
+    # Última extracción completa: datos tal y como salen del parseo y validadores por página (JSON)
+    datos = db.Column(db.Text)
+    validadores = db.Column(db.Text)
+    fecha_extraccion = db.Column(db.DateTime)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Subasta {self.identificador or self.clave}>'
+
+
+def buscar_subastas(conexion, pares):
+    """
+    Id de la subasta compartida de cada par (url, identificador), o None: primero por la
+    clave de la URL y si no por el identificador. Dos consultas para todos los pares.
+    """
+    tabla = Subasta.__table__
+    claves = [clave_subasta(url) if url else None for url, _ in pares]
+    identificadores = [(identificador or '').strip() or None for _, identificador in pares]
+    por_clave = por_identificador = {}
+    if any(claves):
+        por_clave = dict(conexion.execute(
+            db.select(tabla.c.clave, tabla.c.id).where(tabla.c.clave.in_({c for c in claves if c}))
+        ).all())
+    if any(identificadores):
+        por_identificador = dict(conexion.execute(
+            db.select(tabla.c.identificador, tabla.c.id)
+            .where(tabla.c.identificador.in_({i for i in identificadores if i}))
+        ).all())
+    return [por_clave.get(c) or por_identificador.get(i) for c, i in zip(claves, identificadores)]
+
+
+class TrabajoExtraccion(db.Model):
+    __tablename__ = 'trabajos_extraccion'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    url_subasta = db.Column(db.String(500), nullable=False)
+    
+    # pendiente → en_curso → completado / error
+    estado = db.Column(db.String(20), nullable=False, default='pendiente', index=True)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    resultado = db.Column(db.Text)  # JSON con los datos extraídos
+    error = db.Column(db.Text)
+    
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+    proximo_intento = db.Column(db.DateTime)  # Tras un fallo: no se reclama antes
+    
+    @property
+    def terminado(self):
+        return self.estado in ('completado', 'error')
+    
+    def __repr__(self):
+        return f'<TrabajoExtraccion {self.id} {self.estado}>'
+
+
+class SeguimientoSubasta(db.Model):
+    """Subasta vigilada: se vuelve a consultar en el BOE hasta su fecha de conclusión"""
+    __tablename__ = 'seguimientos_subastas'
+    __table_args__ = (
+        # Planificador: seguimientos activos ordenados por próxima revisión
+        db.Index('ix_seguimientos_activo_proxima', 'activo', 'proxima_revision'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    analisis_id = db.Column(db.Integer, db.ForeignKey('analisis_subastas.id'), nullable=False,
+                            unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    url_subasta = db.Column(db.String(500), nullable=False)
+    activo = db.Column(db.Boolean, nullable=False, default=True)
+    
+    # Planificación (UTC)
+    fecha_conclusion = db.Column(db.DateTime)
+    proxima_revision = db.Column(db.DateTime)
+    ultima_revision = db.Column(db.DateTime)
+    ultimo_cambio = db.Column(db.DateTime)
+    
+    # Último estado conocido: validadores HTTP por página, huella y datos extraídos (JSON)
+    validadores = db.Column(db.Text)
+    huella = db.Column(db.String(64))
+    datos = db.Column(db.Text)
+    
+    revisiones = db.Column(db.Integer, nullable=False, default=0)
+    errores_seguidos = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Solo se guardan los campos que cambian entre revisiones
+    cambios = db.relationship('CambioSubasta', backref='seguimiento', lazy=True,
+                              cascade='all, delete-orphan',
+                              order_by='CambioSubasta.id.desc()')
+    
+    def __repr__(self):
+        return f'<SeguimientoSubasta {self.id} {self.url_subasta}>'
+
+
+class CambioSubasta(db.Model):
+    __tablename__ = 'cambios_subastas'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    seguimiento_id = db.Column(db.Integer, db.ForeignKey('seguimientos_subastas.id'),
+                               nullable=False, index=True)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+    campo = db.Column(db.String(100), nullable=False)
+    anterior = db.Column(db.Text)
+    nuevo = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<CambioSubasta {self.campo}: {self.anterior!r} → {self.nuevo!r}>'
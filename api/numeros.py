@@ -0,0 +1,189 @@
+"""
+Lectura y escritura de números en formato español
+- leer_importe: '1.234.567,89 €', '-1.930,81', '185.000', '1234.56' → float (conserva los
+  céntimos); los casos habituales se resuelven con métodos de str y el resto con una sola
+  expresión regular precompilada (PATRON_IMPORTE, que es la que define qué se admite)
+- leer_importes: lo mismo para una lista entera, vectorizado con numpy sobre la matriz de
+  caracteres (NaN = no es un número); lo que no tiene la forma habitual va uno a uno
+- texto_importe: importe del BOE normalizado para los datos extraídos ('96540.32')
+- formatear: 1234567.891 → '1.234.567,89', con caché; es el filtro `numero` de las plantillas
+Un punto seguido de tres cifras (sin coma) es separador de miles: '1.234' → 1234.
+"""
+
+import math
+import re
+from functools import lru_cache
+
+# Adornos que se quitan de los extremos: moneda, espacios y espacios duros
+ADORNOS = ' \t\n\r\xa0\u202f€'
+
+# Para la expresión regular se quitan también los de dentro ('1 234,56'), y el menos
+# tipográfico pasa a guion
+LIMPIEZA = str.maketrans({'€': None, ' ': None, '\xa0': None, '\u202f': None, '\t': None,
+                          '\n': None, '\r': None, '\u2212': '-'})
+
+# Signo; formato español (miles con punto, decimales con coma) o decimal con punto/exponente
+PATRON_IMPORTE = re.compile(r'''
+    ([-+]?)
+    (?:
+        (\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d*))?
+      | ((?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?|\d+[eE][-+]?\d+)
+    )
+''', re.VERBOSE)
+
+_CIFRA = re.compile(r'\d')
+
+# leer_importes: textos más largos que esto (notas, descripciones) van uno a uno en vez de
+# ensanchar la matriz; con hasta 15 cifras el valor se calcula exacto en float64
+LARGO_MAXIMO = 40
+CIFRAS_MAXIMAS = 15
+
+
+def _leer_con_patron(texto):
+    """Lectura completa con PATRON_IMPORTE (los casos que no resuelve leer_importe directamente)"""
+    if _CIFRA.search(texto) is None:
+        # 'Sin especificar', 'Ver descripción'...: sin cifras no hay número
+        return None
+    coincidencia = PATRON_IMPORTE.fullmatch(texto.translate(LIMPIEZA))
+    if coincidencia is None:
+        return None
+    signo, entero, decimales, con_punto = coincidencia.groups()
+    if con_punto is not None:
+        valor = float(signo + con_punto)
+    else:
+        valor = float(f"{signo}{entero.replace('.', '')}.{decimales or '0'}")
+    return valor if math.isfinite(valor) else None
+
+
+def leer_importe(texto):
+    """Importe como float, o None si el texto no es un número (admite int/float)"""
+    if texto.__class__ is not str:
+        if isinstance(texto, (int, float)):
+            return float(texto) if math.isfinite(texto) else None
+        if texto is None:
+            return None
+        texto = str(texto)
+    # Camino rápido, mismo resultado que PATRON_IMPORTE: [signo] cifras con o sin miles
+    # [, decimales] o decimal con punto; lo demás (exponentes, espacios dentro, no ASCII)
+    # pasa por la expresión regular
+    limpio = texto.strip(ADORNOS)
+    if limpio.isascii():
+        signo = ''
+        if limpio[:1] in ('-', '+'):
+            signo, limpio = limpio[0], limpio[1:]
+        entero, coma, decimales = limpio.partition(',')
+        cifras = entero
+        if '.' in entero:
+            cifras = entero.replace('.', '')
+            grupos = len(entero) >> 2
+            if not (len(entero) & 3 and entero.count('.') == grupos
+                    and entero[-4::-4] == '.' * grupos):
+                # No son miles: decimal con punto ('1234.56'), si no hay coma
+                if not coma and entero.replace('.', '', 1).isdigit():
+                    valor = float(signo + entero)
+                    return valor if math.isfinite(valor) else None
+                cifras = ''
+        if cifras.isdigit() and (decimales.isdigit() or not decimales):
+            valor = float(f'{signo}{cifras}.{decimales}' if decimales else signo + cifras)
+            return valor if math.isfinite(valor) else None
+    return _leer_con_patron(texto)
+
+
+def leer_importes(textos):
+    """
+    leer_importe de toda una lista de textos (None = vacío); devuelve un array float64
+    con NaN donde no hay número
+    """
+    import numpy as np
+
+    textos = ['' if t is None else t if t.__class__ is str else str(t) for t in textos]
+    n = len(textos)
+    if not n:
+        return np.empty(0, dtype=np.float64)
+    largos = np.fromiter(map(len, textos), dtype=np.intp, count=n)
+    cortos = textos
+    if largos.max() > LARGO_MAXIMO:
+        cortos = [t if len(t) <= LARGO_MAXIMO else '' for t in textos]
+    matriz = np.array(cortos)
+    # Aparte (uno a uno): los largos y los que llevan NUL, que numpy quita si queda al final
+    # (antes o después de quitar los adornos): más ceros que relleno
+    aparte = np.strings.str_len(matriz) != largos
+    ancho = matriz.dtype.itemsize // 4
+    aparte |= (matriz.view(np.uint32).reshape(n, ancho) == 0).sum(1) != ancho - largos
+    matriz = np.strings.strip(matriz, ADORNOS)
+    ancho = matriz.dtype.itemsize // 4
+    if not ancho:
+        return np.full(n, np.nan)
+    largo = np.strings.str_len(matriz).astype(np.uint8)
+    # Un byte por carácter; lo que no es ASCII pasa a 0x7f, que no es válido
+    codigos = matriz.view(np.uint32).reshape(n, ancho)
+    c = np.where(codigos < 128, codigos, 127).astype(np.uint8)
+    posicion = np.arange(ancho, dtype=np.uint8)
+
+    negativo = c[:, 0] == 45
+    con_signo = negativo | (c[:, 0] == 43)
+    cifra = (c - 48) < 10
+    punto = c == 46
+    coma = c == 44
+    comas = coma.sum(1)
+    puntos = punto.sum(1)
+    # Separador de miles: puntos a 4, 8, ... posiciones antes de la coma (o del final) y
+    # entre 1 y 3 cifras delante del primero (aritmética en uint8: solo importa módulo 4)
+    fin_entero = np.where(comas == 1, coma.argmax(1), largo).astype(np.uint8)
+    esperado = ((posicion < fin_entero[:, None]) & ((fin_entero[:, None] - posicion) & 3 == 0)
+                & (posicion > con_signo.view(np.uint8)[:, None]))
+    miles = (puntos > 0) & ((fin_entero - con_signo) & 3 != 0) & (punto == esperado).all(1)
+    # Decimal con punto: un solo punto que no es de miles y ninguna coma
+    con_punto = (puntos == 1) & (comas == 0) & ~miles
+    separador = np.where(con_punto, punto.argmax(1), fin_entero).astype(np.uint8)
+    decimales = (cifra & (posicion > separador[:, None])).sum(1)
+    enteras = cifra.sum(1) - decimales
+    # Forma habitual: signo inicial, cifras, puntos de miles o decimal, una coma como mucho
+    permitido = cifra | punto | coma | (posicion >= largo[:, None])
+    permitido[:, 0] |= con_signo
+    rapido = (permitido.all(1) & (comas <= 1) & ((puntos == 0) | miles | con_punto)
+              & (enteras > 0) & (enteras + decimales <= CIFRAS_MAXIMAS) & ~aparte)
+
+    # Valor por Horner columna a columna: entero exacto (≤ 15 cifras) / 10^decimales, una sola
+    # división correctamente redondeada, igual que float() del texto
+    factor = np.ascontiguousarray((cifra * np.uint8(9) + np.uint8(1)).T)
+    valor_cifra = np.ascontiguousarray(((c - np.uint8(48)) * cifra).T)
+    acumulado = np.zeros(n)
+    for j in range(ancho):
+        acumulado *= factor[j]
+        acumulado += valor_cifra[j]
+    valores = acumulado / 10.0 ** decimales
+    valores[negativo] *= -1
+
+    for i in np.flatnonzero(~rapido).tolist():
+        valor = leer_importe(textos[i])
+        valores[i] = np.nan if valor is None else valor
+    return valores
+
+
+def texto_importe(texto):
+    """
+    Importe del BOE normalizado para los datos extraídos: '96.540,32 €' → '96540.32',
+    '185.000,00 €' → '185000'; si no es un número, el texto con los espacios simplificados
+    """
+    valor = leer_importe(texto)
+    if valor is None:
+        return ' '.join(str(texto or '').split())
+    return f'{valor:.2f}'.rstrip('0').rstrip('.')
+
+
+@lru_cache(maxsize=8192)
+def _formatear(valor, decimales):
+    return f'{valor:_.{decimales}f}'.replace('.', ',').replace('_', '.')
+
+
+def formatear(numero, decimales=2):
+    """Número al estilo español (1.234.567,89); lo que no es un número se devuelve como texto"""
+    if numero is None:
+        return ''
+    try:
+        # + 0.0 convierte -0.0 en 0.0: son iguales como clave de la caché y, si no, el primero
+        # que se formatea decide el resultado de ambos
+        return _formatear(float(numero) + 0.0, decimales)
+    except (TypeError, ValueError):
+        return str(numero)
@@ -0,0 +1,90 @@
+"""
+Perfilador por muestreo para peticiones lentas (opcional: PERFILADOR=1)
+Un hilo toma cada PERFILADOR_INTERVALO_MS la pila de los hilos que están atendiendo una petición.
+Si la petición supera PERFILADOR_UMBRAL_MS, sus pilas se guardan en formato "folded"
+(una línea "funcion;funcion;funcion N" por pila), que leen flamegraph.pl, speedscope e inferno.
+
+Solo se muestrea el hilo de la petición: las descargas del BOE en el pool de hilos aparecen
+como espera en descargar_respuestas.
+"""
+
+import os
+import re
+import sys
+import time
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+# Configuración (sobrescribible por variables de entorno)
+ACTIVO = os.environ.get('PERFILADOR', '0') == '1'
+INTERVALO = float(os.environ.get('PERFILADOR_INTERVALO_MS', 5)) / 1000
+UMBRAL = float(os.environ.get('PERFILADOR_UMBRAL_MS', 500)) / 1000
+DIRECTORIO = os.environ.get('PERFILADOR_DIRECTORIO') or os.path.join(tempfile.gettempdir(),
+                                                                      'perfiles_subastas')
+
+_activos = {}  # ident del hilo → Counter de pilas
+_lock = threading.Lock()
+_hilo = None
+
+
+def _pila(frame):
+    """Pila de raíz a hoja en formato folded"""
+    marcos = []
+    while frame is not None:
+        codigo = frame.f_code
+        marcos.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(marcos))
+
+
+def _muestrear():
+    while True:
+        time.sleep(INTERVALO)
+        with _lock:
+            if not _activos:
+                continue
+            marcos = sys._current_frames()
+            for ident, pilas in _activos.items():
+                frame = marcos.get(ident)
+                if frame is not None:
+                    pilas[_pila(frame)] += 1
+
+
+def _arrancar_hilo():
+    global _hilo
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_muestrear, name='perfilador', daemon=True)
+            _hilo.start()
+
+
+def empezar():
+    """Empieza a muestrear el hilo actual"""
+    if _hilo is None:
+        _arrancar_hilo()
+    with _lock:
+        _activos[threading.get_ident()] = Counter()
+
+
+def descartar():
+    """Deja de muestrear el hilo actual sin guardar nada; devuelve sus pilas (o None)"""
+    with _lock:
+        return _activos.pop(threading.get_ident(), None)
+
+
+def terminar(nombre, duracion, umbral=None):
+    """Deja de muestrear; si la petición fue lenta guarda el perfil y devuelve su ruta"""
+    pilas = descartar()
+    umbral = UMBRAL if umbral is None else umbral
+    if not pilas or duracion < umbral:
+        return None
+
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    sufijo = re.sub(r'[^A-Za-z0-9]+', '_', nombre).strip('_')[:80]
+    ruta = os.path.join(DIRECTORIO, f"{datetime.now():%Y%m%d_%H%M%S_%f}_{sufijo}_{duracion * 1000:.0f}ms.folded")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for pila, muestras in pilas.most_common():
+            f.write(f'{pila} {muestras}\n')
+    return ruta
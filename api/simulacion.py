@@ -0,0 +1,346 @@
+"""
+Simulación Monte Carlo del riesgo de un análisis de subasta
+Muestrea reforma, años de procedimiento judicial y precio de venta y calcula
+la distribución de margen y rentabilidad de forma vectorizada
+"""
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+# Configuración (sobrescribible por variables de entorno)
+MUESTRAS = int(os.environ.get('SIMULACION_MUESTRAS', 1_000_000))
+# Muestras por defecto al abrir la página (GET); más se piden desde el formulario
+MUESTRAS_PAGINA = int(os.environ.get('SIMULACION_MUESTRAS_PAGINA', 200_000))
+MAX_MUESTRAS = int(os.environ.get('SIMULACION_MAX_MUESTRAS', 5_000_000))
+TAMANO_BLOQUE = int(os.environ.get('SIMULACION_BLOQUE', 250_000))
+SEMILLA = int(os.environ.get('SIMULACION_SEMILLA', 12345))
+# Procesos del pool en las vistas: lo decide el servidor, no la petición (0/1 = sin pool)
+PROCESOS = min(int(os.environ.get('SIMULACION_PROCESOS', 0)), os.cpu_count() or 1)
+# Resultados de la página guardados por proceso (mismas entradas → mismo resultado)
+MAX_CACHE = int(os.environ.get('SIMULACION_CACHE', 64))
+# Muestras con las que se estiman los percentiles de los resúmenes parciales
+MUESTRAS_PARCIALES = 100_000
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+BARRAS_HISTOGRAMA = 30
+
+VARIABLES = ('venta', 'reforma', 'anos')
+TIPOS = ('fijo', 'uniforme', 'triangular', 'normal')
+
+
+def distribuciones_por_defecto(analisis):
+    """Distribuciones razonables a partir de los datos guardados del análisis"""
+    venta_medio = analisis.venta_medio or 0
+    if analisis.venta_bajo and analisis.venta_alto and analisis.venta_bajo <= venta_medio <= analisis.venta_alto:
+        venta = {'tipo': 'triangular', 'min': analisis.venta_bajo, 'moda': venta_medio,
+                 'max': analisis.venta_alto}
+    else:
+        venta = {'tipo': 'fijo', 'valor': venta_medio}
+
+    reforma = analisis.reforma or 0
+    if reforma:
+        # Las reformas suelen desviarse al alza
+        reforma_dist = {'tipo': 'triangular', 'min': round(reforma * 0.8, 2), 'moda': reforma,
+                        'max': round(reforma * 1.5, 2)}
+    else:
+        reforma_dist = {'tipo': 'fijo', 'valor': 0}
+
+    anos = analisis.anos_total or 0
+    anos_dist = {'tipo': 'triangular', 'min': anos, 'moda': anos + 1, 'max': anos + 3} if anos \
+        else {'tipo': 'fijo', 'valor': 0}
+
+    return {'venta': venta, 'reforma': reforma_dist, 'anos': anos_dist}
+
+
+def distribuciones_desde_formulario(datos, por_defecto):
+    """
+    Lee distribuciones de campos <variable>_tipo, <variable>_min, <variable>_moda, <variable>_max,
+    <variable>_media, <variable>_desviacion, <variable>_valor; lo no indicado queda por defecto.
+    """
+    distribuciones = {}
+    for variable in VARIABLES:
+        tipo = datos.get(f'{variable}_tipo')
+        if not tipo:
+            distribuciones[variable] = por_defecto[variable]
+            continue
+        if tipo not in TIPOS:
+            raise ValueError(f"Distribución no soportada: {tipo}")
+        spec = {'tipo': tipo}
+        for parametro in ('min', 'moda', 'max', 'media', 'desviacion', 'valor'):
+            valor = datos.get(f'{variable}_{parametro}')
+            if valor not in (None, ''):
+                spec[parametro] = float(valor)
+                if not math.isfinite(spec[parametro]):
+                    raise ValueError(f"Valor no válido en {variable}_{parametro}: {valor!r}")
+        distribuciones[variable] = validar_distribucion(spec)
+    return distribuciones
+
+
+def validar_distribucion(spec):
+    """Comprueba que la distribución tiene los parámetros que necesita"""
+    requeridos = {
+        'fijo': ('valor',),
+        'uniforme': ('min', 'max'),
+        'triangular': ('min', 'moda', 'max'),
+        'normal': ('media', 'desviacion'),
+    }[spec['tipo']]
+    faltan = [p for p in requeridos if p not in spec]
+    if faltan:
+        raise ValueError(f"Faltan parámetros de la distribución {spec['tipo']}: {', '.join(faltan)}")
+    if spec['tipo'] == 'triangular' and not spec['min'] <= spec['moda'] <= spec['max']:
+        raise ValueError("La distribución triangular requiere min <= moda <= max")
+    if spec['tipo'] == 'uniforme' and spec['min'] > spec['max']:
+        raise ValueError("La distribución uniforme requiere min <= max")
+    if spec['tipo'] == 'normal' and spec['desviacion'] < 0:
+        raise ValueError("La desviación no puede ser negativa")
+    return spec
+
+
+def _muestrear(rng, spec, n):
+    tipo = spec['tipo']
+    if tipo == 'fijo':
+        return np.full(n, float(spec['valor']))
+    if tipo == 'uniforme':
+        return rng.uniform(spec['min'], spec['max'], n)
+    if tipo == 'triangular':
+        if spec['min'] == spec['max']:
+            return np.full(n, float(spec['min']))
+        return rng.triangular(spec['min'], spec['moda'], spec['max'], n)
+    return rng.normal(spec['media'], spec['desviacion'], n)
+
+
+def costes_base(analisis):
+    """Costes que no se simulan, tal y como están guardados"""
+    return {
+        'fijos': sum(float(v or 0) for v in (
+            analisis.puja, analisis.itp_calculado, analisis.notaria_registro,
+            analisis.alarmas, analisis.suministros)),
+        'anuales': float(analisis.ibi_anual or 0) + float(analisis.comunidad_anual or 0),
+    }
+
+
+def leer_muestras(valor, por_defecto=MUESTRAS):
+    """Número de muestras pedido (vacío = por defecto); ValueError fuera de 1..MAX_MUESTRAS"""
+    muestras = int(valor) if valor not in (None, '') else por_defecto
+    if not 1 <= muestras <= MAX_MUESTRAS:
+        raise ValueError(f"El número de muestras debe estar entre 1 y {MAX_MUESTRAS:,}".replace(',', '.'))
+    return muestras
+
+
+def leer_semilla(valor, por_defecto=SEMILLA):
+    """Semilla pedida (vacía = por defecto); ValueError si no es un entero no negativo"""
+    if valor in (None, ''):
+        return por_defecto
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError("La semilla debe ser un entero no negativo")
+    try:
+        semilla = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("La semilla debe ser un entero no negativo")
+    if semilla < 0:
+        raise ValueError("La semilla debe ser un entero no negativo")
+    return semilla
+
+
+def simular_bloque(base, distribuciones, n, semilla):
+    """Simula `n` muestras con su propia semilla; devuelve (margen, rentabilidad)"""
+    rng = np.random.default_rng(semilla)
+    venta = _muestrear(rng, distribuciones['venta'], n)
+    reforma = np.maximum(_muestrear(rng, distribuciones['reforma'], n), 0)
+    # Años de procedimiento: enteros y no negativos, como anos_total
+    anos = np.maximum(np.rint(_muestrear(rng, distribuciones['anos'], n)), 0)
+
+    total = base['fijos'] + base['anuales'] * anos + reforma
+    margen = venta - total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rentabilidad = np.where(total > 0, margen / total * 100, np.nan)
+    return margen, rentabilidad
+
+
+def _bloques(muestras, semilla):
+    """Tamaños de bloque y semilla derivada de cada uno (mismo resultado con o sin pool de procesos)"""
+    tamanos = [TAMANO_BLOQUE] * (muestras // TAMANO_BLOQUE)
+    if muestras % TAMANO_BLOQUE:
+        tamanos.append(muestras % TAMANO_BLOQUE)
+    return tamanos, np.random.SeedSequence(semilla).spawn(len(tamanos))
+
+
+def _resumen(margen, rentabilidad, histograma=False):
+    validas = rentabilidad[~np.isnan(rentabilidad)]
+    resumen = {
+        'muestras': int(margen.size),
+        'probabilidad_perdida': round(float(np.mean(margen < 0)) * 100, 2) if margen.size else None,
+        'margen': _estadisticos(margen),
+        'rentabilidad': _estadisticos(validas),
+    }
+    if histograma and validas.size:
+        resumen['histograma'] = _histograma(validas)
+    return resumen
+
+
+def _estadisticos(valores):
+    if not valores.size:
+        return None
+    return _formatear_estadisticos(float(valores.mean()), float(valores.std()),
+                                   np.percentile(valores, PERCENTILES))
+
+
+def _formatear_estadisticos(media, desviacion, cortes):
+    return {
+        'media': round(media, 2),
+        'desviacion': round(desviacion, 2),
+        'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, cortes)},
+    }
+
+
+class _Acumulado:
+    """
+    Resumen parcial sin volver a recorrer lo ya simulado: media y desviación combinando
+    (n, media, M2) de cada bloque (Chan et al.) y percentiles sobre una submuestra de tamaño
+    fijo (las primeras muestras de cada bloque, que son independientes)
+    """
+
+    def __init__(self, por_bloque):
+        self.por_bloque = por_bloque
+        self.muestras = 0
+        self.perdidas = 0
+        self.momentos = {'margen': (0, 0.0, 0.0), 'rentabilidad': (0, 0.0, 0.0)}
+        self.submuestras = {'margen': [], 'rentabilidad': []}
+
+    def anadir(self, margen, rentabilidad):
+        self.muestras += margen.size
+        self.perdidas += int(np.count_nonzero(margen < 0))
+        for nombre, valores in (('margen', margen), ('rentabilidad', rentabilidad[~np.isnan(rentabilidad)])):
+            self.momentos[nombre] = _combinar(self.momentos[nombre], valores)
+            self.submuestras[nombre].append(valores[:self.por_bloque])
+
+    def resumen(self):
+        resumen = {
+            'muestras': self.muestras,
+            'probabilidad_perdida': round(self.perdidas / self.muestras * 100, 2) if self.muestras else None,
+        }
+        for nombre, (n, media, m2) in self.momentos.items():
+            resumen[nombre] = _formatear_estadisticos(
+                media, (m2 / n) ** 0.5, np.percentile(np.concatenate(self.submuestras[nombre]), PERCENTILES)
+            ) if n else None
+        return resumen
+
+
+def _combinar(acumulado, valores):
+    """(n, media, M2) de lo acumulado más un bloque"""
+    n_b = valores.size
+    if not n_b:
+        return acumulado
+    media_b = float(valores.mean())
+    m2_b = float(np.square(valores - media_b).sum())
+    n_a, media_a, m2_a = acumulado
+    n = n_a + n_b
+    delta = media_b - media_a
+    return n, media_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+def _histograma(valores):
+    # Se recortan las colas extremas para que las barras sean legibles
+    bajo, alto = np.percentile(valores, (0.5, 99.5))
+    if bajo == alto:
+        bajo, alto = bajo - 1, alto + 1
+    cuentas, bordes = np.histogram(np.clip(valores, bajo, alto), bins=BARRAS_HISTOGRAMA,
+                                   range=(bajo, alto))
+    maximo = int(cuentas.max()) or 1
+    return [{
+        'desde': round(float(bordes[i]), 2),
+        'hasta': round(float(bordes[i + 1]), 2),
+        'cuenta': int(c),
+        'porcentaje': round(int(c) / valores.size * 100, 2),
+        'altura': round(int(c) / maximo * 100, 1),
+        'perdida': bool(bordes[i + 1] <= 0),
+    } for i, c in enumerate(cuentas)]
+
+
+def simular_por_bloques(analisis, distribuciones=None, muestras=MUESTRAS, semilla=SEMILLA,
+                        procesos=None):
+    """
+    Generador: simula por bloques y produce un resumen parcial tras cada bloque
+    (el último, con 'final': True, es exacto e incluye el histograma; en los parciales los
+    percentiles se estiman con una submuestra de MUESTRAS_PARCIALES).
+    """
+    muestras = leer_muestras(muestras)
+    distribuciones = distribuciones or distribuciones_por_defecto(analisis)
+    base = costes_base(analisis)
+
+    tamanos, semillas = _bloques(muestras, semilla)
+
+    margen = np.empty(muestras)
+    rentabilidad = np.empty(muestras)
+    acumulado = _Acumulado(max(MUESTRAS_PARCIALES // len(tamanos), 1))
+
+    executor = ProcessPoolExecutor(max_workers=procesos) if procesos and procesos > 1 else None
+    try:
+        if executor is not None:
+            bloques = executor.map(simular_bloque, [base] * len(tamanos),
+                                   [distribuciones] * len(tamanos), tamanos, semillas)
+        else:
+            bloques = (simular_bloque(base, distribuciones, n, s) for n, s in zip(tamanos, semillas))
+
+        hecho = 0
+        for i, (m, r) in enumerate(bloques):
+            margen[hecho:hecho + m.size] = m
+            rentabilidad[hecho:hecho + r.size] = r
+            hecho += m.size
+            final = i == len(tamanos) - 1
+            if final:
+                resumen = _resumen(margen, rentabilidad, histograma=True)
+            else:
+                acumulado.anadir(m, r)
+                resumen = acumulado.resumen()
+            resumen.update(final=final, semilla=semilla, distribuciones=distribuciones)
+            yield resumen
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def simular(analisis, distribuciones=None, muestras=MUESTRAS, semilla=SEMILLA, procesos=None):
+    """Simulación completa: devuelve solo el resumen final"""
+    distribuciones = distribuciones or distribuciones_por_defecto(analisis)
+    return _simular(costes_base(analisis), distribuciones, leer_muestras(muestras), semilla, procesos)
+
+
+def _simular(base, distribuciones, muestras, semilla, procesos):
+    tamanos, semillas = _bloques(muestras, semilla)
+
+    if procesos and procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            bloques = list(executor.map(simular_bloque, [base] * len(tamanos),
+                                        [distribuciones] * len(tamanos), tamanos, semillas))
+    else:
+        bloques = [simular_bloque(base, distribuciones, n, s) for n, s in zip(tamanos, semillas)]
+
+    margen = np.concatenate([m for m, _ in bloques])
+    rentabilidad = np.concatenate([r for _, r in bloques])
+    resumen = _resumen(margen, rentabilidad, histograma=True)
+    resumen.update(final=True, semilla=semilla, distribuciones=distribuciones)
+    return resumen
+
+
+def simular_cacheado(analisis, distribuciones=None, muestras=MUESTRAS_PAGINA, semilla=SEMILLA):
+    """
+    simular() con los procesos del servidor y el resultado guardado por entradas (costes,
+    distribuciones, muestras y semilla): volver a abrir la página no repite la simulación.
+    El resumen devuelto es compartido, no se debe modificar.
+    """
+    distribuciones = distribuciones or distribuciones_por_defecto(analisis)
+    clave = json.dumps([costes_base(analisis), distribuciones, leer_muestras(muestras), int(semilla)],
+                       sort_keys=True)
+    return _simular_por_clave(clave)
+
+
+@lru_cache(maxsize=MAX_CACHE)
+def _simular_por_clave(clave):
+    base, distribuciones, muestras, semilla = json.loads(clave)
+    return _simular(base, distribuciones, muestras, semilla, PROCESOS)
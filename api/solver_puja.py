@@ -0,0 +1,261 @@
+"""
+Cálculo de la puja máxima para una rentabilidad objetivo
+Invierte la cadena calcular_total_inversion → calcular_margen_rentabilidad:
+solución cerrada y ajuste al céntimo con las funciones escalares (o vectorizadas en lote)
+"""
+
+import math
+
+import numpy as np
+
+from . import subasta_logic, escenarios
+
+# Costes que no dependen de la puja, en el orden de calcular_total_inversion
+COSTES = ('itp_calculado', 'notaria_registro', 'ibi_total', 'comunidad_total',
+          'alarmas', 'suministros', 'reforma')
+
+MAX_PASOS_AJUSTE = 64
+
+
+def _numero(datos, campo, defecto=0.0):
+    """Entrada numérica (vacía o 0 → defecto); no numérica, 'inf' o 'nan' → ValueError, como leer_entradas"""
+    valor = datos.get(campo)
+    if valor is None or valor == '':
+        return defecto
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        numero = math.nan
+    if not math.isfinite(numero):
+        raise ValueError(f"Valor no válido en {campo}: {valor!r}")
+    return numero or defecto
+
+
+def _objetivo(escenario, valor):
+    """Rentabilidad objetivo (%) de un escenario; no numérica o no finita → ValueError"""
+    try:
+        objetivo = float(valor)
+    except (TypeError, ValueError):
+        objetivo = math.nan
+    if not math.isfinite(objetivo):
+        raise ValueError(f"Rentabilidad objetivo no válida en {escenario}: {valor!r}")
+    return objetivo
+
+
+def costes_fijos(datos, ano_actual=None):
+    """Costes independientes de la puja a partir de las entradas del formulario (como calcular_analisis)"""
+    costes = dict.fromkeys(COSTES, 0.0)
+
+    valor_referencia = _numero(datos, 'valor_referencia')
+    if valor_referencia:
+        resultado, _ = subasta_logic.calcular_itp_notaria(
+            valor_referencia, _numero(datos, 'itp_porcentaje', 7.0))
+        costes['itp_calculado'] = resultado['itp']
+        costes['notaria_registro'] = resultado['notaria']
+
+    anos_total = None
+    ibi_anual = _numero(datos, 'ibi_anual')
+    ano_procedimiento = int(_numero(datos, 'ano_procedimiento'))
+    if ibi_anual and ano_procedimiento:
+        resultado, _ = subasta_logic.calcular_ibi_judicial(ibi_anual, ano_procedimiento, ano_actual)
+        anos_total = resultado['anos_total']
+        costes['ibi_total'] = resultado['total_ibi']
+
+    comunidad_anual = _numero(datos, 'comunidad_anual')
+    if comunidad_anual and anos_total:
+        costes['comunidad_total'], _ = subasta_logic.calcular_comunidad_judicial(
+            comunidad_anual, anos_total)
+
+    for campo in ('alarmas', 'suministros', 'reforma'):
+        costes[campo] = _numero(datos, campo)
+
+    return costes
+
+
+def _umbral_sin_redondeo(objetivo):
+    """
+    La app compara la rentabilidad redondeada a 2 decimales: round(x, 2) >= R equivale
+    (salvo el caso exacto a medio camino) a x >= R' con R' el menor múltiplo de 0,01 >= R menos 0,005
+    """
+    return np.ceil(np.asarray(objetivo) * 100 - 1e-9) / 100 - 0.005
+
+
+def _rentabilidad(centimos, venta, costes):
+    """Rentabilidad (redondeada, como la app) para una puja en céntimos"""
+    total, _ = subasta_logic.calcular_total_inversion(
+        centimos / 100, *(costes[c] for c in COSTES))
+    if not total:
+        return None
+    resultado, _ = subasta_logic.calcular_margen_rentabilidad(venta, total)
+    return resultado['rentabilidad'] if resultado else None
+
+
+def _cumple(centimos, venta, costes, objetivo):
+    rentabilidad = _rentabilidad(centimos, venta, costes)
+    return rentabilidad is not None and rentabilidad >= objetivo
+
+
+def puja_maxima(venta, objetivo, costes):
+    """
+    Mayor puja (al céntimo) cuya rentabilidad es >= objetivo (%).
+    Devuelve (puja, None) o (None, mensaje de error).
+    """
+    if not venta or venta <= 0:
+        return None, "Sin precio de venta"
+    if objetivo <= -100:
+        return None, "El objetivo no limita la puja"
+
+    fijos = sum(costes[c] for c in COSTES)
+    # Solución cerrada: (V - T) / T >= R  <=>  T <= V / (1 + R)
+    estimacion = venta / (1 + float(_umbral_sin_redondeo(objetivo)) / 100) - fijos
+    if not math.isfinite(estimacion * 100):
+        # Importes no finitos o tan grandes que no caben en céntimos
+        return None, "Importes fuera de rango"
+    if estimacion < 0 and not _cumple(0, venta, costes, objetivo):
+        return None, "Ni con puja 0 se alcanza la rentabilidad objetivo"
+
+    # Ajuste al céntimo: el redondeo de total y rentabilidad desplaza el límite unos céntimos
+    centimos = max(int(math.floor(estimacion * 100)), 0)
+    if _cumple(centimos, venta, costes, objetivo):
+        bajo, paso = centimos, 1
+        while _cumple(bajo + paso, venta, costes, objetivo):
+            bajo, paso = bajo + paso, paso * 2
+        alto = bajo + paso
+    else:
+        alto, paso = centimos, 1
+        while alto - paso > 0 and not _cumple(alto - paso, venta, costes, objetivo):
+            alto, paso = alto - paso, paso * 2
+        bajo = max(alto - paso, 0)
+        if not _cumple(bajo, venta, costes, objetivo):
+            return None, "Ni con puja 0 se alcanza la rentabilidad objetivo"
+
+    # Bisección en [bajo (cumple), alto (no cumple)]
+    while alto - bajo > 1:
+        medio = (bajo + alto) // 2
+        if _cumple(medio, venta, costes, objetivo):
+            bajo = medio
+        else:
+            alto = medio
+
+    return bajo / 100, None
+
+
+def resolver(datos, objetivos, ano_actual=None):
+    """
+    Puja máxima por escenario para unas entradas de formulario.
+    `objetivos` es {'bajo': %, 'medio': %, 'alto': %} (se ignoran los escenarios sin objetivo).
+    """
+    costes = costes_fijos(datos, ano_actual)
+    valor_subasta = _numero(datos, 'valor_subasta')
+    resultados = {}
+
+    for escenario, objetivo in objetivos.items():
+        if escenario not in escenarios.ESCENARIOS or objetivo is None or objetivo == '':
+            continue
+        venta = _numero(datos, f'venta_{escenario}')
+        puja, error = puja_maxima(venta, _objetivo(escenario, objetivo), costes)
+        if error:
+            resultados[escenario] = {'error': error}
+            continue
+
+        total, _ = subasta_logic.calcular_total_inversion(puja, *(costes[c] for c in COSTES))
+        margen, _ = subasta_logic.calcular_margen_rentabilidad(venta, total)
+        resultado = {
+            'puja_maxima': puja,
+            'total_inversion': total,
+            'margen': margen['margen'],
+            'rentabilidad': margen['rentabilidad'],
+        }
+        if valor_subasta and puja:
+            porcentaje, _ = subasta_logic.calcular_porcentaje_puja(puja, valor_subasta)
+            resultado.update(porcentaje=porcentaje['porcentaje'],
+                             veredicto=porcentaje['veredicto'],
+                             color=porcentaje['color'])
+        resultados[escenario] = resultado
+
+    return resultados
+
+
+def _rentabilidad_vector(centimos, venta, costes):
+    total = centimos / 100
+    for c in COSTES:
+        total = total + costes[c]
+    total = escenarios.redondear(total)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        rentabilidad = escenarios.redondear(((venta - total) / total) * 100)
+    return np.where(total != 0, rentabilidad, np.nan)
+
+
+def puja_maxima_lote(venta, objetivo, costes):
+    """
+    Versión vectorizada de puja_maxima (p.ej. para todos los análisis guardados).
+    `venta`, `objetivo` y cada coste son arrays; devuelve un array de pujas (NaN = sin solución).
+    """
+    venta = np.asarray(venta, dtype=float)
+    objetivo = np.broadcast_to(np.asarray(objetivo, dtype=float), venta.shape)
+    costes = {c: np.nan_to_num(np.asarray(costes[c], dtype=float)) for c in COSTES}
+    fijos = sum(costes[c] for c in COSTES)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        estimacion = (venta / (1 + _umbral_sin_redondeo(objetivo) / 100) - fijos) * 100
+    validos = (venta > 0) & (objetivo > -100) & np.isfinite(estimacion)
+    centimos = np.where(validos, np.maximum(np.floor(estimacion), 0), 0)
+
+    def cumple(c):
+        return _rentabilidad_vector(c, venta, costes) >= objetivo
+
+    # Ajuste al céntimo en paralelo para todo el lote
+    for _ in range(MAX_PASOS_AJUSTE):
+        bajar = validos & ~cumple(centimos) & (centimos > 0)
+        subir = validos & cumple(centimos + 1)
+        if not (bajar.any() or subir.any()):
+            break
+        centimos = centimos - bajar + subir
+
+    resultado = np.where(validos & cumple(centimos), centimos / 100, np.nan)
+
+    # Los que no convergen (casos extremos) se resuelven uno a uno
+    pendientes = validos & (~cumple(centimos) & (centimos > 0) | cumple(centimos + 1))
+    for i in np.flatnonzero(pendientes):
+        puja, _ = puja_maxima(float(venta[i]), float(objetivo[i]),
+                              {c: float(costes[c][i]) for c in COSTES})
+        resultado[i] = np.nan if puja is None else puja
+
+    return resultado
+
+
+def resolver_analisis_guardados(user_id, objetivos):
+    """Puja máxima por escenario para todos los análisis guardados de un usuario"""
+    from .models import db, AnalisisSubasta
+
+    columnas = ['id', 'identificador', 'valor_subasta', 'puja'] + list(COSTES) + \
+               [f'venta_{e}' for e in escenarios.ESCENARIOS]
+    filas = db.session.query(*(getattr(AnalisisSubasta, c) for c in columnas))\
+        .filter(AnalisisSubasta.user_id == user_id)\
+        .order_by(AnalisisSubasta.id).all()
+    if not filas:
+        return []
+
+    tabla = {c: [f[i] for f in filas] for i, c in enumerate(columnas)}
+    numericas = {c: np.array(tabla[c], dtype=float) for c in columnas if c not in ('id', 'identificador')}
+    costes = {c: numericas[c] for c in COSTES}
+
+    resultados = [{'id': i, 'identificador': ident, 'puja_actual': puja}
+                  for i, ident, puja in zip(tabla['id'], tabla['identificador'], tabla['puja'])]
+
+    for escenario, objetivo in objetivos.items():
+        if escenario not in escenarios.ESCENARIOS or objetivo is None or objetivo == '':
+            continue
+        pujas = puja_maxima_lote(numericas[f'venta_{escenario}'], _objetivo(escenario, objetivo), costes)
+        veredictos = escenarios.evaluar(puja=np.nan_to_num(pujas),
+                                        valor_subasta=np.nan_to_num(numericas['valor_subasta']))
+        for i, resultado in enumerate(resultados):
+            if np.isnan(pujas[i]):
+                resultado[escenario] = None
+                continue
+            resultado[escenario] = {'puja_maxima': float(pujas[i])}
+            if veredictos['veredicto'][i]:
+                resultado[escenario]['porcentaje'] = float(veredictos['porcentaje_puja'][i])
+                resultado[escenario]['veredicto'] = str(veredictos['veredicto'][i])
+
+    return resultados
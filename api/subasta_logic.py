@@ -4,11 +4,16 @@ Lógica de negocio para análisis de subastas
 Extraído de Subasta.py y adaptado para web
 """
 
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
+from functools import lru_cache
+import importlib.util
 import re
 
+from . import metricas, numeros
+
+# bs4 y requests (descarga_boe) se importan al extraer la primera subasta, no al arrancar:
+# los cálculos de este módulo se usan en todas las vistas y no los necesitan
+
 # Campos de datos de subasta
 CAMPOS = [
     'Identificador', 'Fecha de conclusión', 'Cantidad reclamada',
@@ -18,7 +23,11 @@ CAMPOS = [
 
 
 def limpiar_entero_por_texto(texto):
-    """Limpia un número con formato español (puntos como miles, comas como decimales)"""
+    """
+    Limpia un número con formato español (puntos como miles, comas como decimales) quitando
+    los decimales. Es la limpieza del parseo original (benchmarks); el parseo usa
+    numeros.texto_importe, que conserva los céntimos
+    """
     texto = texto.replace('.', '').replace(',', '.').replace(' ', '').strip()
     if ',' in texto:
         texto = texto.split(',')[0]
@@ -47,69 +56,124 @@ def construir_urls(urlbase):
     return url_info, url_bienes
 
 
+def clave_subasta(urlbase):
+    """Clave normalizada de una subasta: host, ruta y parámetros ordenados (sin 'ver')"""
+    p = urlparse(urlbase)
+    query = parse_qs(p.query)
+    params = sorted((k, query[k][0]) for k in query if k != 'ver')
+    rest = '&'.join(f"{k}={v}" for k, v in params)
+    return f"{p.netloc.lower()}{p.path}?{rest}"
+
+
 def extraer_datos_subasta(urlbase):
     """Extrae datos de la subasta desde la URL del BOE"""
+    from . import descarga_boe
+
     urls = construir_urls(urlbase)
+    
+    # Ambas páginas (ver=1 y ver=3) se descargan a la vez con un plazo total común
+    paginas = descarga_boe.descargar_paginas(urls)
+    
+    return parsear_paginas(paginas)
+
+
+def _con_prefijo_cp(valor):
+    return f"CP {valor}"
+
+
+# Código postal en la dirección: el que añade el extractor ("CP 28013") o, si no, un número
+# suelto de 5 cifras que empiece por un código de provincia válido (01-52)
+PATRON_CP_EXTRAIDO = re.compile(r'\bCP (\d{2})\d{3}\b')
+PATRON_CP_LIBRE = re.compile(r'\b(0[1-9]|[1-4]\d|5[0-2])\d{3}\b')
+
+
+def codigo_provincia(direccion):
+    """Dos primeras cifras del código postal de la dirección ('' si no tiene)"""
+    if not direccion:
+        return ''
+    encontrado = PATRON_CP_EXTRAIDO.search(direccion) or PATRON_CP_LIBRE.search(direccion)
+    return encontrado.group(1) if encontrado else ''
+
+
+# Reglas etiqueta → campo, en orden de prioridad (equivalen a la antigua cadena if/elif).
+# (subcadenas de la etiqueta, campo destino, transformación del valor, solo si el campo está vacío)
+# Un destino None significa "componente de la dirección" (se acumula, no se sobrescribe).
+REGLAS_CAMPOS = (
+    (('identificador',), 'Identificador', None, True),
+    (('conclusión',), 'Fecha de conclusión', None, True),
+    (('cantidad reclamada',), 'Cantidad reclamada', numeros.texto_importe, True),
+    (('valor subasta',), 'Valor subasta', numeros.texto_importe, True),
+    (('tasación',), 'Tasación', numeros.texto_importe, True),
+    (('tramos entre pujas',), 'Tramos entre pujas', numeros.texto_importe, True),
+    (('depósito',), 'Importe del depósito', numeros.texto_importe, True),
+    (('dirección', 'ubicación', 'domicilio', 'bien'), None, None, False),
+    (('código postal',), None, _con_prefijo_cp, False),
+    (('localidad', 'municipio'), None, None, False),
+    (('provincia',), None, None, False),
+    (('referencia catastral', 'catastral'), 'Referencia catastral', None, True),
+)
+
+# lxml es mucho más rápido que html.parser; se usa si está instalado
+PARSER_HTML = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+
+@lru_cache(maxsize=1)
+def _solo_tablas():
+    """Solo interesan las tablas: el resto del documento no se llega a construir"""
+    from bs4 import SoupStrainer
+    return SoupStrainer('table')
+
+
+@lru_cache(maxsize=1024)
+def reglas_para_etiqueta(campo):
+    """Reglas candidatas para una etiqueta (las etiquetas del BOE se repiten en cada página)"""
+    return tuple(regla for regla in REGLAS_CAMPOS
+                 if any(subcadena in campo for subcadena in regla[0]))
+
+
+def parsear_paginas(paginas):
+    """Extrae los CAMPOS del HTML de las páginas ver=1 y ver=3 (None = página no disponible)"""
+    with metricas.tramo('boe_parseo'):
+        return _parsear_paginas(paginas)
+
+
+def _parsear_paginas(paginas):
+    from bs4 import BeautifulSoup
+
     resultados = {campo: '' for campo in CAMPOS}
     direccion_componentes = []
     
-    for url in urls:
+    for html in paginas:
+        if html is None:
+            continue
+        
         try:
-            response = requests.get(url, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(html, PARSER_HTML, parse_only=_solo_tablas())
             
             for tabla in soup.find_all('table'):
                 for fila in tabla.find_all('tr'):
                     th = fila.find('th')
+                    if not th:
+                        continue
                     td = fila.find('td')
+                    if not td:
+                        continue
                     
-                    if not th or not td:
+                    reglas = reglas_para_etiqueta(th.text.strip().lower())
+                    if not reglas:
                         continue
                     
-                    campo = th.text.strip().lower()
                     valor = td.text.strip()
                     
-                    # Identificador
-                    if 'identificador' in campo and not resultados['Identificador']:
-                        resultados['Identificador'] = valor
-                    
-                    # Fecha de conclusión
-                    elif 'conclusión' in campo and not resultados['Fecha de conclusión']:
-                        resultados['Fecha de conclusión'] = valor
-                    
-                    # Cantidad reclamada
-                    elif 'cantidad reclamada' in campo and not resultados['Cantidad reclamada']:
-                        resultados['Cantidad reclamada'] = limpiar_entero_por_texto(valor)
-                    
-                    # Valor subasta
-                    elif 'valor subasta' in campo and not resultados['Valor subasta']:
-                        resultados['Valor subasta'] = limpiar_entero_por_texto(valor)
-                    
-                    # Tasación
-                    elif 'tasación' in campo and not resultados['Tasación']:
-                        resultados['Tasación'] = limpiar_entero_por_texto(valor)
-                    
-                    # Tramos entre pujas
-                    elif 'tramos entre pujas' in campo and not resultados['Tramos entre pujas']:
-                        resultados['Tramos entre pujas'] = limpiar_entero_por_texto(valor)
-                    
-                    # Depósito
-                    elif 'depósito' in campo and not resultados['Importe del depósito']:
-                        resultados['Importe del depósito'] = limpiar_entero_por_texto(valor)
-                    
-                    # Dirección y componentes
-                    elif 'dirección' in campo or 'ubicación' in campo or 'domicilio' in campo or 'bien' in campo:
-                        direccion_componentes.append(valor)
-                    elif 'código postal' in campo:
-                        direccion_componentes.append(f"CP {valor}")
-                    elif 'localidad' in campo or 'municipio' in campo:
-                        direccion_componentes.append(valor)
-                    elif 'provincia' in campo:
-                        direccion_componentes.append(valor)
-                    
-                    # Referencia catastral
-                    elif ('referencia catastral' in campo or 'catastral' in campo) and not resultados['Referencia catastral']:
-                        resultados['Referencia catastral'] = valor
+                    # Primera regla aplicable (las de campo único se saltan si ya están rellenas)
+                    for _, destino, transformar, unico in reglas:
+                        if destino is None:
+                            direccion_componentes.append(transformar(valor) if transformar else valor)
+                            break
+                        if unico and resultados[destino]:
+                            continue
+                        resultados[destino] = transformar(valor) if transformar else valor
+                        break
         
         except Exception as e:
             # En caso de error, continuar sin interrumpir
@@ -253,13 +317,7 @@ def calcular_margen_rentabilidad(precio_venta, total_inversion):
 
 
 def formatear_numero(numero):
-    """Formatea un número al estilo español (1.234.567,89)"""
-    try:
-        num = float(numero)
-        # Formato con separador de miles y 2 decimales
-        formatted = f"{num:,.2f}"
-        # Cambiar formato inglés a español
-        formatted = formatted.replace(',', 'X').replace('.', ',').replace('X', '.')
-        return formatted
-    except:
+    """Formatea un número al estilo español (1.234.567,89); None se sigue devolviendo como 'None'"""
+    if numero is None:
         return str(numero)
+    return numeros.formatear(numero)
@@ -0,0 +1,214 @@
+"""
+Cola de trabajos de extracción en segundo plano
+Los trabajos se guardan en la base de datos (TrabajoExtraccion) y un proceso worker local los procesa.
+Un trabajo fallido se reintenta con espera exponencial (proximo_intento) hasta MAX_INTENTOS; el
+worker devuelve a la cola periódicamente los que se quedaron en_curso (worker caído).
+
+Worker: python -m api.trabajos --concurrencia 4
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from .models import db, TrabajoExtraccion
+from . import cache_subastas
+
+# Configuración (sobrescribible por variables de entorno)
+CONCURRENCIA = int(os.environ.get('TRABAJOS_CONCURRENCIA', 4))
+INTERVALO_SONDEO = float(os.environ.get('TRABAJOS_INTERVALO', 0.5))
+MAX_INTENTOS = int(os.environ.get('TRABAJOS_MAX_INTENTOS', 3))
+MINUTOS_ATASCADO = int(os.environ.get('TRABAJOS_MINUTOS_ATASCADO', 5))
+REINTENTO = timedelta(seconds=float(os.environ.get('TRABAJOS_REINTENTO_SEGUNDOS', 10)))
+INTERVALO_ATASCADOS = float(os.environ.get('TRABAJOS_INTERVALO_ATASCADOS', 60))
+
+logger = logging.getLogger(__name__)
+
+# Streams SSE abiertos en este proceso (ver abrir_conexion_sse)
+_conexiones_sse = 0
+_cerrojo_sse = threading.Lock()
+
+
+def encolar(user_id, url_subasta):
+    """Crea un trabajo pendiente y devuelve su id"""
+    trabajo = TrabajoExtraccion(user_id=user_id, url_subasta=url_subasta)
+    db.session.add(trabajo)
+    db.session.commit()
+    return trabajo.id
+
+
+def estado_trabajo(trabajo):
+    """Representación JSON de un trabajo"""
+    datos = {
+        'id': trabajo.id,
+        'estado': trabajo.estado,
+        'url': trabajo.url_subasta,
+        'intentos': trabajo.intentos,
+    }
+    if trabajo.estado == 'completado':
+        datos['success'] = True
+        datos['datos'] = json.loads(trabajo.resultado or '{}')
+    elif trabajo.estado == 'error':
+        datos['error'] = trabajo.error
+    return datos
+
+
+def abrir_conexion_sse(maximo):
+    """
+    Reserva uno de los `maximo` streams SSE del proceso; False si están todos ocupados.
+    Cada stream ocupa un hilo del servidor hasta que el trabajo termina o vence SSE_TIMEOUT.
+    """
+    global _conexiones_sse
+    with _cerrojo_sse:
+        if _conexiones_sse >= maximo:
+            return False
+        _conexiones_sse += 1
+        return True
+
+
+def cerrar_conexion_sse():
+    global _conexiones_sse
+    with _cerrojo_sse:
+        _conexiones_sse -= 1
+
+
+def reclamar(limite):
+    """
+    Marca como en_curso hasta `limite` trabajos pendientes y devuelve sus ids.
+    El UPDATE condicionado al estado evita que dos workers cojan el mismo trabajo.
+    """
+    ahora = datetime.utcnow()
+    candidatos = [fila[0] for fila in db.session.query(TrabajoExtraccion.id)
+                  .filter(TrabajoExtraccion.estado == 'pendiente',
+                          db.or_(TrabajoExtraccion.proximo_intento.is_(None),
+                                 TrabajoExtraccion.proximo_intento <= ahora))
+                  .order_by(TrabajoExtraccion.id)
+                  .limit(limite).all()]
+
+    reclamados = []
+    for trabajo_id in candidatos:
+        filas = TrabajoExtraccion.query.filter_by(id=trabajo_id, estado='pendiente').update({
+            'estado': 'en_curso',
+            'fecha_inicio': ahora,
+            'intentos': TrabajoExtraccion.intentos + 1,
+        }, synchronize_session=False)
+        if filas == 1:
+            reclamados.append(trabajo_id)
+    db.session.commit()
+    return reclamados
+
+
+def liberar_atascados():
+    """
+    Devuelve a la cola los trabajos en_curso de un worker que murió a mitad; los que ya
+    agotaron sus intentos (p. ej. uno que tumba al worker) pasan a error
+    """
+    limite = datetime.utcnow() - timedelta(minutes=MINUTOS_ATASCADO)
+    atascados = TrabajoExtraccion.query.filter(
+        TrabajoExtraccion.estado == 'en_curso',
+        TrabajoExtraccion.fecha_inicio < limite,
+    )
+    agotados = atascados.filter(TrabajoExtraccion.intentos >= MAX_INTENTOS).update({
+        'estado': 'error',
+        'error': 'El trabajo no terminó en ninguno de sus intentos',
+        'fecha_fin': datetime.utcnow(),
+    }, synchronize_session=False)
+    filas = atascados.update({'estado': 'pendiente'}, synchronize_session=False)
+    db.session.commit()
+    return filas + agotados
+
+
+def espera_reintento(intentos):
+    """Espera antes del siguiente intento: REINTENTO, el doble, el cuádruple..."""
+    return REINTENTO * 2 ** max(intentos - 1, 0)
+
+
+def procesar(trabajo_id):
+    """Ejecuta la extracción de un trabajo ya reclamado y guarda el resultado"""
+    trabajo = db.session.get(TrabajoExtraccion, trabajo_id)
+    try:
+        datos = cache_subastas.obtener_datos_subasta(trabajo.url_subasta)
+        if not any(datos.values()):
+            raise ValueError("No se pudieron obtener datos de la subasta")
+        trabajo.resultado = json.dumps(datos, ensure_ascii=False)
+        trabajo.estado = 'completado'
+        trabajo.error = None
+    except Exception as e:
+        # Se reintenta más tarde (con espera creciente) mientras queden intentos
+        trabajo.estado = 'pendiente' if trabajo.intentos < MAX_INTENTOS else 'error'
+        trabajo.error = str(e)
+        if trabajo.estado == 'pendiente':
+            trabajo.proximo_intento = datetime.utcnow() + espera_reintento(trabajo.intentos)
+    trabajo.fecha_fin = datetime.utcnow()
+    db.session.commit()
+    return trabajo.estado
+
+
+def ejecutar_worker(app, concurrencia=CONCURRENCIA, intervalo=INTERVALO_SONDEO, una_pasada=False):
+    """
+    Bucle del worker: reclama trabajos y los procesa con `concurrencia` hilos; cada
+    INTERVALO_ATASCADOS segundos devuelve a la cola los de otros workers que murieron
+    """
+
+    def procesar_en_contexto(trabajo_id):
+        with app.app_context():
+            try:
+                return procesar(trabajo_id)
+            except Exception:
+                logger.exception("Error procesando el trabajo %s", trabajo_id)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    en_vuelo = set()
+    proxima_liberacion = 0.0
+    with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='worker-trabajos') as executor:
+        while True:
+            if time.monotonic() >= proxima_liberacion:
+                with app.app_context():
+                    liberados = liberar_atascados()
+                    db.session.remove()
+                if liberados:
+                    logger.info("%s trabajos atascados devueltos a la cola", liberados)
+                proxima_liberacion = time.monotonic() + INTERVALO_ATASCADOS
+
+            en_vuelo = {f for f in en_vuelo if not f.done()}
+            libres = concurrencia - len(en_vuelo)
+
+            reclamados = []
+            if libres > 0:
+                with app.app_context():
+                    reclamados = reclamar(libres)
+                    db.session.remove()
+
+            for trabajo_id in reclamados:
+                en_vuelo.add(executor.submit(procesar_en_contexto, trabajo_id))
+
+            if una_pasada and not reclamados and not en_vuelo:
+                # Los que esperan su reintento siguen en la cola
+                with app.app_context():
+                    quedan = TrabajoExtraccion.query.filter_by(estado='pendiente').count()
+                    db.session.remove()
+                if not quedan:
+                    return
+            if not reclamados:
+                time.sleep(intervalo)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Worker de trabajos de extracción')
+    parser.add_argument('--concurrencia', type=int, default=CONCURRENCIA)
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_SONDEO)
+    parser.add_argument('--una-pasada', action='store_true',
+                        help='termina cuando la cola queda vacía')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from .app import app
+    ejecutar_worker(app, args.concurrencia, args.intervalo, args.una_pasada)
@@ -0,0 +1,94 @@
+"""
+Caché de usuarios para current_user
+load_user devuelve una instantánea de solo lectura del usuario guardada en memoria durante
+unos segundos, en lugar de consultar la base de datos en cada petición. La suscripción no se
+comprueba con la instantánea: suscripcion_vigente va a la base de datos (una vez por petición),
+tanto desde las vistas Flask como desde la ruta ASGI, así que activarla, revocarla o borrar el
+usuario se nota al momento en todos los workers.
+"""
+
+import os
+import time
+import threading
+
+from flask import g, has_app_context
+from flask_login import UserMixin
+
+from .models import db, User, suscripcion_valida
+
+# Configuración (sobrescribible por variables de entorno)
+CACHE_TTL = float(os.environ.get('USUARIOS_CACHE_TTL', 30))
+
+COLUMNAS = ('id', 'username', 'email', 'suscripcion_activa', 'fecha_suscripcion',
+            'fecha_expiracion')
+
+
+class UsuarioSesion(UserMixin):
+    """Copia de solo lectura de las columnas de User que usan las vistas y plantillas"""
+
+    def __init__(self, id, username, email, suscripcion_activa, fecha_suscripcion,
+                 fecha_expiracion):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.suscripcion_activa = suscripcion_activa
+        self.fecha_suscripcion = fecha_suscripcion
+        self.fecha_expiracion = fecha_expiracion
+
+    def tiene_suscripcion_valida(self):
+        """Suscripción según la base de datos, no según la instantánea (ver suscripcion_vigente)"""
+        return suscripcion_vigente(self.id)
+
+
+_cache = {}
+# Generación por usuario: invalidar la incrementa y cargar no guarda lo que leyó antes
+_generaciones = {}
+_cerrojo = threading.Lock()
+
+
+def cargar(user_id):
+    """Usuario por id desde la caché (o la base de datos si no está o ha caducado); None si no existe"""
+    user_id = int(user_id)
+    ahora = time.monotonic()
+    with _cerrojo:
+        entrada = _cache.get(user_id)
+        generacion = _generaciones.get(user_id, 0)
+    if entrada and ahora - entrada[0] < CACHE_TTL:
+        return entrada[1]
+
+    fila = db.session.execute(
+        db.select(*(getattr(User, c) for c in COLUMNAS)).where(User.id == user_id)
+    ).first()
+    usuario = UsuarioSesion(*fila) if fila else None
+    with _cerrojo:
+        # Si se invalidó mientras se leía, lo leído puede ser anterior al cambio: no se guarda
+        if _generaciones.get(user_id, 0) == generacion:
+            _cache[user_id] = (ahora, usuario)
+    return usuario
+
+
+def invalidar(user_id):
+    """
+    Descarta el usuario de la caché (llamar tras modificarlo).
+    La caché es por proceso: en otros workers los datos mostrados (nombre, email) se refrescan
+    por CACHE_TTL; la suscripción no depende de la caché.
+    """
+    user_id = int(user_id)
+    with _cerrojo:
+        _cache.pop(user_id, None)
+        _generaciones[user_id] = _generaciones.get(user_id, 0) + 1
+
+
+def suscripcion_vigente(user_id):
+    """
+    True si el usuario existe y tiene la suscripción vigente ahora mismo. Consulta la base de
+    datos una vez por petición (se recuerda en g); la hora se evalúa en cada llamada.
+    """
+    user_id = int(user_id)
+    recordadas = g.setdefault('_suscripciones', {}) if has_app_context() else {}
+    if user_id not in recordadas:
+        recordadas[user_id] = db.session.execute(
+            db.select(User.suscripcion_activa, User.fecha_expiracion).where(User.id == user_id)
+        ).first()
+    fila = recordadas[user_id]
+    return fila is not None and suscripcion_valida(*fila)
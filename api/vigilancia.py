@@ -0,0 +1,287 @@
+"""
+Vigilancia de subastas en curso
+Los análisis marcados como seguidos se vuelven a consultar en el BOE hasta su fecha de
+conclusión, cada vez más a menudo según se acerca. Cada revisión:
+- pide las páginas con If-None-Match/If-Modified-Since: si el BOE responde 304 no se parsea nada
+- si hay que parsear, compara la huella (SHA-256) de los datos extraídos con la anterior
+- solo guarda los campos que han cambiado (CambioSubasta)
+
+Las descargas van por lotes con concurrencia acotada y una sola descarga por subasta aunque
+la sigan varios usuarios.
+
+Planificador: python -m api.vigilancia --concurrencia 4
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .models import db, SeguimientoSubasta, CambioSubasta
+from . import subasta_logic, descarga_boe
+
+# Configuración (sobrescribible por variables de entorno)
+CONCURRENCIA = int(os.environ.get('VIGILANCIA_CONCURRENCIA', 4))
+LOTE = int(os.environ.get('VIGILANCIA_LOTE', 50))
+ESPERA_MAXIMA = float(os.environ.get('VIGILANCIA_ESPERA_MAXIMA', 60))
+REINTENTO_ERROR = timedelta(minutes=int(os.environ.get('VIGILANCIA_REINTENTO_MINUTOS', 5)))
+
+# Cadencia según lo que falta para la conclusión: (falta menos de, revisar cada)
+CADENCIA = (
+    (timedelta(hours=2), timedelta(minutes=10)),
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=7), timedelta(hours=6)),
+)
+INTERVALO_LEJANO = timedelta(days=1)
+
+PATRON_ISO = re.compile(r'ISO:\s*([0-9T:+\-]+)')
+
+logger = logging.getLogger(__name__)
+
+
+def fecha_conclusion(texto):
+    """
+    Fecha de conclusión del BOE ('20-01-2025 18:00:00 CET  (ISO: 2025-01-20T18:00:00+01:00)')
+    como datetime UTC sin zona, o None si no se reconoce
+    """
+    if not texto:
+        return None
+    coincidencia = PATRON_ISO.search(texto)
+    try:
+        if coincidencia:
+            fecha = datetime.fromisoformat(coincidencia.group(1))
+            if fecha.tzinfo is not None:
+                return fecha.astimezone(timezone.utc).replace(tzinfo=None)
+            return fecha
+        return datetime.strptime(texto.strip()[:19], '%d-%m-%Y %H:%M:%S')
+    except ValueError:
+        return None
+
+
+def intervalo(conclusion, ahora):
+    """Tiempo hasta la siguiente revisión: más corto cuanto más cerca está la conclusión"""
+    if conclusion is None:
+        return INTERVALO_LEJANO
+    falta = conclusion - ahora
+    for limite, cada in CADENCIA:
+        if falta < limite:
+            return cada
+    return INTERVALO_LEJANO
+
+
+def huella(datos):
+    """Huella de los datos extraídos (independiente del orden de las claves)"""
+    texto = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def diferencias(anteriores, nuevos):
+    """{campo: (antes, después)} de los campos que cambian"""
+    return {campo: (anteriores.get(campo), nuevos.get(campo))
+            for campo in sorted(set(anteriores) | set(nuevos))
+            if anteriores.get(campo) != nuevos.get(campo)}
+
+
+# ---------- Alta y baja ----------
+
+def seguir(analisis, ahora=None):
+    """Empieza (o reanuda) el seguimiento de un análisis; la primera revisión es inmediata"""
+    if not analisis.url_subasta:
+        raise ValueError("El análisis no tiene URL de subasta")
+    ahora = ahora or datetime.utcnow()
+    seguimiento = analisis.seguimiento
+    if seguimiento is None:
+        seguimiento = SeguimientoSubasta(analisis=analisis, user_id=analisis.user_id,
+                                         revisiones=0, errores_seguidos=0)
+        db.session.add(seguimiento)
+    seguimiento.url_subasta = analisis.url_subasta
+    seguimiento.activo = True
+    seguimiento.proxima_revision = ahora
+    seguimiento.fecha_conclusion = fecha_conclusion(analisis.fecha_conclusion)
+    return seguimiento
+
+
+def dejar_de_seguir(analisis):
+    """Desactiva el seguimiento conservando los cambios ya detectados"""
+    if analisis.seguimiento is not None:
+        analisis.seguimiento.activo = False
+
+
+# ---------- Revisión ----------
+
+def comprobar(url, validadores=None):
+    """
+    Descarga condicional de las páginas de una subasta. No usa la base de datos
+    (corre en los hilos del lote). Devuelve (datos, validadores): datos es None si el BOE
+    respondió 304 en todas las páginas.
+    """
+    urls = subasta_logic.construir_urls(url)
+    cabeceras = [descarga_boe.cabeceras_condicionales(v) for v in validadores] if validadores else None
+    respuestas = descarga_boe.descargar_respuestas(urls, cabeceras=cabeceras)
+    if any(r is None for r in respuestas):
+        raise ConnectionError(f"No se pudieron descargar las páginas de {url}")
+    if all(r.status_code == 304 for r in respuestas):
+        return None, validadores
+
+    # Si solo alguna página respondió 304 hace falta su HTML: se descarga sin condiciones
+    pendientes = [i for i, r in enumerate(respuestas) if r.status_code == 304]
+    if pendientes:
+        for i, r in zip(pendientes, descarga_boe.descargar_respuestas([urls[i] for i in pendientes])):
+            if r is None:
+                raise ConnectionError(f"No se pudo descargar {urls[i]}")
+            respuestas[i] = r
+
+    datos = subasta_logic.parsear_paginas([r.text for r in respuestas])
+    if not any(datos.values()):
+        raise ValueError("No se pudieron obtener datos de la subasta")
+    return datos, [descarga_boe.validadores(r) for r in respuestas]
+
+
+def _validadores_comunes(seguimientos):
+    """Validadores para la petición condicional de un grupo (None si no coinciden)"""
+    valores = {s.validadores for s in seguimientos}
+    if len(valores) != 1 or None in valores:
+        return None
+    return json.loads(valores.pop())
+
+
+def _programar(seguimiento, ahora):
+    if seguimiento.fecha_conclusion is not None and ahora >= seguimiento.fecha_conclusion:
+        # Revisada ya concluida: es la última
+        seguimiento.activo = False
+        seguimiento.proxima_revision = None
+        return
+    siguiente = ahora + intervalo(seguimiento.fecha_conclusion, ahora)
+    if seguimiento.fecha_conclusion is not None:
+        siguiente = min(siguiente, seguimiento.fecha_conclusion)
+    seguimiento.proxima_revision = siguiente
+
+
+def _aplicar(seguimiento, datos, validadores, ahora):
+    """Registra el resultado de una revisión; devuelve cómo ha ido"""
+    seguimiento.revisiones += 1
+    seguimiento.ultima_revision = ahora
+    seguimiento.errores_seguidos = 0
+    seguimiento.error = None
+    seguimiento.validadores = json.dumps(validadores) if validadores else None
+
+    if datos is None:
+        estado = 'no_modificada'
+    else:
+        nueva = huella(datos)
+        if nueva == seguimiento.huella:
+            estado = 'sin_cambios'
+        else:
+            if seguimiento.datos is None:
+                estado = 'primera'
+            else:
+                estado = 'con_cambios'
+                for campo, (antes, despues) in diferencias(json.loads(seguimiento.datos), datos).items():
+                    seguimiento.cambios.append(CambioSubasta(fecha=ahora, campo=campo,
+                                                             anterior=antes, nuevo=despues))
+                seguimiento.ultimo_cambio = ahora
+            seguimiento.huella = nueva
+            seguimiento.datos = json.dumps(datos, ensure_ascii=False)
+            seguimiento.fecha_conclusion = (fecha_conclusion(datos.get('Fecha de conclusión'))
+                                            or seguimiento.fecha_conclusion)
+
+    _programar(seguimiento, ahora)
+    return estado
+
+
+def _registrar_error(seguimiento, error, ahora):
+    seguimiento.errores_seguidos += 1
+    seguimiento.error = str(error)
+    espera = min(REINTENTO_ERROR * 2 ** (seguimiento.errores_seguidos - 1),
+                 intervalo(seguimiento.fecha_conclusion, ahora))
+    seguimiento.proxima_revision = ahora + espera
+
+
+def revisar_pendientes(ahora=None, limite=LOTE, concurrencia=CONCURRENCIA):
+    """
+    Revisa hasta `limite` seguimientos vencidos con `concurrencia` descargas a la vez.
+    Devuelve un Counter con el resultado (primera, no_modificada, sin_cambios, con_cambios, error).
+    """
+    ahora = ahora or datetime.utcnow()
+    pendientes = (SeguimientoSubasta.query
+                  .filter(SeguimientoSubasta.activo.is_(True),
+                          SeguimientoSubasta.proxima_revision <= ahora)
+                  .order_by(SeguimientoSubasta.proxima_revision)
+                  .limit(limite).all())
+
+    # Una descarga por subasta aunque la sigan varios usuarios
+    grupos = {}
+    for seguimiento in pendientes:
+        grupos.setdefault(subasta_logic.clave_subasta(seguimiento.url_subasta), []).append(seguimiento)
+
+    resumen = Counter()
+    if not grupos:
+        return resumen
+    with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='vigilancia') as executor:
+        futuros = {executor.submit(comprobar, grupo[0].url_subasta, _validadores_comunes(grupo)): grupo
+                   for grupo in grupos.values()}
+        for futuro in as_completed(futuros):
+            try:
+                datos, validadores = futuro.result()
+            except Exception as e:
+                for seguimiento in futuros[futuro]:
+                    _registrar_error(seguimiento, e, ahora)
+                    resumen['error'] += 1
+            else:
+                for seguimiento in futuros[futuro]:
+                    resumen[_aplicar(seguimiento, datos, validadores, ahora)] += 1
+    db.session.commit()
+    return resumen
+
+
+def proxima_revision():
+    """Fecha de la revisión más cercana (None si no hay seguimientos activos)"""
+    return (db.session.query(db.func.min(SeguimientoSubasta.proxima_revision))
+            .filter(SeguimientoSubasta.activo.is_(True)).scalar())
+
+
+def ejecutar_planificador(app, concurrencia=CONCURRENCIA, limite=LOTE, una_pasada=False):
+    """Bucle del planificador: revisa lo vencido y duerme hasta la siguiente revisión"""
+    while True:
+        with app.app_context():
+            try:
+                resumen = revisar_pendientes(limite=limite, concurrencia=concurrencia)
+                siguiente = proxima_revision()
+            except Exception:
+                logger.exception("Error revisando seguimientos")
+                db.session.rollback()
+                resumen, siguiente = Counter(), None
+            finally:
+                db.session.remove()
+
+        if resumen:
+            logger.info("Revisión: %s", dict(resumen))
+        if una_pasada and sum(resumen.values()) < limite:
+            return
+        # Lote lleno: puede haber más vencidos, se sigue sin esperar
+        if sum(resumen.values()) >= limite:
+            continue
+        espera = ESPERA_MAXIMA
+        if siguiente is not None:
+            espera = min(max((siguiente - datetime.utcnow()).total_seconds(), 0), ESPERA_MAXIMA)
+        time.sleep(espera)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Planificador de la vigilancia de subastas')
+    parser.add_argument('--concurrencia', type=int, default=CONCURRENCIA)
+    parser.add_argument('--lote', type=int, default=LOTE)
+    parser.add_argument('--una-pasada', action='store_true',
+                        help='revisa lo vencido y termina')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from .app import app
+    ejecutar_planificador(app, args.concurrencia, args.lote, args.una_pasada)
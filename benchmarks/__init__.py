@@ -0,0 +1,2 @@
+# Benchmarks y utilidades de medición (servidor BOE falso, fixtures)
+# Se ejecutan como módulos: python -m benchmarks.bench_extraccion
@@ -0,0 +1,91 @@
+"""
+Benchmark de la analítica de cartera (api.analitica)
+Carga N análisis sintéticos en una base SQLite temporal y mide las agregaciones
+y el render del dashboard, en frío (sin caché) y con la caché por usuario
+
+Uso: python -m benchmarks.bench_analitica [--filas 50000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+CODIGOS_POSTALES = ('08013', '41007', '28013', '46001', '29016', '23001', '50003', '15001')
+
+
+def medir(funcion, repeticiones=5):
+    """Mejor tiempo en ms de varias repeticiones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, default=50000)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_analitica.db')}"
+
+    from api.app import app, db, User
+    from api import importacion, analitica
+
+    rng = random.Random(1234)
+    # Dos años de análisis hasta hoy, para que la tendencia mensual tenga datos
+    inicio_fechas = datetime.utcnow() - timedelta(days=730)
+
+    def fila(i):
+        cp = rng.choice(CODIGOS_POSTALES + ('',))
+        return {
+            'identificador': f'SUB-JA-2024-{i:06d}',
+            'direccion': f'CALLE EJEMPLO {i}, CP {cp}, CIUDAD' if cp else f'Calle sin código {i}',
+            'valor_subasta': rng.uniform(50000, 500000),
+            'puja': rng.uniform(20000, 400000),
+            'valor_referencia': rng.uniform(50000, 300000),
+            'ano_procedimiento': rng.choice([2016, 2019, 2021, 2023]),
+            'ibi_anual': rng.uniform(0, 2500),
+            'venta_medio': rng.uniform(50000, 600000),
+            'fecha_creacion': inicio_fechas + timedelta(minutes=rng.randrange(60 * 24 * 730)),
+        }
+
+    with app.app_context():
+        usuario = User(username='bench', email='bench@example.com')
+        usuario.set_password('bench')
+        usuario.activar_suscripcion()
+        db.session.add(usuario)
+        db.session.commit()
+        importacion.importar((fila(i) for i in range(args.filas)), usuario.id)
+        user_id = usuario.id
+        print(f"{args.filas:,} análisis cargados")
+
+        for nombre, funcion in (('por_veredicto', analitica.por_veredicto),
+                                ('por_provincia', analitica.por_provincia),
+                                ('por_mes', analitica.por_mes)):
+            print(f"{nombre}: {medir(lambda: funcion(user_id)):.1f} ms")
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(user_id)
+
+    def dashboard_en_frio():
+        analitica.invalidar(user_id)
+        assert cliente.get('/dashboard').status_code == 200
+
+    def dashboard_cacheado():
+        assert cliente.get('/dashboard').status_code == 200
+
+    print(f"Dashboard sin caché: {medir(dashboard_en_frio):.1f} ms")
+    print(f"Dashboard con caché: {medir(dashboard_cacheado):.1f} ms")
+    with app.app_context():
+        print(f"resumen sin caché: {medir(lambda: (analitica.invalidar(user_id), analitica.resumen(user_id))):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark del arranque en frío (index.py, como en Vercel)
+- python -X importtime: tiempo de importación de index y paquetes que más pesan
+- Tiempo hasta la primera respuesta de cada ruta en un proceso nuevo (intérprete incluido)
+- Comprueba que el arranque no carga la pila de extracción (requests, bs4) ni numpy/alembic
+
+Cada medida se repite en procesos nuevos y se da la mediana. Con --salida se añade una línea
+JSON al fichero indicado (fecha, commit y medidas) para seguir la evolución entre versiones.
+
+Uso: python -m benchmarks.bench_arranque [--repeticiones 7] [--migrar] [--salida arranque.jsonl]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTAS = ('/', '/login')
+# Módulos que no deben cargarse hasta que se usen (extracción del BOE, cálculo, migraciones)
+DIFERIDOS = ('requests', 'bs4', 'lxml', 'httpx', 'numpy', 'alembic')
+
+PRIMERA_RESPUESTA = """
+import index
+respuesta = index.app.test_client().get({ruta!r})
+assert respuesta.status_code == 200, respuesta.status_code
+"""
+
+MODULOS_CARGADOS = """
+import sys, json, index
+print(json.dumps([m for m in {diferidos!r} if m in sys.modules]))
+"""
+
+
+def _ejecutar(codigo, entorno, *opciones):
+    """Ejecuta código en un intérprete nuevo; devuelve (segundos, stdout, stderr)"""
+    t0 = time.perf_counter()
+    proceso = subprocess.run([sys.executable, *opciones, '-c', codigo], cwd=RAIZ, env=entorno,
+                             capture_output=True, text=True)
+    duracion = time.perf_counter() - t0
+    if proceso.returncode:
+        raise RuntimeError(proceso.stderr)
+    return duracion, proceso.stdout, proceso.stderr
+
+
+def leer_importtime(salida):
+    """(total de index en µs, µs propios por paquete de primer nivel) desde -X importtime"""
+    total = 0
+    por_paquete = defaultdict(int)
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, modulo = linea[len('import time:'):].split('|')
+        modulo = modulo.strip()
+        por_paquete[modulo.split('.')[0]] += int(propio)
+        if modulo == 'index':
+            total = int(acumulado)
+    return total, por_paquete
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticiones', type=int, default=7)
+    parser.add_argument('--migrar', action='store_true',
+                        help='aplicar las migraciones al arrancar (por defecto ya están aplicadas)')
+    parser.add_argument('--salida', help='fichero JSONL donde añadir el resultado')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    # Configuración por defecto (la de Vercel), salvo que se pida migrar al arrancar
+    entorno = dict(os.environ, PYTHONPATH=RAIZ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(directorio, 'arranque.db')}")
+    entorno.pop('MIGRAR_AL_ARRANCAR', None)
+    if args.migrar:
+        entorno['MIGRAR_AL_ARRANCAR'] = '1'
+    # El esquema se crea una vez, como en un despliegue
+    subprocess.run([sys.executable, '-m', 'api.migraciones'], cwd=RAIZ, env=entorno,
+                   check=True, capture_output=True)
+
+    # 1. Importación
+    totales = []
+    paquetes = defaultdict(list)
+    for _ in range(args.repeticiones):
+        _, _, salida = _ejecutar('import index', entorno, '-X', 'importtime')
+        total, por_paquete = leer_importtime(salida)
+        totales.append(total / 1000)
+        for paquete, us in por_paquete.items():
+            paquetes[paquete].append(us / 1000)
+    importacion = statistics.median(totales)
+    print(f"Importación de index: {importacion:.1f} ms (mediana de {args.repeticiones})")
+    print("Paquetes que más pesan (tiempo propio):")
+    medianas = {p: statistics.median(v) for p, v in paquetes.items()}
+    for paquete, ms in sorted(medianas.items(), key=lambda x: -x[1])[:10]:
+        print(f"  {paquete:<24} {ms:8.1f} ms")
+
+    _, salida, _ = _ejecutar(MODULOS_CARGADOS.format(diferidos=DIFERIDOS), entorno)
+    cargados = json.loads(salida)
+    print(f"Módulos diferidos cargados al arrancar: {', '.join(cargados) or 'ninguno'}")
+
+    # 2. Primera respuesta (proceso completo: intérprete + importación + petición)
+    interprete = statistics.median(_ejecutar('pass', entorno)[0] for _ in range(args.repeticiones))
+    print(f"\nIntérprete vacío: {interprete * 1000:.1f} ms")
+    primeras = {}
+    for ruta in RUTAS:
+        tiempos = [_ejecutar(PRIMERA_RESPUESTA.format(ruta=ruta), entorno)[0]
+                   for _ in range(args.repeticiones)]
+        primeras[ruta] = statistics.median(tiempos) * 1000
+        print(f"Primera respuesta {ruta:<10} {primeras[ruta]:8.1f} ms "
+              f"(min {min(tiempos) * 1000:.1f})")
+
+    if args.salida:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                capture_output=True, text=True).stdout.strip()
+        registro = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'migrar': args.migrar,
+            'importacion_ms': round(importacion, 1),
+            'interprete_ms': round(interprete * 1000, 1),
+            'primera_respuesta_ms': {r: round(ms, 1) for r, ms in primeras.items()},
+            'diferidos_cargados': cargados,
+        }
+        with open(args.salida, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + '\n')
+        print(f"\nResultado añadido a {args.salida}")
+
+    if cargados:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark de rendimiento: extracción síncrona con N trabajadores frente a la ruta asíncrona
+contra el servidor BOE local con latencia añadida
+
+Uso: python -m benchmarks.bench_async [--peticiones 200] [--trabajadores 8] [--latencia 0.2]
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api import subasta_logic, extraccion_async
+from benchmarks.servidor_boe import ServidorBOE, identificadores_disponibles
+
+
+def urls_de_prueba(servidor, n):
+    """N URLs distintas (parámetro extra) para que ninguna se sirva de caché"""
+    ids = identificadores_disponibles()
+    return [f"{servidor.url_subasta(ids[i % len(ids)])}&n={i}" for i in range(n)]
+
+
+def ruta_sincrona(urls, trabajadores):
+    """Simula `trabajadores` workers síncronos atendiendo una extracción cada uno"""
+    with ThreadPoolExecutor(max_workers=trabajadores) as executor:
+        return list(executor.map(subasta_logic.extraer_datos_subasta, urls))
+
+
+async def ruta_asincrona(urls):
+    """Un único proceso con todas las extracciones en vuelo a la vez"""
+    try:
+        return await asyncio.gather(*(extraccion_async.extraer_datos_subasta_async(u) for u in urls))
+    finally:
+        await extraccion_async.cerrar_cliente()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--peticiones', type=int, default=200)
+    parser.add_argument('--trabajadores', type=int, default=8)
+    parser.add_argument('--latencia', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with ServidorBOE(latencia=args.latencia) as servidor:
+        urls = urls_de_prueba(servidor, args.peticiones)
+
+        inicio = time.perf_counter()
+        sincronos = ruta_sincrona(urls, args.trabajadores)
+        t_sync = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        asincronos = asyncio.run(ruta_asincrona(urls))
+        t_async = time.perf_counter() - inicio
+
+    assert sincronos == asincronos
+    assert all(d['Identificador'] for d in asincronos)
+
+    print(f"{args.peticiones} extracciones, latencia BOE {args.latencia * 1000:.0f} ms por página")
+    print(f"síncrona ({args.trabajadores} workers): {t_sync:6.2f} s  "
+          f"{args.peticiones / t_sync:8.1f} extracciones/s")
+    print(f"asíncrona (1 proceso):     {t_async:6.2f} s  "
+          f"{args.peticiones / t_async:8.1f} extracciones/s  (x{t_sync / t_async:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark de la búsqueda de texto (api.busqueda) en SQLite con FTS5
+Carga N análisis sintéticos (direcciones con tildes, identificadores, referencias catastrales
+y notas) y mide, para varias búsquedas, la primera página del listado y el recuento:
+- FTS5: el filtro `q` del listado (consultas.listar_analisis / contar_analisis)
+- LIKE: lo que haría falta sin índice (lower(col) LIKE '%texto%' en las cuatro columnas)
+Comprueba que las dos devuelven lo mismo y que el índice sigue a las altas, ediciones y bajas.
+
+Uso: python -m benchmarks.bench_busqueda [--filas 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+VIAS = ('Calle', 'Avenida', 'Plaza', 'Camino', 'Paseo', 'Ronda', 'Travesía')
+NOMBRES = ('Mayor', 'Real', 'Nueva', 'de la Constitución', 'Andalucía', 'San José', 'Cervantes',
+           'Pío XII', 'del Río', 'Gran Vía', 'Jardines', 'Nuestra Señora de Guía', 'Begoña')
+MUNICIPIOS = (('29', 'Málaga'), ('41', 'Sevilla'), ('14', 'Córdoba'), ('28', 'Madrid'),
+              ('46', 'València'), ('06', 'Zahínos'), ('15', 'A Coruña'), ('24', 'León'),
+              ('18', 'Güéjar Sierra'), ('08', "L'Hospitalet de Llobregat"), ('30', 'Cartagena'),
+              ('50', 'Zaragoza'), ('35', 'Las Palmas'), ('47', 'Valladolid'), ('31', 'Pamplona'))
+NOTAS = ('', '', '', 'Ocupada', 'Con inquilinos', 'Cédula de habitabilidad pendiente',
+         'Visitada, buen estado', 'Reformar baño y cocina', 'Cargas anteriores: hipoteca')
+
+# (nombre, búsqueda, equivalente LIKE: cada palabra en alguna de las columnas)
+BUSQUEDAS = (
+    ('municipio poco frecuente', 'zahinos', ['zahínos']),
+    ('calle + municipio', 'constitucion malaga', ['constitución', 'málaga']),
+    ('palabra frecuente', 'calle', ['calle']),
+    ('prefijo corto', 'gu', None),
+    ('identificador', 'SUB-JA-2024-0123', ['sub-ja-2024-0123']),
+    ('referencia catastral', '7788', None),
+    ('notas', 'cedula', ['cédula']),
+)
+
+
+def medir(funcion, repeticiones=20):
+    """Mejor tiempo en ms de varias repeticiones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, default=100000)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_busqueda.db')}"
+
+    from sqlalchemy import and_, func, or_
+    from api.app import app, db, User, AnalisisSubasta
+    from api import consultas, importacion
+
+    rng = random.Random(1234)
+
+    def fila(i):
+        provincia, municipio = rng.choice(MUNICIPIOS)
+        return {
+            'identificador': f"SUB-{rng.choice(('JA', 'AT', 'NE'))}-{rng.choice((2022, 2023, 2024))}-{i:06d}",
+            'direccion': f"{rng.choice(VIAS)} {rng.choice(NOMBRES)} {rng.randint(1, 200)}, "
+                         f"{provincia}{rng.randint(0, 999):03d} {municipio}",
+            'referencia_catastral': ''.join(rng.choice('0123456789ABCDEFGHJKLMNPQRSTUVWXYZ') for _ in range(20)),
+            'notas': rng.choice(NOTAS),
+            'puja': rng.uniform(20000, 300000),
+        }
+
+    fallos = 0
+    with app.app_context():
+        usuario = User(username='bench', email='bench@example.com')
+        usuario.set_password('bench')
+        usuario.activar_suscripcion()
+        db.session.add(usuario)
+        db.session.commit()
+        inicio = time.perf_counter()
+        importacion.importar((fila(i) for i in range(args.filas)), usuario.id)
+        print(f"{args.filas:,} análisis cargados (con el índice al día) en "
+              f"{time.perf_counter() - inicio:.1f} s")
+        user_id = usuario.id
+
+        columnas = [getattr(AnalisisSubasta, c) for c in ('direccion', 'identificador',
+                                                          'referencia_catastral', 'notas')]
+
+        def con_like(palabras):
+            consulta = consultas.consulta_filtrada(user_id, columnas=('id',))
+            return consulta.filter(and_(*(or_(*(func.lower(c).like(f'%{p}%') for c in columnas))
+                                         for p in palabras)))
+
+        def fts(texto):
+            filas, _ = consultas.listar_analisis(user_id, texto=texto)
+            return consultas.contar_analisis(user_id, texto=texto), [f.id for f in filas]
+
+        def like(palabras):
+            consulta = con_like(palabras)
+            total = consulta.with_entities(func.count(AnalisisSubasta.id)).scalar()
+            ids = [f.id for f in consulta.order_by(*consultas.criterio_orden('fecha'))
+                   .limit(consultas.POR_PAGINA)]
+            return total, ids
+
+        print(f"\n{'búsqueda':28s} {'q':22s} {'filas':>7s} {'FTS5':>9s} {'LIKE':>9s}")
+        for nombre, texto, palabras in BUSQUEDAS:
+            resultado = fts(texto)
+            t_fts = medir(lambda: fts(texto))
+            t_like = '-'
+            if palabras is not None:
+                if like(palabras) != resultado:
+                    fallos += 1
+                    print(f"  FALLO: '{texto}' no coincide con LIKE")
+                t_like = f"{medir(lambda: like(palabras), 3):6.1f} ms"
+            print(f"{nombre:28s} {texto:22s} {resultado[0]:7,d} {t_fts:6.2f} ms {t_like:>9s}")
+
+        # El índice sigue a las escrituras (triggers)
+        analisis = AnalisisSubasta(user_id=user_id, direccion='Calle Ñandú 1, 18000 Granada')
+        db.session.add(analisis)
+        db.session.commit()
+        encontrado = fts('ñandu')[1] == [analisis.id]
+        analisis.direccion = 'Calle Emú 1, 18000 Granada'
+        db.session.commit()
+        editado = fts('nandu')[0] == 0 and fts('emu granada')[1] == [analisis.id]
+        db.session.delete(analisis)
+        db.session.commit()
+        borrado = fts('emu granada')[0] == 0
+        if not (encontrado and editado and borrado):
+            fallos += 1
+            print(f"  FALLO: índice desincronizado (alta {encontrado}, edición {editado}, baja {borrado})")
+
+    if fallos:
+        print(f"{fallos} comprobaciones fallidas")
+        return 1
+    print("\nComprobaciones correctas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Benchmark de la criba en memoria (api.criba) frente a la consulta SQL equivalente
+Carga N análisis sintéticos en una base SQLite temporal y compara, para varias cribas
+(filtros con varias condiciones + top-k ordenado), la instantánea columnar con:
+- SQL: COUNT + SELECT ... ORDER BY ... LIMIT sobre las columnas necesarias
+- ORM: cargar todos los objetos AnalisisSubasta y filtrar en Python (lo que evita la criba)
+Comprueba además que los resultados coinciden.
+
+Uso: python -m benchmarks.bench_criba [--filas 100000] [--limite 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+CRIBAS = (
+    ('puja>=70%, rent.>20%, dep.<10k', ['porcentaje_puja>=70', 'rentabilidad_medio>20', 'deposito<10k'],
+     'rentabilidad_medio', False),
+    ('margen>50k por inversión', ['margen_medio>50k'], 'total_inversion', True),
+    ('top rentabilidad', [], 'rentabilidad_medio', False),
+)
+
+OPERADORES_SQL = {'>=': '__ge__', '>': '__gt__', '<=': '__le__', '<': '__lt__', '=': '__eq__',
+                  '==': '__eq__', '!=': '__ne__'}
+
+
+def medir(funcion, repeticiones=5):
+    """Mejor tiempo en ms de varias repeticiones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, default=100000)
+    parser.add_argument('--limite', type=int, default=50)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_criba.db')}"
+
+    from api.app import app, db, User, AnalisisSubasta
+    from api import importacion, criba
+
+    rng = random.Random(1234)
+
+    def fila(i):
+        valor = rng.uniform(50000, 500000)
+        return {
+            'identificador': f'SUB-JA-2024-{i:06d}',
+            'direccion': f'Calle ejemplo {i}',
+            'valor_subasta': valor,
+            'deposito': valor * 0.05,
+            'puja': valor * rng.uniform(0.3, 1.0),
+            'valor_referencia': valor * rng.uniform(0.6, 1.2),
+            'ano_procedimiento': rng.choice([2016, 2019, 2021, 2023]),
+            'ibi_anual': rng.uniform(0, 2500),
+            'reforma': rng.uniform(0, 40000),
+            'venta_medio': valor * rng.uniform(0.7, 1.8),
+        }
+
+    fallos = 0
+    with app.app_context():
+        usuario = User(username='bench', email='bench@example.com')
+        usuario.set_password('bench')
+        usuario.activar_suscripcion()
+        db.session.add(usuario)
+        db.session.commit()
+        importacion.importar((fila(i) for i in range(args.filas)), usuario.id)
+        user_id = usuario.id
+        print(f"{args.filas:,} análisis cargados")
+
+        def cargar():
+            criba.invalidar(user_id)
+            return criba.instantanea(user_id)
+
+        print(f"Carga de la instantánea: {medir(cargar, 3):.1f} ms, "
+              f"{criba.instantanea(user_id).nbytes / 1e6:.1f} MB en {len(criba.CAMPOS)} columnas")
+
+        def sql(condiciones, orden, ascendente):
+            consulta = db.session.query(AnalisisSubasta.id).filter(AnalisisSubasta.user_id == user_id)
+            for campo, operador, valor in condiciones:
+                consulta = consulta.filter(getattr(getattr(AnalisisSubasta, campo), OPERADORES_SQL[operador])(valor))
+            total = consulta.count()
+            columna = getattr(AnalisisSubasta, orden)
+            ids = [i for i, in consulta.order_by(columna.is_(None), columna.asc() if ascendente else columna.desc(),
+                                                  AnalisisSubasta.id.desc()).limit(args.limite)]
+            return total, ids
+
+        def orm(condiciones, orden, ascendente):
+            # Objetos completos filtrados en Python
+            comparar = {'>=': lambda a, b: a >= b, '>': lambda a, b: a > b, '<=': lambda a, b: a <= b,
+                        '<': lambda a, b: a < b}
+            objetos = AnalisisSubasta.query.filter_by(user_id=user_id).all()
+            elegidos = [a for a in objetos
+                        if all(getattr(a, c) is not None and comparar[o](getattr(a, c), v) for c, o, v in condiciones)]
+            con_valor = [a for a in elegidos if getattr(a, orden) is not None]
+            signo = 1 if ascendente else -1
+            con_valor.sort(key=lambda a: (signo * getattr(a, orden), -a.id))
+            db.session.expunge_all()
+            return len(elegidos), [a.id for a in con_valor[:args.limite]]
+
+        print(f"\n{'criba':34s} {'filas':>7s} {'memoria':>10s} {'SQL':>9s} {'ORM':>9s}")
+        for nombre, textos, orden, ascendente in CRIBAS:
+            condiciones = [criba.leer_condicion(t) for t in textos]
+            en_memoria = criba.buscar(user_id, condiciones, None, orden, ascendente, args.limite)
+            en_sql = sql(condiciones, orden, ascendente)
+            if en_memoria != en_sql:
+                fallos += 1
+                print(f"  FALLO: resultados distintos en '{nombre}'")
+
+            t_memoria = medir(lambda: criba.buscar(user_id, condiciones, None, orden, ascendente, args.limite), 50)
+            t_sql = medir(lambda: sql(condiciones, orden, ascendente))
+            t_orm = medir(lambda: orm(condiciones, orden, ascendente), 2)
+            print(f"{nombre:34s} {en_memoria[0]:7,d} {t_memoria * 1000:7.0f} µs {t_sql:6.1f} ms {t_orm:6.0f} ms")
+
+        # Mantenimiento incremental: una escritura por la ORM no recarga la instantánea
+        instantanea = criba.instantanea(user_id)
+        analisis = db.session.get(AnalisisSubasta, 1)
+        inicio = time.perf_counter()
+        for i in range(100):
+            analisis.deposito = 1000 + i
+            db.session.commit()
+        t_escritura = (time.perf_counter() - inicio) * 10
+        if criba.instantanea(user_id) is not instantanea or \
+                criba.buscar(user_id, [('deposito', '=', 1099)], limite=5) != (1, [1]):
+            fallos += 1
+            print("  FALLO: la edición no se reflejó en la instantánea")
+        print(f"\nEdición + commit con la instantánea al día: {t_escritura:.2f} ms por escritura")
+
+    if fallos:
+        print(f"{fallos} comprobaciones fallidas")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark del motor vectorizado de escenarios (api.escenarios)
+Comprueba que coincide exactamente con las funciones escalares de subasta_logic
+y mide una rejilla de ~1 millón de puntos
+
+Uso: python -m benchmarks.bench_escenarios [--muestras 20000]
+"""
+
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from api import subasta_logic, escenarios
+
+ANO_ACTUAL = 2025
+
+
+def cadena_escalar(e):
+    """La misma secuencia de llamadas que la vista calcular_analisis (None = no calculado)"""
+    r = dict.fromkeys(['porcentaje_puja', 'veredicto', 'itp_calculado', 'notaria_registro',
+                       'anos_total', 'ibi_total', 'comunidad_total', 'total_inversion'])
+    if e['puja'] and e['valor_subasta']:
+        res, _ = subasta_logic.calcular_porcentaje_puja(e['puja'], e['valor_subasta'])
+        r['porcentaje_puja'], r['veredicto'] = res['porcentaje'], res['veredicto']
+    if e['valor_referencia']:
+        res, _ = subasta_logic.calcular_itp_notaria(e['valor_referencia'], e['itp_porcentaje'])
+        r['itp_calculado'], r['notaria_registro'] = res['itp'], res['notaria']
+    if e['ibi_anual'] and e['ano_procedimiento']:
+        res, _ = subasta_logic.calcular_ibi_judicial(e['ibi_anual'], e['ano_procedimiento'],
+                                                     ANO_ACTUAL)
+        r['anos_total'], r['ibi_total'] = res['anos_total'], res['total_ibi']
+    if e['comunidad_anual'] and r['anos_total']:
+        r['comunidad_total'], _ = subasta_logic.calcular_comunidad_judicial(
+            e['comunidad_anual'], r['anos_total'])
+    total, _ = subasta_logic.calcular_total_inversion(
+        e['puja'], r['itp_calculado'], r['notaria_registro'], r['ibi_total'],
+        r['comunidad_total'], e['alarmas'], e['suministros'], e['reforma'])
+    if total:
+        r['total_inversion'] = total
+    for esc in escenarios.ESCENARIOS:
+        r[f'margen_{esc}'] = r[f'rentabilidad_{esc}'] = None
+        if r['total_inversion'] and e[f'venta_{esc}']:
+            res, _ = subasta_logic.calcular_margen_rentabilidad(e[f'venta_{esc}'],
+                                                                r['total_inversion'])
+            r[f'margen_{esc}'], r[f'rentabilidad_{esc}'] = res['margen'], res['rentabilidad']
+    return r
+
+
+def entrada_aleatoria(rng):
+    """Entradas realistas, con ceros y céntimos para forzar los casos límite"""
+    def importe(maximo, prob_cero=0.1):
+        return 0.0 if rng.random() < prob_cero else round(rng.uniform(0, maximo), 2)
+    return {
+        'puja': importe(400000),
+        'valor_subasta': importe(500000),
+        'valor_referencia': importe(300000),
+        'itp_porcentaje': rng.choice([6, 6.5, 7, 8, 9.5, 10, 11]),
+        'ano_procedimiento': rng.choice([0, 2012, 2016, 2019, 2021, 2023, 2026, 2030]),
+        'ibi_anual': importe(2500),
+        'comunidad_anual': importe(3000),
+        'alarmas': importe(1500, 0.5),
+        'suministros': importe(2000, 0.5),
+        'reforma': importe(60000, 0.3),
+        'venta_bajo': importe(400000),
+        'venta_medio': importe(500000),
+        'venta_alto': importe(600000),
+    }
+
+
+def comprobar_equivalencia(muestras):
+    rng = random.Random(1234)
+    casos = [entrada_aleatoria(rng) for _ in range(muestras)]
+    arrays = {k: np.array([c[k] for c in casos]) for k in escenarios.ENTRADAS}
+    vector = escenarios.evaluar(ano_actual=ANO_ACTUAL, **arrays)
+
+    for i, caso in enumerate(casos):
+        esperado = cadena_escalar(caso)
+        for campo, valor in esperado.items():
+            obtenido = vector[campo][i]
+            if campo == 'veredicto':
+                obtenido = obtenido or None
+            elif isinstance(obtenido, float) and math.isnan(obtenido):
+                obtenido = None
+            assert obtenido == valor, (i, campo, caso, valor, obtenido)
+    return len(casos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--muestras', type=int, default=20000)
+    args = parser.parse_args()
+
+    n = comprobar_equivalencia(args.muestras)
+    print(f"Equivalencia con las funciones escalares: {n} casos idénticos")
+
+    # Rejilla de 100 pujas x 10 ITP x 25 precios de venta x 40 años = 1.000.000 puntos
+    ejes = {
+        'puja': np.linspace(50000, 250000, 100),
+        'itp_porcentaje': np.linspace(6, 11, 10),
+        'venta_medio': np.linspace(150000, 400000, 25),
+        'ano_procedimiento': np.arange(1990, 2030),
+    }
+    fijos = dict(valor_subasta=220000, valor_referencia=180000, ibi_anual=650,
+                 comunidad_anual=900, alarmas=600, suministros=400, reforma=25000,
+                 venta_bajo=180000, venta_alto=320000)
+
+    escenarios.rejilla(ejes, ano_actual=ANO_ACTUAL, **fijos)  # calentamiento
+    inicio = time.perf_counter()
+    resultado = escenarios.rejilla(ejes, ano_actual=ANO_ACTUAL, **fijos)
+    t = time.perf_counter() - inicio
+
+    puntos = resultado['rentabilidad_medio'].size
+    print(f"Rejilla de {puntos:,} puntos: {t * 1000:.1f} ms ({puntos / t / 1e6:.1f} M puntos/s)")
+
+
+if __name__ == '__main__':
+    main()
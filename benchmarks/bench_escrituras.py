@@ -0,0 +1,158 @@
+"""
+Prueba de carga de escrituras concurrentes (api.basedatos)
+Varios procesos guardan análisis a la vez por POST /analisis/calcular mientras otros leen el
+listado, como varios workers de gunicorn. Se compara SQLite con el journal clásico (DELETE),
+SQLite en modo WAL y, si se indica --postgres, un servidor PostgreSQL.
+
+Uso: python -m benchmarks.bench_escrituras [--procesos 4] [--lectores 2] [--analisis 100]
+                                            [--busy-timeout 15] [--postgres postgresql://...]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+FORMULARIO = {
+    'identificador': 'SUB-JA-2024-000001', 'direccion': 'Calle Mayor 1, 28013 Madrid',
+    'valor_subasta': '185000', 'puja': '120000', 'valor_referencia': '160000',
+    'itp_porcentaje': '7', 'ano_procedimiento': '2019', 'ibi_anual': '650',
+    'comunidad_anual': '900', 'reforma': '15000', 'venta_bajo': '170000',
+    'venta_medio': '190000', 'venta_alto': '210000',
+}
+
+
+def _entorno(uri, wal, busy_timeout):
+    os.environ['DATABASE_URL'] = uri
+    os.environ['DB_SQLITE_WAL'] = '1' if wal else '0'
+    os.environ['DB_SQLITE_BUSY_TIMEOUT'] = str(busy_timeout)
+
+
+def _preparar(uri, wal, busy_timeout):
+    """Crea el esquema (migraciones) y el usuario; devuelve su id"""
+    _entorno(uri, wal, busy_timeout)
+    os.environ['MIGRAR_AL_ARRANCAR'] = '0'
+    from api.app import app, db, User
+    from api import migraciones
+
+    with app.app_context():
+        migraciones.actualizar()
+        db.session.execute(db.delete(User).where(User.username == 'bench'))
+        usuario = User(username='bench', email='bench@example.com')
+        usuario.set_password('bench')
+        usuario.activar_suscripcion()
+        db.session.add(usuario)
+        db.session.commit()
+        return usuario.id
+
+
+def _escritor(uri, wal, busy_timeout, user_id, analisis, inicio, resultados):
+    _entorno(uri, wal, busy_timeout)
+    os.environ['MIGRAR_AL_ARRANCAR'] = '0'
+    from api.app import app
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(user_id)
+
+    correctos = errores = 0
+    latencias = []
+    inicio.wait()
+    for _ in range(analisis):
+        t0 = time.perf_counter()
+        respuesta = cliente.post('/analisis/calcular', data=FORMULARIO)
+        latencias.append(time.perf_counter() - t0)
+        # Guardado → redirige al análisis; error (p. ej. "database is locked") → al formulario
+        if respuesta.status_code == 302 and '/analisis/nuevo' not in respuesta.location:
+            correctos += 1
+        else:
+            errores += 1
+    resultados.put(('escritor', correctos, errores, latencias))
+
+
+def _lector(uri, wal, busy_timeout, user_id, fin, inicio, resultados):
+    _entorno(uri, wal, busy_timeout)
+    os.environ['MIGRAR_AL_ARRANCAR'] = '0'
+    from api.app import app
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(user_id)
+
+    correctos = errores = 0
+    inicio.wait()
+    while not fin.is_set():
+        respuesta = cliente.get('/analisis/lista')
+        if respuesta.status_code == 200:
+            correctos += 1
+        else:
+            errores += 1
+    resultados.put(('lector', correctos, errores, []))
+
+
+def ejecutar(nombre, uri, wal, args):
+    contexto = multiprocessing.get_context('spawn')
+    user_id = contexto.Pool(1).apply(_preparar, (uri, wal, args.busy_timeout))
+
+    inicio = contexto.Event()
+    fin = contexto.Event()
+    resultados = contexto.Queue()
+    parametros = (uri, wal, args.busy_timeout, user_id)
+    escritores = [contexto.Process(target=_escritor, args=parametros + (args.analisis, inicio, resultados))
+                  for _ in range(args.procesos)]
+    lectores = [contexto.Process(target=_lector, args=parametros + (fin, inicio, resultados))
+                for _ in range(args.lectores)]
+    for p in escritores + lectores:
+        p.start()
+
+    # Los procesos tardan en importar la app; se arranca a la vez cuando todos están listos
+    time.sleep(3)
+    t0 = time.perf_counter()
+    inicio.set()
+
+    escritos = fallidos = lecturas = lecturas_fallidas = 0
+    latencias = []
+    for _ in escritores:
+        _, correctos, errores, lat = resultados.get()
+        escritos += correctos
+        fallidos += errores
+        latencias += lat
+    duracion = time.perf_counter() - t0
+    fin.set()
+    for _ in lectores:
+        _, correctos, errores, _ = resultados.get()
+        lecturas += correctos
+        lecturas_fallidas += errores
+    for p in escritores + lectores:
+        p.join()
+
+    latencias.sort()
+    p95 = latencias[int(len(latencias) * 0.95) - 1] * 1000 if latencias else 0
+    print(f"{nombre:<16} {escritos / duracion:>9.1f} {fallidos:>9} {p95:>9.1f} "
+          f"{lecturas / duracion:>10.1f} {lecturas_fallidas:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--procesos', type=int, default=4, help='procesos escribiendo')
+    parser.add_argument('--lectores', type=int, default=2, help='procesos leyendo el listado')
+    parser.add_argument('--analisis', type=int, default=100, help='análisis por proceso escritor')
+    parser.add_argument('--busy-timeout', type=float, default=15,
+                        help='espera por bloqueo de SQLite en segundos (0 = fallar al momento)')
+    parser.add_argument('--postgres', help='URL de un PostgreSQL de pruebas (se crean tablas en él)')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    print(f"{args.procesos} escritores x {args.analisis} análisis, {args.lectores} lectores, "
+          f"busy_timeout {args.busy_timeout:g} s")
+    print(f"{'base de datos':<16} {'escr./s':>9} {'errores':>9} {'p95 ms':>9} "
+          f"{'lect./s':>10} {'err. lect.':>10}")
+    ejecutar('sqlite journal', f"sqlite:///{os.path.join(directorio, 'journal.db')}", False, args)
+    ejecutar('sqlite WAL', f"sqlite:///{os.path.join(directorio, 'wal.db')}", True, args)
+    if args.postgres:
+        ejecutar('postgresql', args.postgres, False, args)
+
+
+if __name__ == '__main__':
+    main()
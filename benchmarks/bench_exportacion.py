@@ -0,0 +1,71 @@
+"""
+Benchmark de la exportación en streaming (api.exportacion)
+Carga N análisis sintéticos en una base SQLite temporal y mide, para cada formato,
+el tiempo de exportación y el pico de memoria de Python (tracemalloc) durante la descarga
+
+Uso: python -m benchmarks.bench_exportacion [--filas 100000] [--formatos csv,parquet,xlsx]
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_importacion import generar_csv
+
+
+def consumir(contenido):
+    total = 0
+    for trozo in contenido:
+        total += len(trozo)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, default=100000)
+    parser.add_argument('--formatos', default='csv,parquet,xlsx')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_exportacion.db')}"
+
+    from api.app import app, db, User
+    from api import importacion, exportacion
+
+    ruta_csv = os.path.join(directorio, 'analisis.csv')
+    generar_csv(ruta_csv, args.filas)
+
+    with app.app_context():
+        usuario = User(username='bench', email='bench@example.com')
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.commit()
+        with open(ruta_csv, 'rb') as f:
+            importacion.importar(importacion.filas_csv(f), usuario.id)
+        print(f"{args.filas:,} análisis cargados")
+
+        for formato in args.formatos.split(','):
+            paquete = exportacion.DEPENDENCIAS.get(formato)
+            if paquete and importlib.util.find_spec(paquete) is None:
+                print(f"{formato}: omitido (falta {paquete})")
+                continue
+
+            inicio = time.perf_counter()
+            tamano = consumir(exportacion.exportar(usuario.id, formato=formato))
+            t = time.perf_counter() - inicio
+
+            # Segunda pasada solo para medir memoria (tracemalloc ralentiza mucho)
+            tracemalloc.start()
+            consumir(exportacion.exportar(usuario.id, formato=formato))
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"{formato}: {tamano / 1e6:.1f} MB en {t:.2f} s "
+                  f"({args.filas / t:,.0f} filas/s), pico de memoria {pico / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark de extraer_datos_subasta contra el servidor BOE local
+Compara la descarga secuencial de ver=1/ver=3 con la descarga concurrente
+
+Uso: python -m benchmarks.bench_extraccion [--latencia 0.3] [--repeticiones 5]
+"""
+
+import argparse
+import time
+
+import requests
+
+from api import subasta_logic
+from benchmarks.servidor_boe import ServidorBOE, identificadores_disponibles
+
+
+def descarga_secuencial(urls):
+    """Comportamiento anterior: un requests.get nuevo por página, una detrás de otra"""
+    return [requests.get(url, timeout=10).text for url in urls]
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), sum(tiempos) / len(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latencia', type=float, default=0.3)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    with ServidorBOE(latencia=args.latencia) as servidor:
+        for id_sub in identificadores_disponibles():
+            url = servidor.url_subasta(id_sub)
+            urls = subasta_logic.construir_urls(url)
+
+            datos = subasta_logic.extraer_datos_subasta(url)
+            assert datos['Identificador'] == id_sub, datos
+
+            sec_min, sec_media = medir(lambda: descarga_secuencial(urls), args.repeticiones)
+            con_min, con_media = medir(lambda: subasta_logic.extraer_datos_subasta(url),
+                                       args.repeticiones)
+
+            print(f"{id_sub:30s} secuencial {sec_media * 1000:8.1f} ms "
+                  f"(min {sec_min * 1000:.1f})  concurrente {con_media * 1000:8.1f} ms "
+                  f"(min {con_min * 1000:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de la importación masiva (api.importacion)
+Genera un CSV sintético, lo importa en una base SQLite temporal y mide tiempo y pico de memoria
+
+Uso: python -m benchmarks.bench_importacion [--filas 100000] [--lote 2000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import resource
+
+COLUMNAS = ('identificador', 'direccion', 'valor_subasta', 'puja', 'valor_referencia',
+            'itp_porcentaje', 'ano_procedimiento', 'ibi_anual', 'comunidad_anual',
+            'reforma', 'venta_bajo', 'venta_medio', 'venta_alto')
+
+
+def generar_csv(ruta, filas, semilla=1234):
+    """CSV con separador ';' e importes en formato español, como los exporta una hoja de cálculo"""
+    rng = random.Random(semilla)
+
+    def importe(maximo):
+        return f"{rng.uniform(0, maximo):.2f}".replace('.', ',')
+
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        f.write(';'.join(COLUMNAS) + '\n')
+        for i in range(filas):
+            f.write(';'.join((
+                f'SUB-JA-2024-{i:06d}', f'Calle Ejemplo {i}, Madrid', importe(500000),
+                importe(400000), importe(300000), '7', str(rng.choice([2016, 2019, 2021, 2023])),
+                importe(2500), importe(3000), importe(60000), importe(400000), importe(500000),
+                importe(600000),
+            )) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, default=100000)
+    parser.add_argument('--lote', type=int, default=2000)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_importacion.db')}"
+
+    from api.app import app, db, User, AnalisisSubasta
+    from api import importacion
+
+    ruta_csv = os.path.join(directorio, 'analisis.csv')
+    generar_csv(ruta_csv, args.filas)
+    print(f"CSV generado: {args.filas:,} filas, {os.path.getsize(ruta_csv) / 1e6:.1f} MB")
+
+    with app.app_context():
+        usuario = User(username='bench', email='bench@example.com')
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.commit()
+
+        rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        inicio = time.perf_counter()
+        with open(ruta_csv, 'rb') as f:
+            informe = importacion.importar(importacion.filas_csv(f), usuario.id,
+                                           tamano_lote=args.lote)
+        t = time.perf_counter() - inicio
+        # ru_maxrss en KB (Linux): crecimiento del pico de memoria del proceso durante la importación
+        pico = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_inicial) * 1024
+
+        guardados = AnalisisSubasta.query.filter_by(user_id=usuario.id).count()
+
+    print(f"Importadas {informe['importadas']:,} filas ({informe['con_errores']} con errores), "
+          f"{guardados:,} en la base")
+    print(f"Tiempo: {t:.2f} s ({informe['importadas'] / t:,.0f} filas/s), "
+          f"aumento del pico de memoria: {pico / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Comprobación de las migraciones sobre bases de datos anteriores a Alembic (api.migraciones)
+
+1. Base creada por db.create_all() del árbol original (fixtures/esquema_create_all.sql: solo
+   users y analisis_subastas) con N análisis, algunos sin fecha: se adopta y se migra hasta
+   head; tienen que quedar todas las tablas y columnas de los modelos, los triggers de la
+   búsqueda, codigo_provincia calculado y la cola de trabajos utilizable. Una segunda pasada
+   no hace nada.
+2. La misma base con trabajos_extraccion tal como la creaba create_all antes de Alembic
+   (sin las columnas de migraciones posteriores): llega a head sin columnas duplicadas.
+3. Una migración que falla a mitad (índice de la 0004 ya ocupado) deshace todo lo anterior:
+   la base sigue en la revisión inicial, sin tablas a medias, y vuelve a migrarse al quitar
+   el estorbo.
+4. Base adoptada por la versión anterior de la adopción: marcada en 0001 sin
+   trabajos_extraccion y con las tablas vacías de la 0002 que dejó el intento fallido; se
+   repara y llega a head.
+
+Uso: python -m benchmarks.bench_migraciones [--analisis 20000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'esquema_create_all.sql')
+
+# trabajos_extraccion tal como la creaba create_all antes de las migraciones
+TRABAJOS_CREATE_ALL = """
+CREATE TABLE trabajos_extraccion (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    url_subasta VARCHAR(500) NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    intentos INTEGER NOT NULL,
+    resultado TEXT,
+    error TEXT,
+    fecha_creacion DATETIME,
+    fecha_inicio DATETIME,
+    fecha_fin DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+"""
+
+
+def crear_base_antigua(ruta, analisis, con_trabajos=False):
+    """Base SQLite con el esquema de create_all y `analisis` análisis (uno de cada 7 sin fecha)"""
+    with open(FIXTURE, encoding='utf-8') as f:
+        esquema = f.read()
+    conexion = sqlite3.connect(ruta)
+    with conexion:
+        conexion.executescript(esquema + (TRABAJOS_CREATE_ALL if con_trabajos else ''))
+        conexion.execute("INSERT INTO users (username, email, password_hash, suscripcion_activa) "
+                         "VALUES ('antiguo', 'antiguo@example.com', 'x', 1)")
+        conexion.executemany(
+            'INSERT INTO analisis_subastas (user_id, fecha_creacion, identificador, direccion, puja) '
+            'VALUES (1, ?, ?, ?, ?)',
+            [(None if i % 7 == 0 else f'2024-{1 + i % 12:02d}-01 10:00:00.000000',
+              f'SUB-JA-2024-{i % 5000:06d}', f'Calle Mayor {i}, 29001 Málaga', 1000.0 + i)
+             for i in range(analisis)])
+    conexion.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--analisis', type=int, default=20000)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['MIGRAR_AL_ARRANCAR'] = '0'
+
+    from sqlalchemy import inspect, text
+    from alembic import command
+    from alembic.script import ScriptDirectory
+    from api.app import crear_app
+    from api.models import db
+    from api import migraciones, trabajos
+
+    fallos = []
+
+    def comprobar(condicion, mensaje):
+        if not condicion:
+            fallos.append(mensaje)
+            print(f"  FALLO: {mensaje}")
+
+    def app_para(nombre):
+        ruta = os.path.join(directorio, nombre)
+        return ruta, crear_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{ruta}'})
+
+    def revision():
+        return db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+
+    head = ScriptDirectory(migraciones.DIRECTORIO).get_current_head()
+
+    # 1. Base del árbol original
+    ruta, app = app_para('create_all.db')
+    crear_base_antigua(ruta, args.analisis)
+    with app.app_context():
+        inicio = time.perf_counter()
+        migraciones.actualizar()
+        segundos = time.perf_counter() - inicio
+        print(f"create_all original → {revision()}: {args.analisis:,} análisis en {segundos:.2f} s")
+        comprobar(revision() == head, f"revisión {revision()}, se esperaba {head}")
+
+        inspector = inspect(db.engine)
+        for tabla in db.metadata.sorted_tables:
+            if not inspector.has_table(tabla.name):
+                comprobar(False, f"falta la tabla {tabla.name}")
+                continue
+            existentes = {c['name'] for c in inspector.get_columns(tabla.name)}
+            faltan = [c.name for c in tabla.columns if c.name not in existentes]
+            comprobar(not faltan, f"faltan columnas en {tabla.name}: {faltan}")
+
+        triggers = db.session.execute(text(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+        comprobar(triggers == 3, f"{triggers} triggers de la búsqueda, se esperaban 3")
+        sin_provincia = db.session.execute(text(
+            "SELECT count(*) FROM analisis_subastas WHERE codigo_provincia IS NULL")).scalar()
+        comprobar(sin_provincia == 0, f"{sin_provincia} análisis sin codigo_provincia")
+        sin_fecha = db.session.execute(text(
+            "SELECT count(*) FROM analisis_subastas WHERE fecha_creacion IS NULL")).scalar()
+        comprobar(sin_fecha == 0, f"{sin_fecha} análisis sin fecha_creacion")
+        sin_subasta = db.session.execute(text(
+            "SELECT count(*) FROM analisis_subastas WHERE subasta_id IS NULL")).scalar()
+        comprobar(sin_subasta == 0, f"{sin_subasta} análisis sin enlazar con su subasta")
+
+        trabajo_id = trabajos.encolar(1, 'https://subastas.boe.es/detalleSubasta.php?idSub=X')
+        comprobar(trabajos.reclamar(1) == [trabajo_id], "la cola de trabajos no funciona")
+        db.session.remove()
+
+        inicio = time.perf_counter()
+        migraciones.actualizar()
+        print(f"  segunda pasada: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+        comprobar(revision() == head, "la segunda pasada cambió la revisión")
+
+    # 2. Con trabajos_extraccion de antes de las migraciones
+    ruta, app = app_para('create_all_trabajos.db')
+    crear_base_antigua(ruta, 100, con_trabajos=True)
+    with app.app_context():
+        try:
+            migraciones.actualizar()
+        except Exception as e:
+            comprobar(False, f"con trabajos_extraccion: {e.__class__.__name__}: {e}")
+        else:
+            columnas = {c['name'] for c in inspect(db.engine).get_columns('trabajos_extraccion')}
+            comprobar(revision() == head and 'proximo_intento' in columnas,
+                      "con trabajos_extraccion no se llega a head con proximo_intento")
+            print(f"create_all con trabajos_extraccion → {revision()}")
+        db.session.remove()
+
+    # 3. Fallo a mitad: nada queda a medias
+    ruta, app = app_para('create_all_fallo.db')
+    crear_base_antigua(ruta, 100)
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute('CREATE INDEX ix_subastas_referencia_catastral ON users (email)')
+    with app.app_context():
+        try:
+            migraciones.actualizar()
+            comprobar(False, "la migración con el índice ocupado no falló")
+        except Exception:
+            pass
+        db.session.remove()
+        inspector = inspect(db.engine)
+        comprobar(revision() == migraciones.REVISION_INICIAL,
+                  f"tras el fallo la revisión es {revision()}")
+        comprobar(not inspector.has_table('seguimientos_subastas'),
+                  "tras el fallo quedan tablas de migraciones que no se completaron")
+        db.session.remove()
+        with db.engine.begin() as conexion:
+            conexion.exec_driver_sql('DROP INDEX ix_subastas_referencia_catastral')
+        migraciones.actualizar()
+        print(f"tras un fallo a mitad: {migraciones.REVISION_INICIAL} → {revision()}")
+        comprobar(revision() == head, "no se recupera tras quitar el estorbo")
+        db.session.remove()
+
+    # 4. Adopción incompleta de la versión anterior
+    ruta, app = app_para('adopcion_incompleta.db')
+    crear_base_antigua(ruta, 100)
+    with app.app_context():
+        # Lo que hacía la adopción anterior: columnas, índices y marca, sin crear tablas
+        migraciones.asegurar_columnas(omitir=migraciones.COLUMNAS_POSTERIORES)
+        migraciones.asegurar_indices(omitir=migraciones.COLUMNAS_POSTERIORES)
+        migraciones.rellenar_codigo_provincia()
+        with db.engine.begin() as conexion:
+            command.stamp(migraciones.configuracion(conexion), migraciones.REVISION_INICIAL)
+        with db.engine.begin() as conexion:
+            command.upgrade(migraciones.configuracion(conexion), '0002')
+        with db.engine.begin() as conexion:
+            command.stamp(migraciones.configuracion(conexion), migraciones.REVISION_INICIAL,
+                          purge=True)
+        try:
+            migraciones.actualizar()
+        except Exception as e:
+            comprobar(False, f"adopción incompleta: {e.__class__.__name__}: {e}")
+        else:
+            comprobar(revision() == head and inspect(db.engine).has_table('trabajos_extraccion'),
+                      "la adopción incompleta no se repara")
+            print(f"adopción incompleta ({migraciones.REVISION_INICIAL} sin trabajos_extraccion) → {revision()}")
+        db.session.remove()
+
+    if fallos:
+        print(f"{len(fallos)} comprobaciones fallidas")
+        return 1
+    print("Comprobaciones correctas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
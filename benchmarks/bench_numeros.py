@@ -0,0 +1,228 @@
+"""
+Benchmark y comprobación de la lectura/escritura de números en formato español (api.numeros)
+
+Mide sobre N valores (1M por defecto):
+- lectura de importes del BOE: limpiar_entero_por_texto (la del parseo, sin céntimos), la
+  lectura anterior de la importación, numeros.leer_importe uno a uno y numeros.leer_importes
+- formato: el truco de tres replace de formatear_numero frente a numeros.formatear (valores
+  distintos y valores repetidos, como en las plantillas)
+- render: una tabla de F filas × 12 cifras con el truco en la plantilla y con el filtro `numero`
+
+Comprueba propiedades sobre casos aleatorios (semilla fija): ida y vuelta formatear → leer,
+adornos (€, NBSP, signos, sin miles), texto_importe, camino rápido = PATRON_IMPORTE y lectura
+por lotes = uno a uno (también con ruido), mismo resultado que el formato anterior y que la
+lectura anterior en entradas válidas.
+
+Uso: python -m benchmarks.bench_numeros [--valores 1000000] [--casos 200000] [--filas 200]
+"""
+
+import argparse
+import math
+import random
+import re
+import sys
+import time
+
+from api import numeros
+from api.subasta_logic import limpiar_entero_por_texto
+
+MILES_CON_PUNTO = re.compile(r'^-?\d{1,3}(\.\d{3})+$')
+
+
+def leer_numero_anterior(texto):
+    """Lectura de números de la importación antes de api.numeros (referencia)"""
+    if texto is None:
+        return 0.0
+    if isinstance(texto, (int, float)):
+        return float(texto)
+    texto = str(texto).replace('€', '').replace('\xa0', '').replace(' ', '').strip()
+    if not texto:
+        return 0.0
+    if ',' in texto or MILES_CON_PUNTO.match(texto):
+        texto = texto.replace('.', '').replace(',', '.')
+    valor = float(texto)
+    if not math.isfinite(valor):
+        raise ValueError
+    return valor
+
+
+def formatear_anterior(numero):
+    """formatear_numero antes de api.numeros (referencia)"""
+    try:
+        num = float(numero)
+        formatted = f"{num:,.2f}"
+        formatted = formatted.replace(',', 'X').replace('.', ',').replace('X', '.')
+        return formatted
+    except:
+        return str(numero)
+
+
+def medir(funcion, repeticiones=3):
+    """Mejor tiempo en segundos de varias repeticiones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def importe(rng):
+    """Importe aleatorio con céntimos, de céntimos a decenas de millones"""
+    return round(rng.choice((1, -1) if rng.random() < 0.1 else (1,)) *
+                 10 ** rng.uniform(-2, 8), 2)
+
+
+def texto_boe(rng):
+    """Importe tal y como aparece en el BOE (a veces sin especificar)"""
+    if rng.random() < 0.05:
+        return rng.choice(('Sin especificar', 'Sin tasación', 'Sin tramos'))
+    valor = abs(importe(rng))
+    return numeros.formatear(valor) + rng.choice((' €', '\xa0€', ' €', ''))
+
+
+def ruido_numerico(rng):
+    """Grupos de cifras con puntos, comas, signos y adornos al azar (casi números)"""
+    texto = rng.choice(('', '', '-', '+', '−', ' ', '€'))
+    for _ in range(rng.randint(1, 5)):
+        texto += ''.join(rng.choice('0123456789') for _ in range(rng.randint(0, 4)))
+        texto += rng.choice(('.', '.', ',', ''))
+    return texto + rng.choice(('', '', ' €', '\xa0€', 'e3', ' 1'))
+
+
+def comprobar_propiedades(casos, rng):
+    fallos = []
+
+    def comprobar(condicion, mensaje):
+        if not condicion and len(fallos) < 20:
+            fallos.append(mensaje)
+
+    basura = '0123456789.,-+eE €abc\xa0−\x00'
+    lote, esperados = [], []
+    for _ in range(casos):
+        x = rng.uniform(-1, 1) * 10 ** rng.uniform(-3, 12)
+        for decimales in (0, 2):
+            texto = numeros.formatear(x, decimales)
+            comprobar(numeros.leer_importe(texto) == round(x, decimales),
+                      f"ida y vuelta {x!r} ({decimales}) → {texto!r}")
+        texto = numeros.formatear(x)
+        redondeado = round(x, 2)
+        # Adornos: moneda, espacios duros, signo explícito o tipográfico, sin miles
+        for variante in (texto + ' €', texto + '\xa0€', ' ' + texto + ' ',
+                         f'{x:.2f}'.replace('.', ','), f'{x:.2f}', texto.replace('-', '−')):
+            comprobar(numeros.leer_importe(variante) == redondeado, f"variante {variante!r} de {x!r}")
+        if x >= 0:
+            comprobar(numeros.leer_importe('+' + texto) == redondeado, f"signo + en {texto!r}")
+        # texto_importe: se vuelve a leer igual y es idempotente
+        normalizado = numeros.texto_importe(texto + ' €')
+        comprobar(numeros.leer_importe(normalizado) == redondeado,
+                  f"texto_importe {texto!r} → {normalizado!r}")
+        comprobar(numeros.texto_importe(normalizado) == normalizado, f"idempotente {normalizado!r}")
+        # Igual que el formato anterior
+        comprobar(numeros.formatear(x) == formatear_anterior(x), f"formato de {x!r}")
+        # Misma lectura que la importación anterior en entradas válidas
+        comprobar(numeros.leer_importe(texto) == leer_numero_anterior(texto),
+                  f"lectura anterior de {texto!r}")
+        # Texto cualquiera: nunca falla, el camino rápido no cambia el resultado y lotes = uno a uno
+        ruido = ''.join(rng.choice(basura) for _ in range(rng.randint(0, 12)))
+        for candidato in (texto, texto + ' €', ruido, ruido_numerico(rng)):
+            valor = numeros.leer_importe(candidato)
+            comprobar(valor == numeros._leer_con_patron(candidato),
+                      f"camino rápido {candidato!r} → {valor!r}")
+            lote.append(candidato)
+            esperados.append(valor)
+        if len(lote) >= 10000:
+            comprobar_lote(lote, esperados, comprobar)
+            lote, esperados = [], []
+    if lote:
+        comprobar_lote(lote, esperados, comprobar)
+    return fallos
+
+
+def comprobar_lote(lote, esperados, comprobar):
+    valores = numeros.leer_importes(lote)
+    for texto, valor, esperado in zip(lote, valores.tolist(), esperados):
+        if esperado is None:
+            comprobar(math.isnan(valor), f"lote {texto!r} → {valor!r} (se esperaba NaN)")
+        else:
+            comprobar(valor == esperado and math.copysign(1, valor) == math.copysign(1, esperado),
+                      f"lote {texto!r} → {valor!r} (se esperaba {esperado!r})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--valores', type=int, default=1000000)
+    parser.add_argument('--casos', type=int, default=200000)
+    parser.add_argument('--filas', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    n = args.valores
+
+    # ---------- Lectura ----------
+    textos = [texto_boe(rng) for _ in range(n)]
+    print(f"Lectura de {n:,} importes del BOE")
+
+    def importacion_anterior():
+        for t in textos:
+            try:
+                leer_numero_anterior(t)
+            except ValueError:
+                pass
+
+    for nombre, funcion in (
+        ('limpiar_entero_por_texto', lambda: [limpiar_entero_por_texto(t) for t in textos]),
+        ('lectura anterior', importacion_anterior),
+        ('leer_importe', lambda: [numeros.leer_importe(t) for t in textos]),
+        ('leer_importes (lote)', lambda: numeros.leer_importes(textos)),
+    ):
+        segundos = medir(funcion)
+        print(f"  {nombre:28s} {segundos * 1000:8.0f} ms  {segundos / n * 1e9:6.0f} ns/valor")
+
+    # ---------- Formato ----------
+    distintos = [importe(rng) for _ in range(n)]
+    repetidos = [rng.choice(distintos[:2000]) for _ in range(n)]
+    print(f"Formato de {n:,} números")
+    for nombre, valores in (('distintos', distintos), ('repetidos', repetidos)):
+        anterior = medir(lambda: [formatear_anterior(v) for v in valores])
+        nuevo = medir(lambda: [numeros.formatear(v) for v in valores])
+        print(f"  {nombre:10s} anterior {anterior * 1000:7.0f} ms   formatear {nuevo * 1000:7.0f} ms"
+              f"   ({anterior / nuevo:.1f}x)")
+
+    # ---------- Render ----------
+    from jinja2 import Environment
+    entorno = Environment()
+    entorno.filters['numero'] = numeros.formatear
+    campos = [f'c{i}' for i in range(12)]
+    truco = "'{:,.2f}'.format(%s).replace(',', 'X').replace('.', ',').replace('X', '.')"
+    con_truco = entorno.from_string(
+        '{% for f in filas %}<tr>' + ''.join(f'<td>{{{{ {truco % ("f." + c)} }}}} €</td>' for c in campos)
+        + '</tr>{% endfor %}')
+    con_filtro = entorno.from_string(
+        '{% for f in filas %}<tr>' + ''.join(f'<td>{{{{ f.{c}|numero }}}} €</td>' for c in campos)
+        + '</tr>{% endfor %}')
+    filas = [{c: importe(rng) for c in campos} for _ in range(args.filas)]
+    comprobar_render = con_truco.render(filas=filas) == con_filtro.render(filas=filas)
+    anterior = medir(lambda: con_truco.render(filas=filas), 20)
+    nuevo = medir(lambda: con_filtro.render(filas=filas), 20)
+    print(f"Render de {args.filas} filas × {len(campos)} cifras: truco {anterior * 1000:.2f} ms, "
+          f"filtro numero {nuevo * 1000:.2f} ms ({anterior / nuevo:.1f}x)")
+
+    # ---------- Propiedades ----------
+    inicio = time.perf_counter()
+    fallos = comprobar_propiedades(args.casos, rng)
+    if not comprobar_render:
+        fallos.append("el filtro numero no produce lo mismo que el truco de la plantilla")
+    print(f"Propiedades sobre {args.casos:,} casos aleatorios en {time.perf_counter() - inicio:.1f} s")
+
+    if fallos:
+        for fallo in fallos:
+            print(f"  FALLO: {fallo}")
+        print(f"{len(fallos)} comprobaciones fallidas")
+        return 1
+    print("Comprobaciones correctas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
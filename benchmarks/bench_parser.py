@@ -0,0 +1,110 @@
+"""
+Micro-benchmark del parser de páginas del BOE sobre el corpus de benchmarks/fixtures/boe
+Compara el extractor anterior (html.parser + cadena if/elif) con parsear_paginas
+y comprueba que los resultados son idénticos. Los importes se comparan normalizados con
+numeros.texto_importe, como los deja el parseo actual ('123.456,78 €' → '123456.78',
+'Sin especificar' se conserva); el anterior los dejaba en cifras sin céntimos
+('123456', 'Sinespecificar'), que es lo que se sigue midiendo como referencia.
+
+Uso: python -m benchmarks.bench_parser [--repeticiones 200]
+"""
+
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from api import numeros, subasta_logic
+from api.subasta_logic import CAMPOS, limpiar_entero_por_texto
+from benchmarks.servidor_boe import identificadores_disponibles, leer_fixture
+
+
+def parsear_paginas_anterior(paginas, limpiar=limpiar_entero_por_texto):
+    """Copia literal del extractor anterior, como referencia (limpiar: la de los importes)"""
+    resultados = {campo: '' for campo in CAMPOS}
+    direccion_componentes = []
+
+    for html in paginas:
+        if html is None:
+            continue
+        try:
+            soup = BeautifulSoup(html, 'html.parser')
+            for tabla in soup.find_all('table'):
+                for fila in tabla.find_all('tr'):
+                    th = fila.find('th')
+                    td = fila.find('td')
+                    if not th or not td:
+                        continue
+                    campo = th.text.strip().lower()
+                    valor = td.text.strip()
+                    if 'identificador' in campo and not resultados['Identificador']:
+                        resultados['Identificador'] = valor
+                    elif 'conclusión' in campo and not resultados['Fecha de conclusión']:
+                        resultados['Fecha de conclusión'] = valor
+                    elif 'cantidad reclamada' in campo and not resultados['Cantidad reclamada']:
+                        resultados['Cantidad reclamada'] = limpiar(valor)
+                    elif 'valor subasta' in campo and not resultados['Valor subasta']:
+                        resultados['Valor subasta'] = limpiar(valor)
+                    elif 'tasación' in campo and not resultados['Tasación']:
+                        resultados['Tasación'] = limpiar(valor)
+                    elif 'tramos entre pujas' in campo and not resultados['Tramos entre pujas']:
+                        resultados['Tramos entre pujas'] = limpiar(valor)
+                    elif 'depósito' in campo and not resultados['Importe del depósito']:
+                        resultados['Importe del depósito'] = limpiar(valor)
+                    elif 'dirección' in campo or 'ubicación' in campo or 'domicilio' in campo or 'bien' in campo:
+                        direccion_componentes.append(valor)
+                    elif 'código postal' in campo:
+                        direccion_componentes.append(f"CP {valor}")
+                    elif 'localidad' in campo or 'municipio' in campo:
+                        direccion_componentes.append(valor)
+                    elif 'provincia' in campo:
+                        direccion_componentes.append(valor)
+                    elif ('referencia catastral' in campo or 'catastral' in campo) and not resultados['Referencia catastral']:
+                        resultados['Referencia catastral'] = valor
+        except Exception:
+            pass
+
+    resultados['Dirección'] = ', '.join([c for c in direccion_componentes if c])
+    return resultados
+
+
+def cargar_corpus():
+    """Pares (ver=1, ver=3) de HTML por subasta guardada"""
+    return {
+        id_sub: [leer_fixture(id_sub, 1).decode('utf-8'), leer_fixture(id_sub, 3).decode('utf-8')]
+        for id_sub in identificadores_disponibles()
+    }
+
+
+def medir(funcion, corpus, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for paginas in corpus.values():
+            funcion(paginas)
+    total = time.perf_counter() - inicio
+    return total / (repeticiones * len(corpus) * 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = cargar_corpus()
+
+    for id_sub, paginas in corpus.items():
+        anterior = parsear_paginas_anterior(paginas, numeros.texto_importe)
+        nuevo = subasta_logic.parsear_paginas(paginas)
+        assert anterior == nuevo, (id_sub, anterior, nuevo)
+
+    t_anterior = medir(parsear_paginas_anterior, corpus, args.repeticiones)
+    t_nuevo = medir(subasta_logic.parsear_paginas, corpus, args.repeticiones)
+
+    print(f"Corpus: {len(corpus)} subastas ({len(corpus) * 2} páginas), resultados idénticos")
+    print(f"Parser HTML: {subasta_logic.PARSER_HTML}")
+    print(f"anterior {t_anterior * 1e6:9.1f} µs/página")
+    print(f"nuevo    {t_nuevo * 1e6:9.1f} µs/página  (x{t_anterior / t_nuevo:.2f})")
+
+
+if __name__ == '__main__':
+    main()
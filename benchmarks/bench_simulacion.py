@@ -0,0 +1,46 @@
+"""
+Benchmark de la simulación Monte Carlo (api.simulacion)
+10^6 muestras en un núcleo y con pool de procesos; comprueba la reproducibilidad por semilla
+
+Uso: python -m benchmarks.bench_simulacion [--muestras 1000000] [--procesos 4]
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+
+from api import simulacion
+
+ANALISIS = SimpleNamespace(
+    puja=150000, itp_calculado=8400, notaria_registro=3600, alarmas=500, suministros=300,
+    reforma=20000, ibi_anual=620, comunidad_anual=960, anos_total=5,
+    venta_bajo=170000, venta_medio=215000, venta_alto=260000,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--muestras', type=int, default=1_000_000)
+    parser.add_argument('--procesos', type=int, default=4)
+    args = parser.parse_args()
+
+    simulacion.simular(ANALISIS, muestras=10_000)  # calentamiento
+
+    inicio = time.perf_counter()
+    un_nucleo = simulacion.simular(ANALISIS, muestras=args.muestras)
+    t_un_nucleo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    con_pool = simulacion.simular(ANALISIS, muestras=args.muestras, procesos=args.procesos)
+    t_pool = time.perf_counter() - inicio
+
+    assert un_nucleo['rentabilidad'] == con_pool['rentabilidad'], "resultado distinto con pool"
+
+    print(f"{args.muestras:,} muestras, P(pérdida) = {un_nucleo['probabilidad_perdida']} %, "
+          f"rentabilidad p50 = {un_nucleo['rentabilidad']['percentiles']['p50']} %")
+    print(f"1 núcleo:           {t_un_nucleo * 1000:8.1f} ms")
+    print(f"pool de {args.procesos} procesos: {t_pool * 1000:8.1f} ms (incluye arranque del pool)")
+
+
+if __name__ == '__main__':
+    main()
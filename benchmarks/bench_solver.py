@@ -0,0 +1,69 @@
+"""
+Benchmark del cálculo de puja máxima (api.solver_puja)
+Tiempo por resolución individual y en lote; verifica que cada puja es la máxima al céntimo
+
+Uso: python -m benchmarks.bench_solver [--casos 20000]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from api import solver_puja
+
+
+def caso_aleatorio(rng):
+    datos = {
+        'valor_subasta': round(rng.uniform(50000, 500000), 2),
+        'valor_referencia': round(rng.uniform(0, 300000), 2),
+        'itp_porcentaje': rng.choice([6, 7, 8, 10]),
+        'ano_procedimiento': rng.choice([0, 2015, 2019, 2022]),
+        'ibi_anual': round(rng.uniform(0, 2000), 2),
+        'comunidad_anual': round(rng.uniform(0, 2500), 2),
+        'alarmas': rng.choice([0, 450.5]),
+        'suministros': rng.choice([0, 300]),
+        'reforma': round(rng.uniform(0, 60000), 2),
+        'venta_medio': round(rng.uniform(0, 600000), 2),
+    }
+    return datos, round(rng.uniform(-20, 60), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--casos', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    casos = [caso_aleatorio(rng) for _ in range(args.casos)]
+    costes = [solver_puja.costes_fijos(d, 2025) for d, _ in casos]
+
+    inicio = time.perf_counter()
+    pujas = [solver_puja.puja_maxima(d['venta_medio'], o, c)[0]
+             for (d, o), c in zip(casos, costes)]
+    t_individual = (time.perf_counter() - inicio) / len(casos)
+
+    for (d, o), c, puja in zip(casos, costes, pujas):
+        if puja is None:
+            continue
+        centimos = round(puja * 100)
+        assert solver_puja._cumple(centimos, d['venta_medio'], c, o)
+        assert not solver_puja._cumple(centimos + 1, d['venta_medio'], c, o)
+
+    inicio = time.perf_counter()
+    lote = solver_puja.puja_maxima_lote(
+        [d['venta_medio'] for d, _ in casos], [o for _, o in casos],
+        {k: [c[k] for c in costes] for k in solver_puja.COSTES})
+    t_lote = time.perf_counter() - inicio
+
+    individuales = np.array([np.nan if p is None else p for p in pujas])
+    assert np.array_equal(individuales, lote, equal_nan=True)
+
+    print(f"{len(casos)} casos, pujas máximas verificadas al céntimo")
+    print(f"individual: {t_individual * 1e6:8.1f} µs por resolución")
+    print(f"lote:       {t_lote * 1000:8.1f} ms en total ({t_lote / len(casos) * 1e6:.2f} µs por caso)")
+
+
+if __name__ == '__main__':
+    main()
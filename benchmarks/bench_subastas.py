@@ -0,0 +1,181 @@
+"""
+Benchmark y comprobación de las subastas compartidas (tabla `subastas`, api.cache_subastas.AlmacenBD)
+contra el servidor BOE local.
+
+1. Extracción: U usuarios analizan cada uno M de N subastas (con solapes) repartidos entre W
+   workers, cada uno con su propia caché en memoria. Se cuentan las peticiones al BOE y el tiempo:
+   - sin nivel compartido (cada worker descarga lo que no tiene en memoria)
+   - con la tabla subastas (lo que ya extrajo otro worker se sirve desde la base de datos)
+   y el espacio de las extracciones guardadas: un fichero de caché por worker frente a una fila
+   por subasta.
+2. Enlace: los análisis guardados quedan enlazados con su subasta (uno por URL/identificador).
+3. Migración: A análisis antiguos con duplicados (mismo identificador en varios usuarios) en
+   una base en la revisión 0003; se mide la 0004, que crea y enlaza las subastas en bloque.
+
+Uso: python -m benchmarks.bench_subastas [--subastas 40] [--usuarios 20] [--por-usuario 15]
+     [--workers 4] [--latencia 0.02] [--analisis 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.servidor_boe import ServidorBOE, identificadores_disponibles, leer_fixture
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subastas', type=int, default=40)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--por-usuario', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latencia', type=float, default=0.02)
+    parser.add_argument('--analisis', type=int, default=100000)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_subastas.db')}"
+
+    from sqlalchemy import create_engine, func, select, text
+    from alembic import command
+    from api.app import app, db, User, AnalisisSubasta
+    from api.models import Subasta
+    from api import cache_subastas, migraciones
+
+    fallos = []
+
+    def comprobar(condicion, mensaje):
+        if not condicion:
+            fallos.append(mensaje)
+            print(f"  FALLO: {mensaje}")
+
+    rng = random.Random(1234)
+
+    with ServidorBOE(latencia=args.latencia) as servidor, app.app_context():
+        # Copias de las subastas guardadas, cada una con su propio identificador
+        originales = identificadores_disponibles()
+        urls = []
+        for i in range(args.subastas):
+            original = originales[i % len(originales)]
+            id_sub = f'{original}-C{i:03d}'
+            for ver in ('1', '3'):
+                servidor.publicar(id_sub, ver, leer_fixture(original, ver)
+                                  .replace(original.encode(), id_sub.encode()))
+            urls.append(servidor.url_subasta(id_sub))
+
+        # Peticiones de los usuarios, cada una atendida por un worker al azar
+        peticiones = [(usuario, url, rng.randrange(args.workers))
+                      for usuario in range(args.usuarios)
+                      for url in rng.sample(urls, min(args.por_usuario, len(urls)))]
+        rng.shuffle(peticiones)
+        print(f"{len(peticiones)} extracciones de {args.usuarios} usuarios sobre {args.subastas} "
+              f"subastas, {args.workers} workers, latencia {args.latencia * 1000:.0f} ms")
+
+        def ejecutar(nombre, caches):
+            antes = servidor.peticiones
+            inicio = time.perf_counter()
+            for _, url, worker in peticiones:
+                caches[worker].obtener(url)
+            segundos = time.perf_counter() - inicio
+            hechas = servidor.peticiones - antes
+            print(f"  {nombre:24s} {hechas:5d} peticiones al BOE  {segundos * 1000:8.1f} ms")
+            return hechas
+
+        # Sin nivel compartido: un fichero de caché por worker
+        rutas = [os.path.join(directorio, f'cache_worker{w}.db') for w in range(args.workers)]
+        sin_compartir = ejecutar('caché por worker', [
+            cache_subastas.CacheSubastas(ruta_sqlite=ruta, usar_bd=False) for ruta in rutas])
+        bytes_workers = 0
+        for ruta in rutas:
+            motor = create_engine(f'sqlite:///{ruta}')
+            with motor.connect() as conexion:
+                bytes_workers += conexion.execute(text(
+                    'SELECT coalesce(sum(length(datos) + length(validadores)), 0) FROM cache_subastas'
+                )).scalar()
+            motor.dispose()
+
+        # Con la tabla subastas
+        compartido = ejecutar('tabla subastas', [
+            cache_subastas.CacheSubastas(usar_bd=True) for _ in range(args.workers)])
+        comprobar(compartido == 2 * args.subastas,
+                  f"con la tabla compartida cada subasta debería descargarse una vez ({compartido})")
+        print(f"  {1 - compartido / sin_compartir:.0%} menos peticiones al BOE")
+        bytes_tabla = db.session.execute(
+            select(func.sum(func.length(Subasta.datos) + func.length(Subasta.validadores)))
+        ).scalar()
+        print(f"  extracciones guardadas: {bytes_workers / 1024:.1f} KiB en {args.workers} cachés "
+              f"de worker, {bytes_tabla / 1024:.1f} KiB en la tabla subastas")
+
+        # Otro worker "en frío" (memoria vacía): todo sale de la base de datos
+        frio = ejecutar('worker en frío', [cache_subastas.CacheSubastas(usar_bd=True)] * args.workers)
+        comprobar(frio == 0, f"un worker nuevo no debería ir al BOE ({frio} peticiones)")
+
+        # Enlace de los análisis guardados
+        for usuario in range(args.usuarios):
+            cuenta = User(username=f'bench{usuario}', email=f'bench{usuario}@example.com')
+            cuenta.set_password('bench')
+            db.session.add(cuenta)
+        db.session.commit()
+        ids_usuarios = [u.id for u in User.query.order_by(User.id)]
+        for usuario, url, _ in peticiones:
+            datos = cache_subastas.obtener_datos_subasta(url)
+            db.session.add(AnalisisSubasta(user_id=ids_usuarios[usuario], url_subasta=url,
+                                           identificador=datos['Identificador']))
+        db.session.commit()
+        sin_enlace = AnalisisSubasta.query.filter(AnalisisSubasta.subasta_id.is_(None)).count()
+        distintas = db.session.query(func.count(func.distinct(AnalisisSubasta.subasta_id))).scalar()
+        print(f"  {len(peticiones)} análisis guardados → {distintas} subastas, {sin_enlace} sin enlazar")
+        comprobar(sin_enlace == 0 and distintas == args.subastas, "análisis mal enlazados")
+
+        # Migración de una base con análisis antiguos (revisión 0003)
+        ruta = os.path.join(directorio, 'migracion.db')
+        motor = create_engine(f'sqlite:///{ruta}')
+        with motor.begin() as conexion:
+            command.upgrade(migraciones.configuracion(conexion), '0003')
+        distintos = max(1, args.analisis // 5)
+        filas = []
+        for i in range(args.analisis):
+            n = rng.randrange(distintos)
+            # Una parte sin identificador (se enlaza por la referencia catastral)
+            identificador = f'SUB-JA-2024-{n:06d}' if i % 10 else ''
+            filas.append((1 + i % args.usuarios, identificador, f'Calle Mayor {n}, 29001 Málaga',
+                          f'RC{n:018d}', 100000.0 + n))
+        with motor.begin() as conexion:
+            conexion.exec_driver_sql(
+                'INSERT INTO analisis_subastas (user_id, identificador, direccion, '
+                'referencia_catastral, valor_subasta) VALUES (?, ?, ?, ?, ?)', filas)
+        inicio = time.perf_counter()
+        with motor.begin() as conexion:
+            command.upgrade(migraciones.configuracion(conexion), '0004')
+        segundos = time.perf_counter() - inicio
+        with motor.connect() as conexion:
+            subastas = conexion.execute(text('SELECT count(*) FROM subastas')).scalar()
+            enlazados = conexion.execute(text(
+                'SELECT count(*) FROM analisis_subastas WHERE subasta_id IS NOT NULL')).scalar()
+            esperadas = conexion.execute(text(
+                "SELECT count(DISTINCT identificador) FROM analisis_subastas WHERE identificador <> ''"
+            )).scalar()
+            mal = conexion.execute(text(
+                'SELECT count(*) FROM analisis_subastas a JOIN subastas s ON s.id = a.subasta_id '
+                'WHERE a.referencia_catastral <> s.referencia_catastral')).scalar()
+            triggers = conexion.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+        motor.dispose()
+        print(f"  migración 0004: {args.analisis:,} análisis → {subastas:,} subastas, "
+              f"{enlazados:,} enlazados en {segundos:.2f} s")
+        comprobar(subastas == esperadas, f"{subastas} subastas, se esperaban {esperadas}")
+        comprobar(mal == 0, f"{mal} análisis enlazados con otra referencia catastral")
+        comprobar(triggers == 3, "la migración perdió los triggers de la búsqueda")
+
+    if fallos:
+        print(f"{len(fallos)} comprobaciones fallidas")
+        return 1
+    print("Comprobaciones correctas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
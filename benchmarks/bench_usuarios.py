@@ -0,0 +1,139 @@
+"""
+Benchmark y comprobación de la caché de usuarios (api.usuarios)
+- Consultas SQL por petición autenticada (con y sin caché de usuarios); en una vista que exige
+  suscripción queda la consulta de la suscripción, que no sale de la caché
+- Concurrencia: varios hilos piden una vista protegida mientras caduca la suscripción;
+  ninguna petición iniciada después de fecha_expiracion puede ser aceptada
+  y la comprobación no escribe en la base de datos
+- Revocar la suscripción sin invalidar la caché (como otro worker) se nota en la siguiente
+  petición, y un cargar() que lee antes de invalidar() no deja en la caché el usuario anterior
+
+Uso: python -m benchmarks.bench_usuarios [--hilos 8] [--segundos 2]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+RUTA = '/analisis/estadisticas'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=2.0)
+    parser.add_argument('--peticiones', type=int, default=500)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_usuarios.db')}"
+
+    from sqlalchemy import event
+    from api.app import app, db, User
+    from api import usuarios
+
+    with app.app_context():
+        usuario = User(username='bench', email='bench@example.com')
+        usuario.set_password('bench')
+        usuario.activar_suscripcion()
+        db.session.add(usuario)
+        db.session.commit()
+        user_id = usuario.id
+        motor = db.engine
+
+    sentencias = []
+    cerrojo = threading.Lock()
+
+    @event.listens_for(motor, 'before_cursor_execute')
+    def contar(conexion, cursor, sql, parametros, contexto, executemany):
+        with cerrojo:
+            sentencias.append(sql.split(None, 1)[0].upper())
+
+    def cliente():
+        c = app.test_client()
+        with c.session_transaction() as sesion:
+            sesion['_user_id'] = str(user_id)
+        return c
+
+    # 1. Consultas y tiempo por petición
+    c = cliente()
+    c.get(RUTA)  # calienta la analítica cacheada
+    for ttl, etiqueta in ((0, 'sin caché de usuarios'), (usuarios.CACHE_TTL, 'con caché de usuarios')):
+        usuarios.CACHE_TTL = ttl
+        del sentencias[:]
+        inicio = time.perf_counter()
+        for _ in range(args.peticiones):
+            assert c.get(RUTA).status_code == 200
+        t = time.perf_counter() - inicio
+        print(f"{etiqueta}: {len(sentencias) / args.peticiones:.2f} consultas/petición, "
+              f"{t / args.peticiones * 1000:.2f} ms/petición")
+
+    # 2. Caducidad bajo concurrencia
+    expiracion = datetime.utcnow() + timedelta(seconds=args.segundos / 2)
+    with app.app_context():
+        usuario = db.session.get(User, user_id)
+        usuario.fecha_expiracion = expiracion
+        db.session.commit()
+    usuarios.invalidar(user_id)
+    del sentencias[:]
+
+    aceptadas_tarde = []
+    resultados = {200: 0, 403: 0}
+    fin = time.monotonic() + args.segundos
+
+    def trabajar():
+        c = cliente()
+        while time.monotonic() < fin:
+            inicio = datetime.utcnow()
+            estado = c.get(RUTA).status_code
+            with cerrojo:
+                resultados[estado] = resultados.get(estado, 0) + 1
+                if estado == 200 and inicio > expiracion:
+                    aceptadas_tarde.append(inicio)
+
+    hilos = [threading.Thread(target=trabajar) for _ in range(args.hilos)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    escrituras = [s for s in sentencias if s in ('INSERT', 'UPDATE', 'DELETE')]
+    print(f"{args.hilos} hilos durante {args.segundos:.1f} s: {resultados[200]} aceptadas, "
+          f"{resultados[403]} rechazadas tras caducar")
+    assert resultados[200] and resultados[403], "La prueba debe cubrir ambos lados de la caducidad"
+    assert not aceptadas_tarde, f"{len(aceptadas_tarde)} peticiones aceptadas después de caducar"
+    assert not escrituras, f"Escrituras en la ruta de lectura: {escrituras}"
+
+    # Revocación hecha por otro proceso: sin invalidar la caché de este
+    with app.app_context():
+        usuario = db.session.get(User, user_id)
+        usuario.activar_suscripcion()
+        db.session.commit()
+    assert c.get(RUTA).status_code == 200
+    with app.app_context():
+        db.session.get(User, user_id).suscripcion_activa = False
+        db.session.commit()
+    assert c.get(RUTA).status_code == 403, "la revocación no se nota hasta que caduca la caché"
+
+    # Carrera cargar/invalidar: invalidar() llega mientras cargar() consulta la base de datos
+    usuarios.invalidar(user_id)
+    primera = []
+
+    @event.listens_for(motor, 'before_cursor_execute')
+    def invalidar_durante_la_consulta(conexion, cursor, sql, parametros, contexto, executemany):
+        if not primera:
+            primera.append(sql)
+            usuarios.invalidar(user_id)
+
+    with app.app_context():
+        usuarios.cargar(user_id)
+    event.remove(motor, 'before_cursor_execute', invalidar_durante_la_consulta)
+    assert user_id not in usuarios._cache, "cargar() guardó un usuario leído antes de invalidar()"
+    print("Sin accesos después de fecha_expiracion ni tras revocar, sin escrituras al comprobar "
+          "la suscripción y sin usuarios anteriores en la caché")
+
+if __name__ == '__main__':
+    main()
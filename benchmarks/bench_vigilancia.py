@@ -0,0 +1,153 @@
+"""
+Benchmark y comprobación de la vigilancia de subastas (api.vigilancia) contra el servidor BOE local
+Sigue N subastas (copias de las páginas guardadas) y mide cada pasada del planificador:
+- primera revisión (descarga y parseo completos)
+- sin cambios con ETag (todo 304: no se parsea nada)
+- sin cambios y sin ETag (se parsea, la huella coincide y no se escribe nada)
+- con cambios en algunas subastas (solo se guardan los campos que cambian)
+y lo compara con volver a extraer todas las subastas una a una.
+
+Uso: python -m benchmarks.bench_vigilancia [--subastas 60] [--latencia 0.05] [--concurrencia 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.servidor_boe import ServidorBOE, identificadores_disponibles, leer_fixture
+
+# Las fechas de conclusión de las páginas guardadas son de finales de 2024
+AHORA = datetime(2024, 11, 1, 9, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subastas', type=int, default=60)
+    parser.add_argument('--latencia', type=float, default=0.05)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--cambiadas', type=int, default=5)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench_vigilancia.db')}"
+
+    from api.app import app, db, User, AnalisisSubasta
+    from api.models import SeguimientoSubasta, CambioSubasta
+    from api import subasta_logic, vigilancia
+
+    fallos = []
+
+    def comprobar(condicion, mensaje):
+        if not condicion:
+            fallos.append(mensaje)
+            print(f"  FALLO: {mensaje}")
+
+    with ServidorBOE(latencia=args.latencia) as servidor:
+        # Copias de las subastas guardadas con identificadores propios
+        originales = identificadores_disponibles()
+        copias = []
+        for i in range(args.subastas):
+            original = originales[i % len(originales)]
+            id_sub = f'{original}-C{i:03d}'
+            for ver in ('1', '3'):
+                servidor.publicar(id_sub, ver, leer_fixture(original, ver))
+            copias.append((id_sub, original))
+
+        with app.app_context():
+            usuario = User(username='bench', email='bench@example.com')
+            usuario.set_password('bench')
+            usuario.activar_suscripcion()
+            db.session.add(usuario)
+            db.session.commit()
+            for id_sub, _ in copias:
+                analisis = AnalisisSubasta(user_id=usuario.id, url_subasta=servidor.url_subasta(id_sub),
+                                           identificador=id_sub)
+                db.session.add(analisis)
+                vigilancia.seguir(analisis, ahora=AHORA)
+            db.session.commit()
+
+            def pasada(nombre, ahora):
+                # Todas vencidas: se mide una pasada completa del planificador
+                SeguimientoSubasta.query.update({'proxima_revision': ahora})
+                db.session.commit()
+                peticiones = servidor.peticiones
+                inicio = time.perf_counter()
+                resumen = vigilancia.revisar_pendientes(ahora=ahora, limite=args.subastas,
+                                                        concurrencia=args.concurrencia)
+                segundos = time.perf_counter() - inicio
+                print(f"{nombre:28s} {segundos * 1000:9.1f} ms  {servidor.peticiones - peticiones:4d} peticiones"
+                      f"  {dict(resumen)}")
+                return resumen
+
+            print(f"{args.subastas} subastas, latencia {args.latencia * 1000:.0f} ms, "
+                  f"concurrencia {args.concurrencia}")
+
+            resumen = pasada('primera revisión', AHORA)
+            comprobar(resumen == {'primera': args.subastas}, f"primera revisión: {dict(resumen)}")
+
+            resumen = pasada('sin cambios (304)', AHORA + timedelta(hours=6))
+            comprobar(resumen == {'no_modificada': args.subastas}, f"304: {dict(resumen)}")
+
+            servidor.httpd.con_etag = False
+            resumen = pasada('sin cambios (sin ETag)', AHORA + timedelta(hours=12))
+            comprobar(resumen == {'sin_cambios': args.subastas}, f"sin ETag: {dict(resumen)}")
+            servidor.httpd.con_etag = True
+            # Sin ETag se guardaron validadores vacíos: esta pasada descarga y parsea otra vez
+            pasada('recupera validadores', AHORA + timedelta(hours=18))
+
+            # Nuevo valor de subasta y depósito en las primeras subastas
+            cambiadas = copias[:args.cambiadas]
+            for id_sub, original in cambiadas:
+                datos = subasta_logic.extraer_datos_subasta(servidor.url_subasta(id_sub))
+                pagina = leer_fixture(original, '1').decode('utf-8')
+                for campo, nuevo in (('Valor subasta', '111111'), ('Importe del depósito', '5555')):
+                    anterior = f"{int(float(datos[campo])):,}".replace(',', '.')
+                    comprobar(anterior in pagina, f"{campo} {anterior} no aparece en la página de {original}")
+                    pagina = pagina.replace(anterior, f"{int(nuevo):,}".replace(',', '.'), 1)
+                servidor.publicar(id_sub, '1', pagina.encode('utf-8'))
+
+            resumen = pasada('con cambios', AHORA + timedelta(days=1))
+            comprobar(resumen == {'con_cambios': len(cambiadas),
+                                  'no_modificada': args.subastas - len(cambiadas)},
+                      f"con cambios: {dict(resumen)}")
+            cambios = CambioSubasta.query.all()
+            campos = sorted({c.campo for c in cambios})
+            comprobar(len(cambios) == 2 * len(cambiadas) and campos == ['Importe del depósito', 'Valor subasta'],
+                      f"cambios guardados: {[(c.campo, c.anterior, c.nuevo) for c in cambios]}")
+            print(f"  {len(cambios)} cambios guardados: {campos}")
+
+            # Cadencia: cerca de la conclusión se revisa más a menudo y al concluir se desactiva
+            seguimiento = SeguimientoSubasta.query.first()
+            conclusion = seguimiento.fecha_conclusion
+            comprobar(conclusion is not None, "fecha de conclusión no reconocida")
+            if conclusion is not None:
+                for antes, esperado in ((timedelta(days=10), vigilancia.INTERVALO_LEJANO),
+                                        (timedelta(days=3), timedelta(hours=6)),
+                                        (timedelta(hours=5), timedelta(hours=1)),
+                                        (timedelta(minutes=30), timedelta(minutes=10))):
+                    comprobar(vigilancia.intervalo(conclusion, conclusion - antes) == esperado,
+                              f"intervalo a {antes} de la conclusión")
+                resumen = pasada('tras la conclusión', max(conclusion for conclusion, in
+                                                           db.session.query(SeguimientoSubasta.fecha_conclusion))
+                                 + timedelta(minutes=1))
+                activos = SeguimientoSubasta.query.filter_by(activo=True).count()
+                comprobar(activos == 0, f"{activos} seguimientos siguen activos tras concluir")
+
+            # Referencia: volver a extraer todas las subastas una a una
+            inicio = time.perf_counter()
+            for id_sub, _ in copias:
+                subasta_logic.extraer_datos_subasta(servidor.url_subasta(id_sub))
+            print(f"{'extracción una a una':28s} {(time.perf_counter() - inicio) * 1000:9.1f} ms")
+
+    if fallos:
+        print(f"{len(fallos)} comprobaciones fallidas")
+        return 1
+    print("Comprobaciones correctas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
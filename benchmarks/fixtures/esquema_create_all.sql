@@ -0,0 +1,61 @@
+-- Esquema que creaba db.create_all() antes de las migraciones (árbol original, SQLite):
+-- punto de partida de benchmarks.bench_migraciones
+
+CREATE TABLE users (
+	id INTEGER NOT NULL, 
+	username VARCHAR(80) NOT NULL, 
+	email VARCHAR(120) NOT NULL, 
+	password_hash VARCHAR(255) NOT NULL, 
+	suscripcion_activa BOOLEAN, 
+	fecha_suscripcion DATETIME, 
+	fecha_expiracion DATETIME, 
+	PRIMARY KEY (id), 
+	UNIQUE (username), 
+	UNIQUE (email)
+);
+
+CREATE TABLE analisis_subastas (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	fecha_creacion DATETIME, 
+	url_subasta VARCHAR(500), 
+	identificador VARCHAR(200), 
+	fecha_conclusion VARCHAR(100), 
+	cantidad_reclamada FLOAT, 
+	valor_subasta FLOAT, 
+	tasacion FLOAT, 
+	tramos_pujas FLOAT, 
+	deposito FLOAT, 
+	direccion VARCHAR(500), 
+	referencia_catastral VARCHAR(100), 
+	puja FLOAT, 
+	porcentaje_puja FLOAT, 
+	veredicto VARCHAR(50), 
+	valor_referencia FLOAT, 
+	itp_porcentaje FLOAT, 
+	itp_calculado FLOAT, 
+	notaria_registro FLOAT, 
+	ano_procedimiento INTEGER, 
+	anos_total INTEGER, 
+	ibi_anual FLOAT, 
+	ibi_total FLOAT, 
+	comunidad_anual FLOAT, 
+	comunidad_total FLOAT, 
+	alarmas FLOAT, 
+	suministros FLOAT, 
+	reforma FLOAT, 
+	total_inversion FLOAT, 
+	venta_bajo FLOAT, 
+	margen_bajo FLOAT, 
+	rentabilidad_bajo FLOAT, 
+	venta_medio FLOAT, 
+	margen_medio FLOAT, 
+	rentabilidad_medio FLOAT, 
+	venta_alto FLOAT, 
+	margen_alto FLOAT, 
+	rentabilidad_alto FLOAT, 
+	notas TEXT, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+
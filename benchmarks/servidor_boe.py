@@ -0,0 +1,142 @@
+"""
+Servidor HTTP local que imita a subastas.boe.es
+Sirve las páginas guardadas en benchmarks/fixtures/boe con una latencia configurable.
+publicar() añade o sustituye páginas en caliente (para simular cambios en el BOE).
+"""
+
+import os
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DIRECTORIO_FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'boe')
+
+
+def identificadores_disponibles():
+    """Identificadores de subasta con páginas guardadas"""
+    ids = {nombre.rsplit('_ver', 1)[0] for nombre in os.listdir(DIRECTORIO_FIXTURES)
+           if nombre.endswith('.html')}
+    return sorted(ids)
+
+
+def leer_fixture(id_sub, ver):
+    """Devuelve el HTML guardado de una subasta o None si no existe"""
+    ruta = os.path.join(DIRECTORIO_FIXTURES, f"{id_sub}_ver{ver}.html")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, 'rb') as f:
+        return f.read()
+
+
+class ManejadorBOE(BaseHTTPRequestHandler):
+    """Responde a /detalleSubasta.php?idSub=...&ver=N"""
+    protocol_version = 'HTTP/1.1'
+    # Cabeceras y cuerpo van en escrituras separadas: sin esto Nagle + ACK retardado añaden ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        servidor = self.server
+        servidor.peticiones += 1
+
+        if servidor.latencia:
+            time.sleep(servidor.latencia)
+
+        query = parse_qs(urlparse(self.path).query)
+        id_sub = query.get('idSub', [''])[0]
+        ver = query.get('ver', [''])[0]
+        contenido = servidor.paginas.get((id_sub, ver)) or leer_fixture(id_sub, ver)
+
+        if contenido is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        # Validadores para peticiones condicionales
+        etag = '"%s"' % hashlib.md5(contenido).hexdigest() if servidor.con_etag else None
+        if etag and self.headers.get('If-None-Match') == etag:
+            servidor.no_modificadas += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _HTTPServerConcurrente(ThreadingHTTPServer):
+    # Cola de conexiones amplia para benchmarks con cientos de peticiones simultáneas
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class ServidorBOE:
+    """Servidor BOE falso en un hilo aparte; se usa como gestor de contexto"""
+
+    def __init__(self, latencia=0.0, host='127.0.0.1', puerto=0, con_etag=True):
+        self.httpd = _HTTPServerConcurrente((host, puerto), ManejadorBOE)
+        self.httpd.latencia = latencia
+        self.httpd.con_etag = con_etag
+        self.httpd.paginas = {}
+        self.httpd.peticiones = 0
+        self.httpd.no_modificadas = 0
+        self.hilo = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, puerto = self.httpd.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    @property
+    def peticiones(self):
+        return self.httpd.peticiones
+
+    @property
+    def no_modificadas(self):
+        return self.httpd.no_modificadas
+
+    def publicar(self, id_sub, ver, contenido):
+        """Sirve `contenido` (bytes) como la página ver=N de la subasta id_sub"""
+        self.httpd.paginas[(id_sub, str(ver))] = contenido
+
+    def url_subasta(self, id_sub, ver=1):
+        """URL de subasta al estilo BOE apuntando al servidor local"""
+        return f"{self.base_url}/detalleSubasta.php?idSub={id_sub}&ver={ver}"
+
+    def __enter__(self):
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Servidor BOE falso para pruebas locales')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0, help='segundos por respuesta')
+    args = parser.parse_args()
+
+    with ServidorBOE(latencia=args.latencia, puerto=args.puerto) as servidor:
+        print(f"Sirviendo {len(identificadores_disponibles())} subastas en {servidor.base_url}")
+        for id_sub in identificadores_disponibles():
+            print(' ', servidor.url_subasta(id_sub))
+        try:
+            servidor.hilo.join()
+        except KeyboardInterrupt:
+            pass
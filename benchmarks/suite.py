@@ -0,0 +1,368 @@
+"""
+Suite de benchmarks del flujo extracción → cálculo → guardado → render (sin conexión a internet)
+- Extracción: extraer_datos_subasta contra el servidor BOE local (benchmarks/fixtures/boe)
+  y parseo de las páginas guardadas
+- Micro: construir_urls, limpiar_entero_por_texto, numeros.leer_importe/formatear y cada
+  calcular_* de subasta_logic
+- POST /analisis/calcular con el cliente de pruebas de Flask (base SQLite temporal)
+- Render del listado y del dashboard con 10, 1.000 y 100.000 análisis
+
+Los resultados (ms por operación, menos es mejor) se guardan en JSON y se comparan con la
+línea base (benchmarks/linea_base.json): un caso es una regresión si supera la línea base en
+más de su tolerancia. Sale con código 1 si hay regresiones, para usarlo antes de desplegar.
+La línea base depende de la máquina: se regenera con --guardar-linea-base en la de CI.
+
+Uso: python -m benchmarks.suite [--rapido] [--solo micro,calculos] [--salida resultados.json]
+                                [--linea-base ruta.json] [--guardar-linea-base]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linea_base.json')
+
+GRUPOS = ('extraccion', 'micro', 'calculos', 'guardado', 'render')
+TAMANOS = (10, 1000, 100000)
+TAMANOS_RAPIDO = (10, 1000)
+
+# Tolerancia por defecto (fracción sobre la línea base) y por prefijo de caso
+TOLERANCIA = 0.25
+TOLERANCIAS = {
+    'micro.': 0.5,       # microsegundos: muy sensibles al ruido de la máquina
+    'calculos.': 0.5,
+    'extraccion.http': 0.5,
+}
+
+FORMULARIO = {
+    'identificador': 'SUB-JA-2024-000001', 'direccion': 'Calle Mayor 1, 28013 Madrid',
+    'valor_subasta': '185000', 'puja': '120000', 'valor_referencia': '160000',
+    'itp_porcentaje': '7', 'ano_procedimiento': '2019', 'ibi_anual': '650',
+    'comunidad_anual': '900', 'reforma': '15000', 'venta_bajo': '170000',
+    'venta_medio': '190000', 'venta_alto': '210000',
+}
+
+
+def medir(funcion, repeticiones=5, numero=1):
+    """Mejor tiempo en ms por llamada de varias repeticiones de `numero` llamadas"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000 / numero)
+    return min(tiempos)
+
+
+def medir_micro(funcion, repeticiones=5):
+    """Mejor tiempo en ms por llamada, con el número de llamadas ajustado por timeit (≥ 0,2 s)"""
+    temporizador = timeit.Timer(funcion)
+    numero, _ = temporizador.autorange()
+    return min(temporizador.repeat(repeat=repeticiones, number=numero)) * 1000 / numero
+
+
+# ---------- Grupos ----------
+# Cada grupo produce (caso, medición): la medición es una función que devuelve ms por operación
+# y se puede repetir mientras el grupo sigue abierto (servidor BOE, clientes, datos cargados)
+
+def grupo_extraccion(args):
+    from api import subasta_logic
+    from benchmarks.servidor_boe import ServidorBOE, identificadores_disponibles, leer_fixture
+
+    for id_sub in identificadores_disponibles():
+        paginas = [leer_fixture(id_sub, ver).decode('utf-8', 'replace') for ver in (1, 3)]
+        yield f'extraccion.parseo.{id_sub}', lambda: medir(
+            lambda: subasta_logic.parsear_paginas(paginas), args.repeticiones, 5)
+
+    # Sin latencia artificial: mide el coste propio de la descarga concurrente y el parseo
+    with ServidorBOE(latencia=0) as servidor:
+        for id_sub in identificadores_disponibles():
+            url = servidor.url_subasta(id_sub)
+            subasta_logic.extraer_datos_subasta(url)  # conexiones del pool ya abiertas
+            yield f'extraccion.http.{id_sub}', lambda: medir(
+                lambda: subasta_logic.extraer_datos_subasta(url), args.repeticiones, 5)
+
+
+def grupo_micro(args):
+    from api import numeros, subasta_logic
+
+    url = ('https://subastas.boe.es/detalleSubasta.php?idSub=SUB-JA-2024-198732'
+           '&ver=1&idBus=_ZGZlYmFjMzNmY2Y1')
+    yield 'micro.construir_urls', lambda: medir_micro(
+        lambda: subasta_logic.construir_urls(url), args.repeticiones)
+    yield 'micro.limpiar_entero_por_texto', lambda: medir_micro(
+        lambda: subasta_logic.limpiar_entero_por_texto('1.234.567,89 €'), args.repeticiones)
+    yield 'micro.leer_importe', lambda: medir_micro(
+        lambda: numeros.leer_importe('1.234.567,89 €'), args.repeticiones)
+    # Sin caché: el coste de un número nuevo
+    yield 'micro.formatear', lambda: medir_micro(
+        lambda: numeros._formatear.__wrapped__(1234567.891, 2), args.repeticiones)
+
+
+def grupo_calculos(args):
+    from api import subasta_logic as s
+
+    llamadas = {
+        'calcular_porcentaje_puja': lambda: s.calcular_porcentaje_puja(120000, 185000),
+        'calcular_itp_notaria': lambda: s.calcular_itp_notaria(160000, 7),
+        'calcular_ibi_judicial': lambda: s.calcular_ibi_judicial(650, 2019, 2024),
+        'calcular_comunidad_judicial': lambda: s.calcular_comunidad_judicial(900, 6),
+        'calcular_total_inversion': lambda: s.calcular_total_inversion(
+            120000, 11200, 1500, 3900, 5400, 300, 200, 15000),
+        'calcular_margen_rentabilidad': lambda: s.calcular_margen_rentabilidad(190000, 157500),
+    }
+    for nombre, funcion in llamadas.items():
+        yield f'calculos.{nombre}', lambda funcion=funcion: medir_micro(funcion, args.repeticiones)
+
+    from api import calculadora
+    entradas = calculadora.leer_entradas(FORMULARIO)
+    anteriores, _ = calculadora.calcular(entradas)
+    cambiadas = dict(entradas, venta_medio=entradas['venta_medio'] + 1000)
+    yield 'calculos.grafo_completo', lambda: medir_micro(
+        lambda: calculadora.calcular(entradas), args.repeticiones)
+    yield 'calculos.grafo_incremental', lambda: medir_micro(
+        lambda: calculadora.calcular(cambiadas, anteriores, ['venta_medio']), args.repeticiones)
+
+
+def _crear_usuario(db, User, nombre):
+    usuario = User(username=nombre, email=f'{nombre}@example.com')
+    usuario.set_password('bench')
+    usuario.activar_suscripcion()
+    db.session.add(usuario)
+    db.session.commit()
+    return usuario.id
+
+
+def _cliente(app, user_id):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(user_id)
+    return cliente
+
+
+def grupo_guardado(args, app):
+    from api.models import db, User
+
+    with app.app_context():
+        user_id = _crear_usuario(db, User, 'guardado')
+    cliente = _cliente(app, user_id)
+
+    def guardar():
+        respuesta = cliente.post('/analisis/calcular', data=FORMULARIO)
+        assert respuesta.status_code == 302 and '/analisis/nuevo' not in respuesta.location
+
+    guardar()
+    yield 'guardado.calcular_analisis_post', lambda: medir(guardar, args.repeticiones, 40)
+
+    def calcular_api():
+        respuesta = cliente.post('/api/calcular', json={'entradas': FORMULARIO})
+        assert respuesta.status_code == 200
+
+    yield 'guardado.api_calcular_post', lambda: medir(calcular_api, args.repeticiones, 40)
+
+    # Edición alternando un precio de venta: solo se recalcula y escribe un escenario
+    with app.app_context():
+        from api.models import AnalisisSubasta
+        analisis_id = db.session.query(db.func.max(AnalisisSubasta.id)).scalar()
+    ventas = itertools.cycle((float(FORMULARIO['venta_medio']) + 1000, float(FORMULARIO['venta_medio'])))
+
+    def editar():
+        respuesta = cliente.post(f'/analisis/{analisis_id}/editar',
+                                 data=dict(FORMULARIO, venta_medio=next(ventas)))
+        assert respuesta.status_code == 302 and '/editar' not in respuesta.location
+
+    yield 'guardado.editar_analisis_post', lambda: medir(editar, args.repeticiones, 40)
+
+
+def _filas(cantidad, rng):
+    """Análisis sintéticos repartidos en los dos últimos años"""
+    inicio = datetime.utcnow() - timedelta(days=730)
+    codigos = ('08013', '41007', '28013', '46001', '29016', '23001', '')
+    for i in range(cantidad):
+        cp = rng.choice(codigos)
+        yield {
+            'identificador': f'SUB-JA-2024-{i:06d}',
+            'direccion': f'CALLE EJEMPLO {i}, CP {cp}, CIUDAD' if cp else f'Calle sin código {i}',
+            'valor_subasta': rng.uniform(50000, 500000),
+            'puja': rng.uniform(20000, 400000),
+            'valor_referencia': rng.uniform(50000, 300000),
+            'ano_procedimiento': rng.choice([2016, 2019, 2021, 2023]),
+            'ibi_anual': rng.uniform(0, 2500),
+            'venta_medio': rng.uniform(50000, 600000),
+            'fecha_creacion': inicio + timedelta(minutes=rng.randrange(60 * 24 * 730)),
+        }
+
+
+def grupo_render(args, app):
+    from api.models import db, User
+    from api import importacion, analitica
+
+    rng = random.Random(1234)
+    for cantidad in args.tamanos:
+        with app.app_context():
+            user_id = _crear_usuario(db, User, f'render{cantidad}')
+            importacion.importar(_filas(cantidad, rng), user_id)
+        cliente = _cliente(app, user_id)
+
+        def pagina(ruta):
+            respuesta = cliente.get(ruta)
+            assert respuesta.status_code == 200, respuesta.status_code
+
+        def dashboard_en_frio():
+            analitica.invalidar(user_id)
+            pagina('/dashboard')
+
+        pagina('/dashboard')
+        yield f'render.lista.{cantidad}', lambda: medir(
+            lambda: pagina('/analisis/lista'), args.repeticiones, 3)
+        # Búsqueda de texto (api.busqueda) en el listado
+        yield f'render.lista_texto.{cantidad}', lambda: medir(
+            lambda: pagina('/analisis/lista?q=calle+ejemplo+12'), args.repeticiones, 3)
+        yield f'render.dashboard_frio.{cantidad}', lambda: medir(
+            dashboard_en_frio, args.repeticiones)
+        yield f'render.dashboard_cache.{cantidad}', lambda: medir(
+            lambda: pagina('/dashboard'), args.repeticiones, 3)
+        # Criba en memoria (api.criba) con la instantánea ya cargada
+        buscar = '/analisis/buscar?c=porcentaje_puja>=70&c=rentabilidad_medio>20&orden=rentabilidad_medio'
+        pagina(buscar)
+        yield f'render.buscar.{cantidad}', lambda: medir(
+            lambda: pagina(buscar), args.repeticiones, 3)
+
+
+# ---------- Línea base ----------
+
+def tolerancia(nombre, linea_base):
+    propias = linea_base.get('tolerancias', {})
+    if nombre in propias:
+        return propias[nombre]
+    for prefijo, valor in TOLERANCIAS.items():
+        if nombre.startswith(prefijo):
+            return valor
+    return TOLERANCIA
+
+
+def comparar(nombre, actual, linea_base):
+    """(base, variación, estado) con estado 'regresion', 'mejora', 'ok' o 'nuevo'"""
+    base = linea_base.get('resultados', {}).get(nombre)
+    if base is None:
+        return None, None, 'nuevo'
+    variacion = actual / base - 1
+    limite = tolerancia(nombre, linea_base)
+    estado = 'regresion' if variacion > limite else 'mejora' if variacion < -limite else 'ok'
+    return base, variacion, estado
+
+
+def _entorno():
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                            capture_output=True, text=True).stdout.strip()
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'maquina': platform.node(),
+        'plataforma': platform.platform(),
+    }
+
+
+def _cargar(ruta):
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rapido', action='store_true',
+                        help=f'sin el caso de {TAMANOS[-1]:,} análisis y con menos repeticiones')
+    parser.add_argument('--solo', help=f"grupos separados por comas ({', '.join(GRUPOS)})")
+    parser.add_argument('--repeticiones', type=int)
+    parser.add_argument('--confirmaciones', type=int, default=2,
+                        help='veces que se vuelve a medir un caso antes de darlo por regresión')
+    parser.add_argument('--salida', help='fichero JSON con los resultados')
+    parser.add_argument('--linea-base', default=LINEA_BASE)
+    parser.add_argument('--guardar-linea-base', action='store_true',
+                        help='guardar los resultados como nueva línea base')
+    args = parser.parse_args()
+
+    args.tamanos = TAMANOS_RAPIDO if args.rapido else TAMANOS
+    args.repeticiones = args.repeticiones or (3 if args.rapido else 5)
+    grupos = args.solo.split(',') if args.solo else GRUPOS
+    desconocidos = set(grupos) - set(GRUPOS)
+    if desconocidos:
+        parser.error(f"grupos desconocidos: {', '.join(sorted(desconocidos))}")
+
+    anterior = _cargar(args.linea_base)
+    linea_base = {} if args.guardar_linea_base else anterior
+    entorno = _entorno()
+    if linea_base and linea_base.get('entorno', {}).get('maquina') != entorno['maquina']:
+        print("Aviso: la línea base se midió en otra máquina", file=sys.stderr)
+
+    directorio = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'suite.db')}"
+    from api.app import crear_app
+    app = crear_app({'MIGRAR_AL_ARRANCAR': True})  # base temporal vacía
+
+    fabricas = {
+        'extraccion': lambda: grupo_extraccion(args),
+        'micro': lambda: grupo_micro(args),
+        'calculos': lambda: grupo_calculos(args),
+        'guardado': lambda: grupo_guardado(args, app),
+        'render': lambda: grupo_render(args, app),
+    }
+
+    resultados = {}
+    regresiones = []
+    print(f"{'caso':<48} {'ms/op':>12} {'base':>12} {'var.':>8}")
+    for grupo in grupos:
+        for nombre, medicion in fabricas[grupo]():
+            actual = medicion()
+            base, variacion, estado = comparar(nombre, actual, linea_base)
+            # Una regresión se confirma volviendo a medir (el ruido de la máquina solo suma tiempo)
+            for _ in range(args.confirmaciones):
+                if estado != 'regresion':
+                    break
+                actual = min(actual, medicion())
+                base, variacion, estado = comparar(nombre, actual, linea_base)
+            resultados[nombre] = actual
+
+            if base is None:
+                print(f"{nombre:<48} {actual:>12.4f} {'-':>12}")
+                continue
+            marca = {'regresion': '  REGRESIÓN', 'mejora': '  mejora'}.get(estado, '')
+            print(f"{nombre:<48} {actual:>12.4f} {base:>12.4f} {variacion:>+8.0%}{marca}")
+            if estado == 'regresion':
+                regresiones.append(nombre)
+
+    informe = {'entorno': entorno, 'resultados': resultados}
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(dict(informe, regresiones=regresiones), f, indent=2, ensure_ascii=False)
+
+    if args.guardar_linea_base:
+        # Se conservan las tolerancias propias y los casos que no se han medido esta vez
+        informe['resultados'] = dict(anterior.get('resultados', {}), **resultados)
+        if anterior.get('tolerancias'):
+            informe['tolerancias'] = anterior['tolerancias']
+        with open(args.linea_base, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write('\n')
+        print(f"\nLínea base guardada en {args.linea_base}")
+
+    if regresiones:
+        print(f"\n{len(regresiones)} regresiones respecto a la línea base: {', '.join(regresiones)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
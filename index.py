@@ -1,2 +1,4 @@
 # index.py - Punto de entrada para Vercel
-from api.app import app
+from api.app import crear_app
+
+app = crear_app()
@@ -0,0 +1,53 @@
+"""Entorno de Alembic: se ejecuta desde api.migraciones con la conexión de la app"""
+
+from alembic import context
+
+from api.models import db
+from api import busqueda
+
+config = context.config
+target_metadata = db.metadata
+
+
+def incluir_objeto(objeto, nombre, tipo, reflejado, comparado_con):
+    """El índice de búsqueda (tabla FTS5 y sus tablas internas, índice GIN) no está en models.py"""
+    if tipo == 'table' and nombre.startswith(busqueda.TABLA_FTS):
+        return False
+    if tipo == 'index' and nombre == busqueda.INDICE_PG:
+        return False
+    return True
+
+
+def ejecutar_sin_conexion():
+    """Genera el SQL de las migraciones (python -m api.migraciones sql)"""
+    context.configure(
+        url=config.get_main_option('sqlalchemy.url'),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={'paramstyle': 'named'},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def ejecutar_con_conexion():
+    conexion = config.attributes.get('connection')
+    if conexion is None:
+        raise RuntimeError("Ejecuta las migraciones con: python -m api.migraciones")
+
+    context.configure(
+        connection=conexion,
+        target_metadata=target_metadata,
+        compare_type=True,
+        include_object=incluir_objeto,
+        # SQLite no soporta ALTER TABLE completo: Alembic recrea la tabla
+        render_as_batch=conexion.dialect.name == 'sqlite',
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    ejecutar_sin_conexion()
+else:
+    ejecutar_con_conexion()
@@ -0,0 +1,113 @@
+"""esquema inicial
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17
+
+Esquema que creaba db.create_all() al importar la app (incluidos los índices
+de listado y analítica). Las bases de datos existentes se marcan en esta revisión
+sin recrear nada (api.migraciones._adoptar_esquema_existente).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('suscripcion_activa', sa.Boolean(), nullable=True),
+        sa.Column('fecha_suscripcion', sa.DateTime(), nullable=True),
+        sa.Column('fecha_expiracion', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table(
+        'analisis_subastas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=True),
+        sa.Column('url_subasta', sa.String(length=500), nullable=True),
+        sa.Column('identificador', sa.String(length=200), nullable=True),
+        sa.Column('fecha_conclusion', sa.String(length=100), nullable=True),
+        sa.Column('cantidad_reclamada', sa.Float(), nullable=True),
+        sa.Column('valor_subasta', sa.Float(), nullable=True),
+        sa.Column('tasacion', sa.Float(), nullable=True),
+        sa.Column('tramos_pujas', sa.Float(), nullable=True),
+        sa.Column('deposito', sa.Float(), nullable=True),
+        sa.Column('direccion', sa.String(length=500), nullable=True),
+        sa.Column('codigo_provincia', sa.String(length=2), nullable=True),
+        sa.Column('referencia_catastral', sa.String(length=100), nullable=True),
+        sa.Column('puja', sa.Float(), nullable=True),
+        sa.Column('porcentaje_puja', sa.Float(), nullable=True),
+        sa.Column('veredicto', sa.String(length=50), nullable=True),
+        sa.Column('valor_referencia', sa.Float(), nullable=True),
+        sa.Column('itp_porcentaje', sa.Float(), nullable=True),
+        sa.Column('itp_calculado', sa.Float(), nullable=True),
+        sa.Column('notaria_registro', sa.Float(), nullable=True),
+        sa.Column('ano_procedimiento', sa.Integer(), nullable=True),
+        sa.Column('anos_total', sa.Integer(), nullable=True),
+        sa.Column('ibi_anual', sa.Float(), nullable=True),
+        sa.Column('ibi_total', sa.Float(), nullable=True),
+        sa.Column('comunidad_anual', sa.Float(), nullable=True),
+        sa.Column('comunidad_total', sa.Float(), nullable=True),
+        sa.Column('alarmas', sa.Float(), nullable=True),
+        sa.Column('suministros', sa.Float(), nullable=True),
+        sa.Column('reforma', sa.Float(), nullable=True),
+        sa.Column('total_inversion', sa.Float(), nullable=True),
+        sa.Column('venta_bajo', sa.Float(), nullable=True),
+        sa.Column('margen_bajo', sa.Float(), nullable=True),
+        sa.Column('rentabilidad_bajo', sa.Float(), nullable=True),
+        sa.Column('venta_medio', sa.Float(), nullable=True),
+        sa.Column('margen_medio', sa.Float(), nullable=True),
+        sa.Column('rentabilidad_medio', sa.Float(), nullable=True),
+        sa.Column('venta_alto', sa.Float(), nullable=True),
+        sa.Column('margen_alto', sa.Float(), nullable=True),
+        sa.Column('rentabilidad_alto', sa.Float(), nullable=True),
+        sa.Column('notas', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_analisis_user_fecha', 'analisis_subastas',
+                    ['user_id', 'fecha_creacion', 'id'])
+    op.create_index('ix_analisis_user_veredicto', 'analisis_subastas',
+                    ['user_id', 'veredicto', 'rentabilidad_medio', 'total_inversion'])
+    op.create_index('ix_analisis_user_fecha_importes', 'analisis_subastas',
+                    ['user_id', 'fecha_creacion', 'rentabilidad_medio', 'total_inversion'])
+    op.create_index('ix_analisis_user_provincia', 'analisis_subastas',
+                    ['user_id', 'codigo_provincia', 'margen_medio', 'rentabilidad_medio'])
+
+    op.create_table(
+        'trabajos_extraccion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('url_subasta', sa.String(length=500), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('resultado', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=True),
+        sa.Column('fecha_inicio', sa.DateTime(), nullable=True),
+        sa.Column('fecha_fin', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_trabajos_extraccion_estado', 'trabajos_extraccion', ['estado'])
+    op.create_index('ix_trabajos_extraccion_user_id', 'trabajos_extraccion', ['user_id'])
+
+
+def downgrade():
+    # Los índices se eliminan con sus tablas
+    op.drop_table('trabajos_extraccion')
+    op.drop_table('analisis_subastas')
+    op.drop_table('users')
@@ -0,0 +1,65 @@
+"""seguimiento de subastas
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Tablas de la vigilancia de subastas (api.vigilancia): un seguimiento por análisis
+y los cambios detectados en cada revisión.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'seguimientos_subastas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('analisis_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('url_subasta', sa.String(length=500), nullable=False),
+        sa.Column('activo', sa.Boolean(), nullable=False),
+        sa.Column('fecha_conclusion', sa.DateTime(), nullable=True),
+        sa.Column('proxima_revision', sa.DateTime(), nullable=True),
+        sa.Column('ultima_revision', sa.DateTime(), nullable=True),
+        sa.Column('ultimo_cambio', sa.DateTime(), nullable=True),
+        sa.Column('validadores', sa.Text(), nullable=True),
+        sa.Column('huella', sa.String(length=64), nullable=True),
+        sa.Column('datos', sa.Text(), nullable=True),
+        sa.Column('revisiones', sa.Integer(), nullable=False),
+        sa.Column('errores_seguidos', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['analisis_id'], ['analisis_subastas.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('analisis_id')
+    )
+    op.create_index('ix_seguimientos_activo_proxima', 'seguimientos_subastas',
+                    ['activo', 'proxima_revision'])
+    op.create_index('ix_seguimientos_subastas_user_id', 'seguimientos_subastas', ['user_id'])
+
+    op.create_table(
+        'cambios_subastas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('seguimiento_id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(), nullable=True),
+        sa.Column('campo', sa.String(length=100), nullable=False),
+        sa.Column('anterior', sa.Text(), nullable=True),
+        sa.Column('nuevo', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['seguimiento_id'], ['seguimientos_subastas.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_cambios_subastas_seguimiento_id', 'cambios_subastas', ['seguimiento_id'])
+
+
+def downgrade():
+    # Los índices se eliminan con sus tablas
+    op.drop_table('cambios_subastas')
+    op.drop_table('seguimientos_subastas')
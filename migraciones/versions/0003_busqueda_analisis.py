@@ -0,0 +1,97 @@
+"""búsqueda de texto en los análisis
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Índice de texto sobre direccion, identificador, referencia_catastral y notas (api.busqueda):
+- SQLite: tabla virtual FTS5 con contenido externo (también indexa user_id) y triggers
+  que la mantienen al día
+- PostgreSQL: función IMMUTABLE que normaliza el texto a tsvector e índice GIN sobre ella
+Si una migración posterior recrea analisis_subastas en SQLite (modo batch) los triggers
+se pierden con la tabla: hay que volver a crearlos y reconstruir el índice.
+"""
+from alembic import op
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+CAMPOS = ('direccion', 'identificador', 'referencia_catastral', 'notas')
+# En SQLite se indexa también user_id (recuentos por usuario sin salir del índice)
+COLUMNAS_FTS = ('user_id',) + CAMPOS
+
+# Longitudes de prefijo con índice propio: un prefijo más largo obliga a FTS5 a fusionar las
+# listas de todos los términos que empiezan así y no puede saltar por ellas al cruzar palabras
+PREFIJOS = '2 3 4 5 6 7 8'
+
+# Tildes, diéresis y ñ/ç que se pliegan antes de indexar (lo mismo que api.busqueda.normalizar)
+CON_TILDE = 'áàâäãéèêëíìîïóòôöõúùûüñç'
+SIN_TILDE = 'aaaaaeeeeiiiiooooouuuunc'
+
+
+def _valores(fila):
+    return ', '.join(f'{fila}.{c}' for c in COLUMNAS_FTS)
+
+
+TRIGGERS_SQLITE = (
+    f"""CREATE TRIGGER busqueda_analisis_ai AFTER INSERT ON analisis_subastas BEGIN
+        INSERT INTO busqueda_analisis(rowid, {', '.join(COLUMNAS_FTS)}) VALUES (new.id, {_valores('new')});
+    END""",
+    f"""CREATE TRIGGER busqueda_analisis_ad AFTER DELETE ON analisis_subastas BEGIN
+        INSERT INTO busqueda_analisis(busqueda_analisis, rowid, {', '.join(COLUMNAS_FTS)})
+        VALUES ('delete', old.id, {_valores('old')});
+    END""",
+    f"""CREATE TRIGGER busqueda_analisis_au AFTER UPDATE OF {', '.join(COLUMNAS_FTS)} ON analisis_subastas BEGIN
+        INSERT INTO busqueda_analisis(busqueda_analisis, rowid, {', '.join(COLUMNAS_FTS)})
+        VALUES ('delete', old.id, {_valores('old')});
+        INSERT INTO busqueda_analisis(rowid, {', '.join(COLUMNAS_FTS)}) VALUES (new.id, {_valores('new')});
+    END""",
+)
+
+FUNCION_PG = f"""
+CREATE OR REPLACE FUNCTION busqueda_analisis_documento(
+    direccion text, identificador text, referencia_catastral text, notas text)
+RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT to_tsvector('simple'::regconfig, regexp_replace(
+        translate(lower(coalesce($1, '') || ' ' || coalesce($2, '') || ' ' ||
+                        coalesce($3, '') || ' ' || coalesce($4, '')),
+                  '{CON_TILDE}', '{SIN_TILDE}'),
+        '[^[:alnum:]]+', ' ', 'g'))
+$$
+"""
+
+
+def upgrade():
+    dialecto = op.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        op.execute(f"""
+            CREATE VIRTUAL TABLE busqueda_analisis USING fts5(
+                {', '.join(COLUMNAS_FTS)},
+                content='analisis_subastas', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='{PREFIJOS}'
+            )
+        """)
+        for trigger in TRIGGERS_SQLITE:
+            op.execute(trigger)
+        op.execute("INSERT INTO busqueda_analisis(busqueda_analisis) VALUES ('rebuild')")
+    elif dialecto == 'postgresql':
+        op.execute(FUNCION_PG)
+        op.execute(f"""
+            CREATE INDEX ix_analisis_busqueda ON analisis_subastas
+            USING gin (busqueda_analisis_documento({', '.join(CAMPOS)}))
+        """)
+
+
+def downgrade():
+    dialecto = op.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        for sufijo in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS busqueda_analisis_{sufijo}')
+        op.execute('DROP TABLE IF EXISTS busqueda_analisis')
+    elif dialecto == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_analisis_busqueda')
+        op.execute('DROP FUNCTION IF EXISTS busqueda_analisis_documento(text, text, text, text)')
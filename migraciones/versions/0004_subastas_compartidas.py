@@ -0,0 +1,110 @@
+"""subastas compartidas entre usuarios
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Tabla `subastas`: los datos extraídos del BOE una sola vez para todos los usuarios (también es
+el nivel persistente de api.cache_subastas) y enlace analisis_subastas.subasta_id.
+
+Los análisis existentes se agrupan en bloque, sin recorrerlos en Python:
+1. una subasta por identificador distinto, con los datos de su análisis más reciente
+2. cada análisis se enlaza con la de su identificador
+3. los que no tienen identificador, con la única subasta de su misma referencia catastral
+Las subastas migradas no tienen clave (URL) ni extracción guardada: la primera extracción de
+su URL las completa (AlmacenBD las encuentra por identificador).
+
+En SQLite la columna se añade con ALTER TABLE y no en modo batch, que recrearía la tabla
+y se llevaría los triggers del índice de búsqueda (0003).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+CAMPOS = ('identificador', 'referencia_catastral', 'fecha_conclusion', 'cantidad_reclamada',
+          'valor_subasta', 'tasacion', 'tramos_pujas', 'deposito', 'direccion', 'codigo_provincia')
+
+
+def upgrade():
+    op.create_table(
+        'subastas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('clave', sa.String(length=500), nullable=True),
+        sa.Column('identificador', sa.String(length=200), nullable=True),
+        sa.Column('referencia_catastral', sa.String(length=100), nullable=True),
+        sa.Column('fecha_conclusion', sa.String(length=100), nullable=True),
+        sa.Column('cantidad_reclamada', sa.Float(), nullable=True),
+        sa.Column('valor_subasta', sa.Float(), nullable=True),
+        sa.Column('tasacion', sa.Float(), nullable=True),
+        sa.Column('tramos_pujas', sa.Float(), nullable=True),
+        sa.Column('deposito', sa.Float(), nullable=True),
+        sa.Column('direccion', sa.String(length=500), nullable=True),
+        sa.Column('codigo_provincia', sa.String(length=2), nullable=True),
+        sa.Column('datos', sa.Text(), nullable=True),
+        sa.Column('validadores', sa.Text(), nullable=True),
+        sa.Column('fecha_extraccion', sa.DateTime(), nullable=True),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('clave'),
+        sa.UniqueConstraint('identificador')
+    )
+    op.create_index('ix_subastas_referencia_catastral', 'subastas', ['referencia_catastral'])
+
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ALTER TABLE analisis_subastas ADD COLUMN subasta_id INTEGER REFERENCES subastas (id)')
+    else:
+        op.add_column('analisis_subastas', sa.Column('subasta_id', sa.Integer(), nullable=True))
+        op.create_foreign_key('analisis_subastas_subasta_id_fkey', 'analisis_subastas', 'subastas',
+                              ['subasta_id'], ['id'])
+    op.create_index('ix_analisis_subastas_subasta_id', 'analisis_subastas', ['subasta_id'])
+
+    # 1. Una subasta por identificador (la fila del análisis más reciente)
+    columnas = ', '.join(CAMPOS)
+    op.execute(f"""
+        INSERT INTO subastas ({columnas}, fecha_creacion)
+        SELECT {columnas}, fecha_creacion FROM analisis_subastas
+        WHERE id IN (
+            SELECT max(id) FROM analisis_subastas
+            WHERE identificador IS NOT NULL AND identificador <> ''
+            GROUP BY identificador
+        )
+    """)
+    # Referencias vacías como NULL (no agrupan nada)
+    op.execute("UPDATE subastas SET referencia_catastral = NULL WHERE referencia_catastral = ''")
+
+    # 2. Enlace por identificador (índice único de subastas.identificador)
+    op.execute("""
+        UPDATE analisis_subastas SET subasta_id = (
+            SELECT s.id FROM subastas s WHERE s.identificador = analisis_subastas.identificador
+        )
+        WHERE identificador IS NOT NULL AND identificador <> ''
+    """)
+
+    # 3. Sin identificador: por referencia catastral si solo una subasta la tiene
+    op.execute("""
+        UPDATE analisis_subastas SET subasta_id = (
+            SELECT min(s.id) FROM subastas s
+            WHERE s.referencia_catastral = analisis_subastas.referencia_catastral
+        )
+        WHERE subasta_id IS NULL AND referencia_catastral IS NOT NULL AND referencia_catastral <> ''
+          AND (SELECT count(*) FROM subastas s
+               WHERE s.referencia_catastral = analisis_subastas.referencia_catastral) = 1
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_analisis_subastas_subasta_id', table_name='analisis_subastas')
+    if op.get_bind().dialect.name == 'sqlite':
+        # ALTER TABLE DROP COLUMN (SQLite 3.35+) conserva los triggers de la búsqueda
+        op.execute('ALTER TABLE analisis_subastas DROP COLUMN subasta_id')
+    else:
+        op.drop_constraint('analisis_subastas_subasta_id_fkey', 'analisis_subastas',
+                           type_='foreignkey')
+        op.drop_column('analisis_subastas', 'subasta_id')
+    op.drop_table('subastas')
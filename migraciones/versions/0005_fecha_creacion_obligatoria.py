@@ -0,0 +1,54 @@
+"""fecha_creacion obligatoria en analisis_subastas
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+El listado pagina por cursor sobre (user_id, fecha_creacion, id) (api.consultas): con un NULL
+en fecha_creacion el cursor no se puede comparar ni decodificar y la paginación se corta.
+Los análisis sin fecha (bases antiguas o filas insertadas a mano) pasan a FECHA_DESCONOCIDA,
+que los deja al final del listado por fecha, y la columna pasa a NOT NULL.
+
+SQLite no altera columnas: la tabla se recrea en modo batch y, como indica 0003, se vuelven
+a crear los triggers del índice de búsqueda y se reconstruye el índice.
+"""
+from datetime import datetime
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+FECHA_DESCONOCIDA = datetime(1970, 1, 1)
+
+
+def _cambiar_nulabilidad(nullable):
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('analisis_subastas', 'fecha_creacion',
+                        existing_type=sa.DateTime(), nullable=nullable)
+        return
+
+    with op.batch_alter_table('analisis_subastas', recreate='always') as batch:
+        batch.alter_column('fecha_creacion', existing_type=sa.DateTime(), nullable=nullable)
+    # Los triggers se han ido con la tabla anterior; los rowid (id) se conservan
+    for trigger in context.script.get_revision('0003').module.TRIGGERS_SQLITE:
+        op.execute(trigger)
+    op.execute("INSERT INTO busqueda_analisis(busqueda_analisis) VALUES ('rebuild')")
+
+
+def upgrade():
+    # Con el tipo DateTime, para que se guarde en el mismo formato que las demás fechas (en
+    # SQLite es texto y el cursor compara cadenas)
+    tabla = sa.table('analisis_subastas', sa.column('fecha_creacion', sa.DateTime()))
+    op.execute(tabla.update().where(tabla.c.fecha_creacion.is_(None))
+               .values(fecha_creacion=FECHA_DESCONOCIDA))
+    _cambiar_nulabilidad(False)
+
+
+def downgrade():
+    _cambiar_nulabilidad(True)
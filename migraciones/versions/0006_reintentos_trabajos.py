@@ -0,0 +1,32 @@
+"""espera entre reintentos de los trabajos de extracción
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+trabajos_extraccion.proximo_intento: un trabajo fallido no se vuelve a reclamar antes de esa
+fecha (espera exponencial, api.trabajos). Columna nula añadida con ALTER TABLE también en SQLite.
+Las bases adoptadas de create_all (api.migraciones) a las que les faltaba trabajos_extraccion
+la reciben ya creada desde los modelos, con la columna: entonces no se añade.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        columnas = sa.inspect(op.get_bind()).get_columns('trabajos_extraccion')
+        if any(c['name'] == 'proximo_intento' for c in columnas):
+            return
+    op.add_column('trabajos_extraccion', sa.Column('proximo_intento', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('trabajos_extraccion') as batch:
+        batch.drop_column('proximo_intento')